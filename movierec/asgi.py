@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movierec.settings')
 
 application = get_asgi_application()
+
+from movies.search import load_in_background  # noqa: E402 (needs the app registry)
+
+load_in_background()
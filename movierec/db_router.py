@@ -0,0 +1,51 @@
+"""
+Primary/replica database routing.
+
+Writes, migrations and anything outside a request (commands, workers) use
+the primary. ``ReplicaRoutingMiddleware`` marks safe (GET/HEAD) requests as
+replica-readable, and their reads go to a random alias from
+``DATABASE_REPLICAS``. They fall back to the primary while a transaction is
+open on it, and for a few seconds after the same client wrote, so users see
+their own reviews and favorites despite replication lag.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replicas():
+    return settings.DATABASE_REPLICAS
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Let reads inside the block go to a replica (the middleware does this for safe requests)."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if not aliases or not _replica_reads.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,244 @@
+"""
+Per-request performance metrics.
+
+``RequestMetricsMiddleware`` opens a ``RequestProfile`` for a sampled request
+and stores it in a context variable; the database execute wrapper, the OMDb
+client and the template backend add to whichever profile is current (the
+variable follows the request into ``sync_to_async`` threads, asyncio tasks
+and the OMDb fan-out pool). Outside a sampled request every hook returns
+after a single context-variable lookup.
+
+Finished profiles feed process-wide histograms, rendered in the Prometheus
+text format by ``render_prometheus``. Like the OMDb cache counters they are
+per worker process.
+"""
+
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # OMDb fan-out records from pool threads
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.omdb_calls = 0
+        self.omdb_time = 0.0
+        self.omdb_cache = Counter()
+        self.template_time = 0.0
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.db_queries += 1
+            self.db_time += seconds
+
+    def add_omdb(self, status, seconds):
+        with self._lock:
+            self.omdb_calls += 1
+            self.omdb_time += seconds
+            self.omdb_cache[status] += 1
+
+    def add_template(self, seconds):
+        with self._lock:
+            self.template_time += seconds
+
+
+def start_profile():
+    profile = RequestProfile()
+    return profile, _current.set(profile)
+
+
+def end_profile(token):
+    _current.reset(token)
+
+
+def current_profile():
+    return _current.get()
+
+
+def record_omdb(status, seconds):
+    """Called by the OMDb client once per lookup; ``status`` is the cache tier or ``miss``."""
+    profile = _current.get()
+    if profile is not None:
+        profile.add_omdb(status, seconds)
+
+
+def record_template(seconds):
+    profile = _current.get()
+    if profile is not None:
+        profile.add_template(seconds)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper installed on every connection."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(time.perf_counter() - started)
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_wrapper, dispatch_uid='movierec.metrics.install_query_wrapper')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram, one series per label set."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_label_text(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_bucket{_label_text(key + (('le', '+Inf'),))} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_text(key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {series[-1]:.6f}")
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class CounterMetric:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            lines.extend(f"{self.name}{_label_text(key)} {value}" for key, value in sorted(self._values.items()))
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            lines.extend(f"{self.name}{_label_text(key)} {value}" for key, value in sorted(self._values.items()))
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+requests_total = CounterMetric('movierec_requests_total', "Sampled requests by view and status code.")
+request_duration = Histogram('movierec_request_duration_seconds', "Wall time of sampled requests.", DURATION_BUCKETS)
+db_queries = Histogram('movierec_db_queries', "Database queries per sampled request.", COUNT_BUCKETS)
+db_duration = Histogram('movierec_db_duration_seconds', "Database time per sampled request.", DURATION_BUCKETS)
+omdb_calls = CounterMetric('movierec_omdb_calls_total', "OMDb lookups in sampled requests by cache status.")
+omdb_duration = Histogram('movierec_omdb_duration_seconds', "OMDb time per sampled request.", DURATION_BUCKETS)
+template_duration = Histogram('movierec_template_duration_seconds', "Template render time per sampled request.",
+                              DURATION_BUCKETS)
+
+# Recorded on every call, sampled or not
+omdb_budget = CounterMetric('movierec_omdb_budget_total',
+                            "Upstream OMDb calls asked of the shared daily budget, by priority and outcome.")
+omdb_budget_tokens = Gauge('movierec_omdb_budget_tokens',
+                           "OMDb budget tokens left when this worker last drew from it.")
+rate_limited = CounterMetric('movierec_rate_limited_total', "Requests refused by per-client rate limits, by scope.")
+
+# Background tasks: run outcomes and timings in this process (a run_tasks worker), and the queue itself,
+# read from the database when /metrics is scraped (taskqueue.queue.export_metrics)
+tasks_total = CounterMetric('movierec_tasks_total', "Background task runs by task and outcome.")
+task_duration = Histogram('movierec_task_duration_seconds', "Background task run time.", DURATION_BUCKETS)
+task_wait = Histogram('movierec_task_wait_seconds', "Time from a task being due to a worker starting it.",
+                      DURATION_BUCKETS)
+task_queue_depth = Gauge('movierec_task_queue_depth', "Queued background tasks by task and status.")
+task_oldest_due = Gauge('movierec_task_oldest_due_seconds', "How long the oldest due pending task has waited.")
+task_latency = Gauge('movierec_task_latency_seconds',
+                     "Wait and run time quantiles of the tasks finished in the last hour.")
+
+METRICS = (requests_total, request_duration, db_queries, db_duration, omdb_calls, omdb_duration, template_duration,
+           omdb_budget, omdb_budget_tokens, rate_limited, tasks_total, task_duration, task_wait, task_queue_depth,
+           task_oldest_due, task_latency)
+
+
+def observe(profile, view, status, duration):
+    """Fold a finished request profile into the process-wide metrics."""
+    requests_total.inc(view=view, status=status)
+    request_duration.observe(duration, view=view)
+    db_queries.observe(profile.db_queries, view=view)
+    db_duration.observe(profile.db_time, view=view)
+    if profile.omdb_calls:
+        omdb_duration.observe(profile.omdb_time, view=view)
+        for cache_status, count in profile.omdb_cache.items():
+            omdb_calls.inc(count, view=view, cache=cache_status)
+    if profile.template_time:
+        template_duration.observe(profile.template_time, view=view)
+
+
+def render_prometheus():
+    return '\n'.join(line for metric in METRICS for line in metric.render()) + '\n'
+
+
+def reset():
+    for metric in METRICS:
+        metric.clear()
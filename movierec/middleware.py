@@ -0,0 +1,163 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import db_router, metrics
+
+request_logger = logging.getLogger('movierec.requests')
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also runs natively under ASGI.
+
+    Stock ``WhiteNoiseMiddleware`` is sync-only, which makes Django run every
+    request of an ASGI worker through a single thread and undoes the async
+    views. The static file lookup is an in-memory dict hit, so it is safe to
+    do on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestMetricsMiddleware:
+    """
+    Profile a sample of requests: wall time, database queries, OMDb lookups and template rendering.
+
+    Sampled responses get a ``Server-Timing`` header, one JSON log line on the
+    ``movierec.requests`` logger, and are added to the histograms served by
+    the metrics endpoint. With ``REQUEST_METRICS_SAMPLE_RATE`` at 0 the
+    middleware removes itself from the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+        profile, token = metrics.start_profile()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_profile(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        profile, token = metrics.start_profile()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_profile(token)
+        return self.finish(request, response, profile)
+
+    def finish(self, request, response, profile):
+        duration = time.perf_counter() - profile.started
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unmatched'
+        metrics.observe(profile, view, response.status_code, duration)
+
+        cache = ', '.join(f"{count} {status}" for status, count in sorted(profile.omdb_cache.items()))
+        response['Server-Timing'] = ', '.join([
+            f'db;desc="{profile.db_queries} queries";dur={profile.db_time * 1000:.1f}',
+            f'omdb;desc="{profile.omdb_calls} calls{": " + cache if cache else ""}";dur={profile.omdb_time * 1000:.1f}',
+            f'tpl;dur={profile.template_time * 1000:.1f}',
+            f'total;dur={duration * 1000:.1f}',
+        ])
+        request_logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'db_queries': profile.db_queries,
+            'db_ms': round(profile.db_time * 1000, 2),
+            'omdb_calls': profile.omdb_calls,
+            'omdb_ms': round(profile.omdb_time * 1000, 2),
+            'omdb_cache': dict(profile.omdb_cache),
+            'template_ms': round(profile.template_time * 1000, 2),
+        }))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Send the reads of safe requests to the read replicas (see ``movierec.db_router``).
+
+    After an unsafe request the client gets a short-lived cookie that keeps
+    its reads on the primary for ``DATABASE_REPLICA_PIN_SECONDS``, long enough
+    for replicas to catch up with what it just wrote. Without replicas the
+    middleware removes itself from the stack.
+    """
+    sync_capable = True
+    async_capable = True
+    cookie_name = 'db_primary'
+
+    def __init__(self, get_response):
+        if not db_router.replicas():
+            raise MiddlewareNotUsed
+        self.pin_seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def use_replica(self, request):
+        return request.method in ('GET', 'HEAD', 'OPTIONS') and self.cookie_name not in request.COOKIES
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with db_router.replica_reads(self.use_replica(request)):
+            response = self.get_response(request)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        with db_router.replica_reads(self.use_replica(request)):
+            response = await self.get_response(request)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            response.set_cookie(self.cookie_name, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
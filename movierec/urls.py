@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/movies/', include('movies.urls')),  # Important!
      path('api/reviews/', include('reviews.urls')),
        path('users/', include('users.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,20 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from taskqueue.queue import export_metrics
+from . import metrics
+
+
+def metrics_view(request):
+    """Request metrics of this worker, and the task queue's state, in the Prometheus text format.
+
+    Open to staff users, and to scrapers sending ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    token = settings.METRICS_TOKEN
+    bearer = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (request.user.is_staff or (token and hmac.compare_digest(bearer.encode(), token.encode()))):
+        return HttpResponseForbidden()
+    export_metrics()
+    return HttpResponse(metrics.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
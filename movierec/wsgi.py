@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movierec.settings')
 
 application = get_wsgi_application()
+
+from movies.search import load_in_background  # noqa: E402 (needs the app registry)
+
+load_in_background()
@@ -0,0 +1,82 @@
+"""
+Async versions of the OMDb-bound movie views, for ASGI deployments.
+
+They share their query-string parsing, context building and templates with
+``movies.views``; only the OMDb calls are awaited concurrently, so an ASGI
+worker keeps serving other requests while OMDb answers. The URL confs route
+to these views (and ``reviews.async_views``) when ``ASYNC_VIEWS`` is on.
+"""
+
+import random
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import redirect, render
+
+from recommendations.feeds import get_user_feed
+from reviews.models import Review
+from .metadata import aget_movie
+from .omdb import afetch_many
+from .search import asearch_movies
+from .page_cache import cache_anonymous_page
+from .ratelimit import throttle
+from .views import (
+    detail_context, homepage_fallback, homepage_params, is_search, list_context, list_params, review_form, review_page,
+)
+
+# Template rendering may touch the lazy request.user, which needs the sync ORM
+arender = sync_to_async(render)
+
+
+@cache_anonymous_page
+@throttle('search', applies=is_search)
+async def movie_list_html(request):
+    query, top_rated_btn, genre_filter, page = list_params(request)
+    user = await request.auser()
+    movies = []
+
+    if query:
+        movies = await asearch_movies(query, page)
+
+    elif top_rated_btn:
+        movies = await asearch_movies('top rated', page)
+
+    elif genre_filter:
+        movies = await asearch_movies(genre_filter, page)
+
+    elif user.is_authenticated and (feed := await sync_to_async(get_user_feed)(user)):
+        movies = [dict(item) for item in feed]
+
+    else:
+        deadline = settings.OMDB_HOMEPAGE_DEADLINE
+        for data in await afetch_many(homepage_params(), timeout=deadline, priority='homepage'):
+            if data and data.get("Search"):
+                movies.append(random.choice(data["Search"]))
+        movies = movies or await sync_to_async(homepage_fallback)()
+
+    context = await sync_to_async(list_context)(movies, user, genre_filter, page)
+    return await arender(request, "movies/movie_list.html", context)
+
+
+@cache_anonymous_page
+async def movie_detail_html(request, movie_id):
+    movie = await aget_movie(movie_id)
+    if movie is None:
+        return await arender(request, '404.html', {'message': f"Movie with ID '{movie_id}' not found."}, status=404)
+
+    if request.method == 'POST':
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect('login')
+
+        rating_int, content, error_message = review_form(request.POST)
+        if rating_int is not None and content:
+            await Review.objects.acreate(user=user, movie=movie, rating=rating_int, content=content)
+            return redirect('movies-detail-html', movie_id=movie_id)
+
+        reviews, next_cursor = await sync_to_async(review_page)(movie)
+        context = detail_context(movie, reviews, next_cursor, error_message=error_message)
+        return await arender(request, 'movies/movie_detail.html', context)
+
+    reviews, next_cursor = await sync_to_async(review_page)(movie, request.GET.get('before'))
+    return await arender(request, "movies/movie_detail.html", detail_context(movie, reviews, next_cursor))
@@ -0,0 +1,73 @@
+"""
+Helpers shared by the benchmark commands (``benchmark_async_views``, ``benchmark_endpoints``).
+
+Benchmarks never touch the configured database: they run against a
+throwaway SQLite file created like the test runner's database, with
+in-memory caches and OMDb pointed at a ``FakeOmdbServer``.
+"""
+
+import importlib
+import os
+import statistics
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import clear_url_caches
+
+from recommendations import content
+from . import metadata, omdb, search
+from .fake_omdb import FakeOmdbServer
+
+BENCH_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-default'},
+    'omdb': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-omdb'},
+}
+
+
+@contextmanager
+def benchmark_environment(**server_options):
+    """Throwaway database, in-memory caches and a running OMDb stand-in; yields the server."""
+    server = FakeOmdbServer(**server_options).start()
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    test_settings['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(OMDB_BASE_URL=server.url, CACHES=BENCH_CACHES,
+                               ALLOWED_HOSTS=['testserver'], DEBUG=False):
+            reset_state()
+            yield server
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        server.stop()
+
+
+def reset_state():
+    """Forget this process's OMDb cache, breaker state, search index, loaded content index and queued refreshes."""
+    metadata.reset_scheduled()
+    omdb.local_cache.clear()
+    omdb.stats.reset()
+    omdb.breaker.reset()
+    search.index.clear()
+    content.reset()
+
+
+def reload_urlconfs():
+    """Re-import the URL confs so they pick up the current ``ASYNC_VIEWS``."""
+    for name in ('movies.urls', 'reviews.urls', settings.ROOT_URLCONF):
+        importlib.reload(importlib.import_module(name))
+    clear_url_caches()
+
+
+def latency_summary(timings, elapsed):
+    """Throughput and p50/p95/p99 latency (ms) of a run of ``timings`` (seconds) over ``elapsed``."""
+    quantiles = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+    return {
+        'requests': len(timings),
+        'throughput': round(len(timings) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(quantiles[49] * 1000, 2),
+        'p95_ms': round(quantiles[94] * 1000, 2),
+        'p99_ms': round(quantiles[98] * 1000, 2),
+    }
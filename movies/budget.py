@@ -0,0 +1,100 @@
+"""
+Shared daily budget for upstream OMDb calls.
+
+OMDb keys come with a daily quota, and one crawler walking the logged-out
+homepage (six genre searches a hit) can spend it. Every upstream call, from
+any worker on the host, first takes a token from one ``SharedTokenBucket``
+that refills at ``OMDB_DAILY_QUOTA`` calls a day and holds at most
+``OMDB_BUDGET_BURST``.
+
+Calls carry a priority: ``detail`` pages, then ``search``, then the
+``homepage``'s random genre picks, then ``background`` refreshes. Each
+priority only draws while the bucket keeps its reserve in
+``OMDB_BUDGET_RESERVE`` (a fraction of the burst), so as the budget runs low
+the traffic that is cheapest to lose is refused first. A refused call looks
+like an unreachable OMDb to the client: callers answer from the caches, the
+local movie store and the local search index instead.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from movierec import metrics
+from .ratelimit import shared_bucket
+
+PRIORITIES = ('detail', 'search', 'homepage', 'background')
+
+# Seconds over which OMDB_DAILY_QUOTA refills
+DAY = 24 * 3600
+
+
+
+def priority_for(params):
+    """Default priority of a lookup: title/ID lookups serve detail pages, everything else is a search."""
+    return 'detail' if 'i' in params or 't' in params else 'search'
+
+
+def get_bucket():
+    """The shared bucket, or None while ``OMDB_DAILY_QUOTA`` is 0 (unlimited)."""
+    quota = settings.OMDB_DAILY_QUOTA
+    if not quota:
+        return None
+    return shared_bucket('omdb', quota / DAY, settings.OMDB_BUDGET_BURST)
+
+
+def reserve(priority, bucket):
+    return settings.OMDB_BUDGET_RESERVE.get(priority, 0) * bucket.capacity
+
+
+def acquire(priority):
+    """Spend one upstream call at ``priority``; False when the budget left is reserved for higher priorities."""
+    bucket = get_bucket()
+    if bucket is None:
+        return True
+    allowed = bucket.try_acquire(reserve=reserve(priority, bucket))
+    metrics.omdb_budget.inc(priority=priority, outcome='allowed' if allowed else 'refused')
+    level = bucket.level()
+    if level is not None:
+        metrics.omdb_budget_tokens.set(level)
+    return allowed
+
+
+def has_room(priority):
+    """Whether a call at ``priority`` would currently be allowed (without spending anything)."""
+    bucket = get_bucket()
+    if bucket is None:
+        return True
+    level = bucket.level()
+    return level is None or level - 1 >= reserve(priority, bucket)
+
+
+def enabled():
+    return bool(settings.OMDB_DAILY_QUOTA)
+
+
+async def aacquire(priority):
+    """Async ``acquire``: the SQLite bucket may wait on its lock, so it is consulted on a thread."""
+    if not enabled():
+        return True
+    return await sync_to_async(acquire, thread_sensitive=False)(priority)
+
+
+async def ahas_room(priority):
+    """Async ``has_room``, off the event loop like ``aacquire``."""
+    if not enabled():
+        return True
+    return await sync_to_async(has_room, thread_sensitive=False)(priority)
+
+
+def get_budget_stats():
+    """Current budget level and each priority's reserve, for the OMDb stats endpoint."""
+    bucket = get_bucket()
+    if bucket is None:
+        return {'enabled': False}
+    return {
+        'enabled': True,
+        'daily_quota': settings.OMDB_DAILY_QUOTA,
+        'burst': bucket.capacity,
+        'tokens': bucket.level(),
+        'reserve': {priority: reserve(priority, bucket) for priority in PRIORITIES},
+    }
@@ -0,0 +1,194 @@
+"""
+A local stand-in for the OMDb API, for load tests and benchmarks.
+
+The server holds a seeded catalogue (``Dataset``) and answers ``s=``
+searches from it, matching every word of the query against titles and
+genres, ten results per page as OMDb does. ``i=`` lookups return the
+catalogue entry, or a deterministic synthetic movie for any other id, so
+detail pages never run out of movies. Latency (with jitter) and 503 errors
+can be injected. Point ``OMDB_BASE_URL`` at ``server.url`` to use it, or run
+it standalone with ``manage.py fake_omdb``.
+"""
+
+import hashlib
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json import dumps
+from urllib.parse import parse_qsl, urlsplit
+
+GENRES = ["Romance", "Comedy", "Action", "Horror", "Animation", "Sci-Fi", "Drama", "Crime"]
+ADJECTIVES = ["Silent", "Last", "Broken", "Hidden", "Golden", "Dark", "Lost", "Final", "Wild", "Endless",
+              "Crimson", "Frozen", "Burning", "Secret", "Midnight", "Electric", "Distant", "Iron", "Pale", "Savage"]
+NOUNS = ["River", "Empire", "Heart", "City", "Storm", "Garden", "Machine", "Horizon", "Witness", "Kingdom",
+         "Shadow", "Harbor", "Signal", "Frontier", "Orchard", "Mirror", "Voyage", "Island", "Verdict", "Circus"]
+FIRST_NAMES = ["Ava", "Noah", "Mia", "Liam", "Zoe", "Omar", "Ines", "Kenji", "Lena", "Tomas", "Priya", "Marco"]
+LAST_NAMES = ["Hart", "Okafor", "Silva", "Novak", "Reyes", "Lindqvist", "Tanaka", "Moreau", "Khan", "Byrne"]
+
+PAGE_SIZE = 10
+
+
+def _number(text):
+    return int(hashlib.sha1(text.encode()).hexdigest()[:8], 16)
+
+
+def movie(imdb_id):
+    """Synthetic detail payload for ``imdb_id`` (the same every time)."""
+    n = _number(imdb_id)
+    return {
+        'Response': 'True',
+        'imdbID': imdb_id,
+        'Title': f"Movie {imdb_id}",
+        'Year': str(1950 + n % 75),
+        'Rated': 'PG-13',
+        'Runtime': f"{80 + n % 80} min",
+        'Genre': ', '.join(sorted({GENRES[n % len(GENRES)], GENRES[(n // 7) % len(GENRES)]})),
+        'Director': f"Director {n % 500}",
+        'Actors': ', '.join(f"Actor {(n // 3 + i) % 2000}" for i in range(3)),
+        'Plot': "A synthetic movie served by the local OMDb stand-in.",
+        'Language': 'English',
+        'Poster': 'N/A',
+        'imdbRating': f"{1 + n % 90 / 10:.1f}",
+    }
+
+
+class Dataset:
+    """A seeded catalogue of ``size`` movies; the same seed always gives the same movies."""
+
+    def __init__(self, size=5000, seed=0):
+        rng = random.Random(seed)
+        self.movies = {}
+        self._words = defaultdict(set)
+
+        def person():
+            return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+        for i in range(size):
+            imdb_id = f"tt{1_000_000 + i:07d}"
+            title = f"The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}"
+            if rng.random() < 0.2:
+                title += f" {rng.randint(2, 4)}"
+            genres = sorted(rng.sample(GENRES, rng.randint(1, 3)))
+            self.movies[imdb_id] = {
+                'Response': 'True',
+                'imdbID': imdb_id,
+                'Title': title,
+                'Year': str(rng.randint(1950, 2024)),
+                'Rated': rng.choice(['G', 'PG', 'PG-13', 'R']),
+                'Runtime': f"{rng.randint(80, 180)} min",
+                'Genre': ', '.join(genres),
+                'Director': person(),
+                'Actors': ', '.join(person() for _ in range(3)),
+                'Plot': f"A {genres[0].lower()} about a {rng.choice(NOUNS).lower()}.",
+                'Language': 'English',
+                'Poster': 'N/A',
+                'imdbRating': f"{rng.uniform(1, 10):.1f}",
+            }
+            for word in f"{title} {' '.join(genres)}".lower().split():
+                self._words[word].add(imdb_id)
+
+    def __len__(self):
+        return len(self.movies)
+
+    def detail(self, imdb_id):
+        return self.movies.get(imdb_id) or movie(imdb_id)
+
+    def search(self, query, page=1, movie_type=None):
+        """One page of catalogue movies whose title or genres contain every word of ``query``."""
+        words = query.lower().split()
+        if not words:
+            return {'Response': 'False', 'Error': 'Incorrect IMDb ID.'}
+        matches = set.intersection(*(self._words.get(word, set()) for word in words))
+        if movie_type not in (None, '', 'movie') or not matches:
+            return {'Response': 'False', 'Error': 'Movie not found!'}
+        ids = sorted(matches)[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        if not ids:
+            return {'Response': 'False', 'Error': 'Movie not found!'}
+        results = [
+            {key: self.movies[imdb_id][key] for key in ('Title', 'Year', 'imdbID', 'Poster')} | {'Type': 'movie'}
+            for imdb_id in ids
+        ]
+        return {'Response': 'True', 'Search': results, 'totalResults': str(len(matches))}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        delay, fail = server.draw()
+        time.sleep(delay)
+        if fail:
+            self.send_json({'Response': 'False', 'Error': 'Service unavailable.'}, status=503)
+            return
+        if params.get('i'):
+            payload = server.dataset.detail(params['i'])
+        else:
+            try:
+                page = int(params.get('page') or 1)
+            except ValueError:
+                page = 1
+            payload = server.dataset.search(params.get('s', ''), page, params.get('type'))
+        self.send_json(payload)
+
+    def send_json(self, payload, status=200):
+        body = dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOmdbServer(ThreadingHTTPServer):
+    """Threaded stand-in server; ``start()`` serves from a daemon thread.
+
+    Each request waits ``latency`` seconds plus up to ``jitter`` more, and
+    fails with a 503 with probability ``error_rate``.
+    """
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 dataset=None, seed=0):
+        super().__init__((host, port), Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.dataset = dataset if dataset is not None else Dataset(seed=seed)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.count = 0  # requests served
+        self.errors = 0  # of which failed on purpose
+
+    def draw(self):
+        """``(delay, fail)`` for the next request."""
+        with self._lock:
+            self.count += 1
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            fail = self._rng.random() < self.error_rate
+            self.errors += fail
+            return delay, fail
+
+    def handle_error(self, request, client_address):
+        # A client that gave up (read timeout) is expected, not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
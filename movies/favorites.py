@@ -0,0 +1,67 @@
+"""
+Favorite writes that need no read first.
+
+Adding is an ``INSERT ... ON CONFLICT DO NOTHING`` on the (user, movie_id)
+unique key and removing is a plain ``DELETE``, so a toggle is a delete
+followed, when it removed nothing, by an insert. Concurrent double-clicks
+then settle on a consistent state instead of racing ``get_or_create`` into an
+IntegrityError.
+
+These statements skip model signals, so each write sends
+``interactions_changed`` for the recommender itself.
+"""
+
+from django.db import connection, transaction
+
+from reviews.signals import interactions_changed
+from .models import FavoriteMovie
+
+
+def _delete(user_id, movie_ids):
+    """Delete the user's favorites among ``movie_ids``; returns how many rows went."""
+    qn = connection.ops.quote_name
+    sql = 'DELETE FROM {} WHERE {} = %s AND {} IN ({})'.format(
+        qn(FavoriteMovie._meta.db_table), qn('user_id'), qn('movie_id'), ', '.join(['%s'] * len(movie_ids)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, *movie_ids])
+        return cursor.rowcount
+
+
+def _insert(user_id, items):
+    FavoriteMovie.objects.bulk_create(
+        [FavoriteMovie(user_id=user_id, movie_id=movie_id, movie_title=title or '', poster_url=poster_url or None)
+         for movie_id, title, poster_url in items],
+        ignore_conflicts=True,
+    )
+
+
+def _changed(user_id, movie_ids):
+    interactions_changed.send(sender=FavoriteMovie, pairs=[(user_id, movie_id) for movie_id in movie_ids])
+
+
+def toggle_favorite(user, movie_id, title='', poster_url=None):
+    """Flip ``movie_id`` in the user's favorites; returns True when it is now a favorite."""
+    with transaction.atomic():
+        is_favorite = not _delete(user.pk, [movie_id])
+        if is_favorite:
+            _insert(user.pk, [(movie_id, title, poster_url)])
+        _changed(user.pk, [movie_id])
+    return is_favorite
+
+
+def update_favorites(user, add=(), remove=()):
+    """
+    Add ``(movie_id, title, poster_url)`` items and remove movie IDs in one
+    transaction; returns ``{movie_id: is_favorite}`` for every movie named.
+    """
+    add = {movie_id: (movie_id, title, poster_url) for movie_id, title, poster_url in add}
+    remove = [movie_id for movie_id in dict.fromkeys(remove) if movie_id not in add]
+    with transaction.atomic():
+        if remove:
+            _delete(user.pk, remove)
+        if add:
+            _insert(user.pk, add.values())
+        if add or remove:
+            _changed(user.pk, [*add, *remove])
+    return {**{movie_id: True for movie_id in add}, **{movie_id: False for movie_id in remove}}
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from movies.benchmarking import benchmark_environment, latency_summary, reload_urlconfs, reset_state
+
+
+def workload(prefix, count):
+    """Paths that each miss every cache: alternating searches and unseen detail pages."""
+    return [
+        f"/api/movies/html/?q={prefix}{i}" if i % 2 else f"/api/movies/html/tt{prefix}{i:06d}/"
+        for i in range(count)
+    ]
+
+
+def summary(mode, outcomes, elapsed):
+    row = {'mode': mode, 'errors': sum(status >= 400 for _, status in outcomes)}
+    row.update(latency_summary([timing for timing, _ in outcomes], elapsed))
+    return row
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync (WSGI) and async (ASGI) page views against a local OMDb stand-in. "
+        "Both apps run in-process on a throwaway database; the WSGI side gets a fixed number "
+        "of worker threads, the ASGI side one event loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight on the ASGI side.")
+        parser.add_argument('--wsgi-workers', type=int, default=4, help="Sync workers (threads) on the WSGI side.")
+        parser.add_argument('--latency', type=float, default=0.2, help="Seconds the stand-in waits per OMDb call.")
+
+    def handle(self, *args, **options):
+        with benchmark_environment(latency=options['latency']) as server:
+            results = [self.run_wsgi(options)]
+            with override_settings(ASYNC_VIEWS=True):
+                reload_urlconfs()
+                results.append(self.run_asgi(options))
+            reload_urlconfs()
+
+        self.stdout.write(f"OMDb stand-in latency {options['latency'] * 1000:.0f} ms, {server.count} upstream calls")
+        self.stdout.write(f"{'mode':<6} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for row in results:
+            self.stdout.write(
+                f"{row['mode']:<6} {row['requests']:>8} {row['errors']:>6} {row['throughput']:>8.1f} "
+                f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}"
+            )
+
+    def run_wsgi(self, options):
+        reset_state()
+        app = WSGIHandler()
+        local = threading.local()
+
+        def get(path):
+            if not hasattr(local, 'client'):
+                local.client = httpx.Client(transport=httpx.WSGITransport(app=app), base_url='http://testserver')
+            started = time.perf_counter()
+            response = local.client.get(path)
+            return time.perf_counter() - started, response.status_code
+
+        paths = workload('w', options['requests'])
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['wsgi_workers']) as pool:
+            outcomes = list(pool.map(get, paths))
+        elapsed = time.perf_counter() - started
+        return summary('wsgi', outcomes, elapsed)
+
+    def run_asgi(self, options):
+        reset_state()
+        app = ASGIHandler()
+
+        async def run():
+            limit = asyncio.Semaphore(options['concurrency'])
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://testserver', timeout=None) as client:
+                async def get(path):
+                    async with limit:
+                        started = time.perf_counter()
+                        response = await client.get(path)
+                        return time.perf_counter() - started, response.status_code
+
+                started = time.perf_counter()
+                outcomes = await asyncio.gather(*(get(path) for path in workload('a', options['requests'])))
+                return outcomes, time.perf_counter() - started
+
+        outcomes, elapsed = asyncio.run(run())
+        return summary('asgi', outcomes, elapsed)
@@ -0,0 +1,175 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from movies.benchmarking import benchmark_environment, latency_summary, reset_state
+from movies.fake_omdb import GENRES, Dataset
+from movies.management.commands.generate_synthetic_data import USERNAME_PREFIX
+
+# name -> (needs a logged-in user, path for the i-th request)
+ENDPOINTS = {
+    'list_home_anonymous': (False, lambda data, i: "/api/movies/html/"),
+    'list_home_user': (True, lambda data, i: "/api/movies/html/"),
+    'list_search': (False, lambda data, i: f"/api/movies/html/?q={data['words'][i % len(data['words'])]}"),
+    'list_genre': (False, lambda data, i: f"/api/movies/html/?genre={GENRES[i % len(GENRES)]}"),
+    'detail': (False, lambda data, i: f"/api/movies/html/{data['movie_ids'][i % len(data['movie_ids'])]}/"),
+    'favorites': (True, lambda data, i: "/api/movies/favorites/"),
+    'reviews_api': (False, lambda data, i: "/api/reviews/"),
+    'reviews_api_movie': (False, lambda data, i: f"/api/reviews/?movie={data['movie_ids'][i % len(data['movie_ids'])]}"),
+}
+
+# Metrics compared against a baseline, and whether bigger is better
+COMPARED = {'throughput': True, 'p95_ms': False, 'queries_mean': False}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main endpoints (movie list, detail, favorites, reviews API) on synthetic data "
+        "with a local OMDb stand-in. Reports throughput, p50/p95/p99 latency, queries and OMDb calls "
+        "per request, saves them as JSON and optionally compares against an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS), default=list(ENDPOINTS))
+        parser.add_argument('--requests', type=int, default=100, help="Measured requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per endpoint first.")
+        parser.add_argument('--concurrency', type=int, default=1, help="Client threads per endpoint.")
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--movies', type=int, default=2000)
+        parser.add_argument('--reviews', type=int, default=20_000)
+        parser.add_argument('--favorites', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--latency', type=float, default=0.05, help="OMDb stand-in latency in seconds.")
+        parser.add_argument('--jitter', type=float, default=0.02)
+        parser.add_argument('--error-rate', type=float, default=0.0)
+        parser.add_argument('--output', help="Where to write the JSON results (default: .cache/benchmarks/).")
+        parser.add_argument('--compare', help="Earlier results file to compare against.")
+        parser.add_argument('--threshold', type=float, default=10.0, help="Regression threshold in percent.")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        dataset = Dataset(options['movies'], options['seed'])
+        server_options = {key: options[key] for key in ('latency', 'jitter', 'error_rate', 'seed')}
+        with benchmark_environment(dataset=dataset, **server_options) as server:
+            data = self.prepare(dataset, options)
+            results = {}
+            for name in options['endpoints']:
+                reset_state()
+                results[name] = self.run_endpoint(name, data, server, options)
+                self.stdout.write(self.format_row(name, results[name]))
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'django': django.get_version(),
+            'options': {key: options[key] for key in (
+                'requests', 'warmup', 'concurrency', 'users', 'movies', 'reviews', 'favorites',
+                'seed', 'latency', 'jitter', 'error_rate',
+            )},
+            'endpoints': results,
+        }
+        output = Path(options['output'] or Path(settings.BASE_DIR, '.cache', 'benchmarks',
+                                               f"endpoints-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(f"Results written to {output}")
+
+        if options['compare']:
+            regressions = self.compare(json.loads(Path(options['compare']).read_text()), report, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{regressions} metric(s) regressed by more than {options['threshold']}%.")
+
+    def prepare(self, dataset, options):
+        call_command(
+            'generate_synthetic_data', users=options['users'], movies=options['movies'],
+            reviews=options['reviews'], favorites=options['favorites'], seed=options['seed'], stdout=StringIO(),
+        )
+        call_command('rebuild_recommendations', stdout=StringIO())
+        call_command('build_user_feeds', '--all', stdout=StringIO())
+        words = sorted({word for payload in dataset.movies.values() for word in payload['Title'].split()[1:2]})
+        movie_ids = list(dataset.movies)
+        random.Random(options['seed']).shuffle(movie_ids)
+        return {
+            'words': words,
+            'movie_ids': movie_ids,
+            'users': list(User.objects.filter(username__startswith=USERNAME_PREFIX)[:max(1, options['concurrency'])]),
+        }
+
+    def run_endpoint(self, name, data, server, options):
+        needs_login, path_for = ENDPOINTS[name]
+        local = threading.local()
+        counter = iter(range(10 ** 9))
+        lock = threading.Lock()
+
+        def request(index):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                if needs_login:
+                    with lock:
+                        user = data['users'][next(counter) % len(data['users'])]
+                    local.client.force_login(user)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = local.client.get(path_for(data, index))
+                elapsed = time.perf_counter() - started
+            return elapsed, len(queries), response.status_code
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(request, range(options['warmup'])))
+            upstream_before = server.count
+            started = time.perf_counter()
+            outcomes = list(pool.map(request, range(options['warmup'], options['warmup'] + options['requests'])))
+            elapsed = time.perf_counter() - started
+
+        queries = [count for _, count, _ in outcomes]
+        row = latency_summary([timing for timing, _, _ in outcomes], elapsed)
+        row.update({
+            'errors': sum(status >= 400 for _, _, status in outcomes),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+            'omdb_calls_per_request': round((server.count - upstream_before) / len(outcomes), 3),
+        })
+        return row
+
+    def format_row(self, name, row):
+        return (
+            f"{name:<22} {row['throughput']:>8.1f} req/s  p50 {row['p50_ms']:>7.1f}  p95 {row['p95_ms']:>7.1f}  "
+            f"p99 {row['p99_ms']:>7.1f} ms  queries {row['queries_mean']:>5.1f} (max {row['queries_max']})  "
+            f"omdb {row['omdb_calls_per_request']:.2f}  errors {row['errors']}"
+        )
+
+    def compare(self, baseline, report, threshold):
+        """Print the change of each compared metric; returns how many regressed beyond ``threshold`` percent."""
+        regressions = 0
+        self.stdout.write(f"Compared with the run of {baseline.get('created_at', 'unknown')}:")
+        for name, row in report['endpoints'].items():
+            before = baseline.get('endpoints', {}).get(name)
+            if before is None:
+                continue
+            changes = []
+            for metric, higher_is_better in COMPARED.items():
+                old, new = before.get(metric), row.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old * 100
+                worse = -change if higher_is_better else change
+                flag = ''
+                if worse > threshold:
+                    regressions += 1
+                    flag = ' REGRESSION'
+                changes.append(f"{metric} {change:+.1f}%{flag}")
+            self.stdout.write(f"  {name:<22} " + ", ".join(changes))
+        return regressions
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from movies.fake_omdb import Dataset, FakeOmdbServer
+
+
+class Command(BaseCommand):
+    help = "Serve a local OMDb stand-in with a seeded catalogue (set OMDB_BASE_URL to its URL)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--movies', type=int, default=5000, help="Size of the seeded catalogue.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response.")
+        parser.add_argument('--jitter', type=float, default=0.0, help="Up to this many extra random seconds.")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with a 503.")
+
+    def handle(self, *args, **options):
+        server = FakeOmdbServer(
+            host=options['host'], port=options['port'],
+            latency=options['latency'], jitter=options['jitter'], error_rate=options['error_rate'],
+            dataset=Dataset(options['movies'], options['seed']), seed=options['seed'],
+        )
+        self.stdout.write(f"Serving {len(server.dataset)} movies at {server.url} (Ctrl-C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Served {server.count} requests ({server.errors} injected errors).")
@@ -0,0 +1,101 @@
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies.fake_omdb import Dataset
+from movies.models import FavoriteMovie
+from reviews.models import Movie, Review
+
+USERNAME_PREFIX = 'synthetic'
+PASSWORD = 'synthetic'
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with synthetic users, movies, reviews and favorites for load tests. "
+        "Movies come from the fake OMDb catalogue with the same seed, so a stand-in server run "
+        "with that seed knows them. Synthetic users log in with the password 'synthetic'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--movies', type=int, default=5000)
+        parser.add_argument('--reviews', type=int, default=50_000)
+        parser.add_argument('--favorites', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            movie_ids = self.create_movies(Dataset(options['movies'], options['seed']), batch_size)
+            user_ids = self.create_users(options['users'], batch_size)
+
+            # Long-tailed popularity: a few movies get most of the reviews and favorites
+            cum_weights = list(accumulate(1.0 / (rank + 1) ** 0.8 for rank in range(len(movie_ids))))
+
+            def pick_movies(count):
+                return rng.choices(movie_ids, cum_weights=cum_weights, k=count)
+
+            reviews = (
+                Review(user_id=rng.choice(user_ids), movie_id=movie_id, rating=rng.randint(1, 10),
+                       content=f"Synthetic review {n}")
+                for n, movie_id in enumerate(pick_movies(options['reviews']))
+            )
+            review_count = self.bulk_create(Review, reviews, batch_size)
+
+            titles = dict(Movie.objects.filter(pk__in=movie_ids).values_list('imdb_id', 'title'))
+            pairs = set()
+            for _ in range(options['favorites'] * 3):
+                if len(pairs) >= options['favorites']:
+                    break
+                pairs.add((rng.choice(user_ids), pick_movies(1)[0]))
+            favorites = (
+                FavoriteMovie(user_id=user_id, movie_id=movie_id, movie_title=titles[movie_id])
+                for user_id, movie_id in pairs
+            )
+            favorite_count = self.bulk_create(FavoriteMovie, favorites, batch_size, ignore_conflicts=True)
+
+        # bulk_create skips the signals that keep the rating aggregates in step
+        call_command('rebuild_rating_aggregates', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(movie_ids)} movies, {len(user_ids)} users, {review_count} reviews "
+            f"and {favorite_count} favorites. Run rebuild_recommendations and build_user_feeds --all "
+            f"to include them in recommendations."
+        ))
+
+    def bulk_create(self, model, objects, batch_size, **kwargs):
+        created, batch = 0, []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                model.objects.bulk_create(batch, **kwargs)
+                created, batch = created + len(batch), []
+        if batch:
+            model.objects.bulk_create(batch, **kwargs)
+            created += len(batch)
+        return created
+
+    def create_movies(self, dataset, batch_size):
+        movies = []
+        for imdb_id, payload in dataset.movies.items():
+            movie = Movie(imdb_id=imdb_id)
+            movie.apply_omdb(payload)
+            movies.append(movie)
+        self.bulk_create(Movie, movies, batch_size, ignore_conflicts=True)
+        return list(dataset.movies)
+
+    def create_users(self, count, batch_size):
+        password = make_password(PASSWORD)  # hashed once; hashing per user would dominate the run
+        users = (User(username=f"{USERNAME_PREFIX}{n}", password=password) for n in range(count))
+        self.bulk_create(User, users, batch_size, ignore_conflicts=True)
+        return list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).values_list('pk', flat=True)[:count]
+        )
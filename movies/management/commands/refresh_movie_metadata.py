@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from movies.metadata import refresh_movie
+from reviews.models import Movie
+
+
+class Command(BaseCommand):
+    help = "Fetch OMDb metadata for movies that have none or whose copy is older than MOVIE_METADATA_MAX_AGE."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help="Maximum number of movies to refresh.")
+        parser.add_argument('--all', action='store_true', help="Refresh every movie regardless of age.")
+
+    def handle(self, *args, **options):
+        movies = Movie.objects.all()
+        if not options['all']:
+            cutoff = timezone.now() - timedelta(seconds=settings.MOVIE_METADATA_MAX_AGE)
+            movies = movies.filter(Q(fetched_at__isnull=True) | Q(fetched_at__lt=cutoff))
+        imdb_ids = list(
+            movies.order_by('fetched_at').values_list('imdb_id', flat=True)[:options['limit']]
+        )
+
+        refreshed = 0
+        for imdb_id in imdb_ids:
+            if refresh_movie(imdb_id) is not None:
+                refreshed += 1
+            else:
+                self.stderr.write(f"Could not refresh {imdb_id}")
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {refreshed} of {len(imdb_ids)} movies."))
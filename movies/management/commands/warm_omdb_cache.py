@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from movies.prefetch import warm
+from movies.ratelimit import TokenBucket
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the homepage genre searches and the metadata of recently popular movies before they "
+        "expire, within an upstream rate limit and a per-cycle budget of OMDb calls."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=float, default=settings.OMDB_PREFETCH_RATE,
+                            help="OMDb calls per second at most.")
+        parser.add_argument('--budget', type=int, default=settings.OMDB_PREFETCH_BUDGET,
+                            help="OMDb calls per cycle at most.")
+        parser.add_argument('--ahead', type=int, default=settings.OMDB_PREFETCH_AHEAD,
+                            help="Refresh entries expiring within this many seconds.")
+        parser.add_argument('--days', type=int, default=settings.OMDB_PREFETCH_HOT_DAYS,
+                            help="Window of review/favorite activity that makes a movie hot.")
+        parser.add_argument('--limit', type=int, default=settings.OMDB_PREFETCH_HOT_LIMIT,
+                            help="Number of hot movies to keep warm.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be refreshed.")
+        parser.add_argument('--loop', action='store_true', help="Keep warming instead of exiting.")
+        parser.add_argument('--interval', type=float, default=600.0, help="Seconds between cycles (--loop).")
+
+    def handle(self, *args, **options):
+        limiter = TokenBucket(options['rate'])
+        while True:
+            started = time.monotonic()
+            counts = warm(
+                limiter, budget=options['budget'], ahead=options['ahead'],
+                days=options['days'], limit=options['limit'], dry_run=options['dry_run'],
+            )
+            if options['dry_run']:
+                self.stdout.write(f"{counts['skipped']} lookup(s) due for a refresh.")
+                break
+            self.stdout.write(
+                f"Refreshed {counts['refreshed']}, failed {counts['failed']}, "
+                f"left for later {counts['skipped']} in {time.monotonic() - started:.1f}s."
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
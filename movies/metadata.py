@@ -0,0 +1,134 @@
+"""
+Local movie metadata store.
+
+Detail pages and favorites read movie metadata from ``reviews.Movie`` rows.
+A row is filled from OMDb the first time a movie is needed and refreshed by
+a queued task (``movies.tasks``) once it is older than
+``MOVIE_METADATA_MAX_AGE``; readers are never blocked on a refresh.
+"""
+
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from reviews.models import Movie
+from taskqueue.queue import enqueue
+from .omdb import afetch_from_omdb, fetch_from_omdb, fetch_many
+from .serializers import MovieDetailSerializer
+
+logger = logging.getLogger(__name__)
+
+_scheduled = {}  # imdb_id -> time.monotonic() of this worker's last enqueue
+_scheduled_lock = threading.Lock()
+
+
+def _validated(imdb_id, data):
+    if not data or data.get('Response') == 'False':
+        return None
+    serializer = MovieDetailSerializer(data=data)
+    if not serializer.is_valid():
+        logger.warning("Discarding malformed OMDb payload for %s: %s", imdb_id, serializer.errors)
+        return None
+    return serializer.validated_data
+
+
+def fetch_movie_payload(imdb_id, use_cache=True, priority=None):
+    """Validated OMDb detail payload for ``imdb_id``, or None."""
+    return _validated(imdb_id, fetch_from_omdb({'i': imdb_id, 'plot': 'full'}, use_cache=use_cache, priority=priority))
+
+
+def fetch_movie_payloads(imdb_ids, timeout=None, priority=None):
+    """Validated payloads for several movies fetched concurrently; ids OMDb could not resolve are left out."""
+    imdb_ids = list(imdb_ids)
+    results = fetch_many([{'i': imdb_id, 'plot': 'full'} for imdb_id in imdb_ids], timeout=timeout, priority=priority)
+    payloads = {imdb_id: _validated(imdb_id, data) for imdb_id, data in zip(imdb_ids, results)}
+    return {imdb_id: data for imdb_id, data in payloads.items() if data is not None}
+
+
+async def afetch_movie_payload(imdb_id):
+    return _validated(imdb_id, await afetch_from_omdb({'i': imdb_id, 'plot': 'full'}))
+
+
+def store_movie_payload(imdb_id, data, movie=None):
+    """Create or update the local row for ``imdb_id`` from an OMDb payload."""
+    if movie is None:
+        movie = Movie.objects.filter(pk=imdb_id).first() or Movie(imdb_id=imdb_id)
+    movie.apply_omdb(data)
+    movie.save()
+    return movie
+
+
+def refresh_movie(imdb_id):
+    """Re-fetch one movie from OMDb (bypassing the response cache), at background priority."""
+    data = fetch_movie_payload(imdb_id, use_cache=False, priority='background')
+    if data is None:
+        return None
+    return store_movie_payload(imdb_id, data)
+
+
+def schedule_refresh(imdb_id):
+    """Queue a refresh of a stale movie, unless this worker did so recently; repeats collapse while one is pending."""
+    now = time.monotonic()
+    requeue_after = settings.MOVIE_REFRESH_REQUEUE_AFTER
+    with _scheduled_lock:
+        last = _scheduled.get(imdb_id)
+        if last is not None and now - last < requeue_after:
+            return
+        if len(_scheduled) >= settings.MOVIE_REFRESH_SCHEDULED_MAX:
+            for key, at in list(_scheduled.items()):
+                if now - at >= requeue_after:
+                    del _scheduled[key]
+            if len(_scheduled) >= settings.MOVIE_REFRESH_SCHEDULED_MAX:
+                _scheduled.clear()
+        _scheduled[imdb_id] = now
+    enqueue('movies.refresh_movie', key=f'refresh-movie:{imdb_id}', imdb_id=imdb_id)
+
+
+def reset_scheduled():
+    """Forget which refreshes this worker queued (tests, benchmarks)."""
+    with _scheduled_lock:
+        _scheduled.clear()
+
+
+def schedule_enrichment(imdb_id):
+    """Queue filling in metadata for a row created without it (e.g. by the review form)."""
+    enqueue('movies.enrich_movie', key=f'enrich-movie:{imdb_id}', imdb_id=imdb_id)
+
+
+def get_movie(imdb_id):
+    """Return the local ``Movie`` for ``imdb_id`` with metadata, or None if OMDb has no such movie.
+
+    Rows without metadata are filled synchronously (this is the only case that
+    waits on OMDb); stale rows are returned as-is and a refresh is queued.
+    """
+    movie = Movie.objects.filter(pk=imdb_id).first()
+    if movie is not None and movie.has_metadata:
+        if movie.is_stale():
+            schedule_refresh(imdb_id)
+        return movie
+
+    data = fetch_movie_payload(imdb_id)
+    if data is None:
+        return None
+    return store_movie_payload(imdb_id, data, movie=movie)
+
+
+async def aget_movie(imdb_id):
+    """Async ``get_movie``; only the OMDb call for a movie without metadata is awaited."""
+    movie = await Movie.objects.filter(pk=imdb_id).afirst()
+    if movie is not None and movie.has_metadata:
+        if movie.is_stale():
+            await sync_to_async(schedule_refresh)(imdb_id)
+        return movie
+
+    data = await afetch_movie_payload(imdb_id)
+    if data is None:
+        return None
+    if movie is None:
+        movie = Movie(imdb_id=imdb_id)
+    movie.apply_omdb(data)
+    await movie.asave()
+    return movie
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favoritemovie',
+            index=models.Index(fields=['user', '-date_added', '-id'], name='favorite_user_added_idx'),
+        ),
+    ]
@@ -13,6 +13,10 @@ class FavoriteMovie(models.Model):
     class Meta:
         unique_together = ('user', 'movie_id')
         ordering = ['-date_added']
+        indexes = [
+            # Keyset pagination of a user's favorites (newest first)
+            models.Index(fields=['user', '-date_added', '-id'], name='favorite_user_added_idx'),
+        ]
 
     def __str__(self):
         return f"{self.movie_title} ({self.user})"
@@ -0,0 +1,616 @@
+"""
+OMDb API client used by the movie and review views.
+
+Responses are cached in two tiers: a small in-process LRU per worker and a
+shared Django cache (on-disk by default) so every worker benefits from a fetch.
+Each entry carries its own fresh/stale deadlines, so an expired-but-stale entry
+is served immediately while a background thread refreshes it.
+
+Concurrent misses for the same params are coalesced onto one upstream call,
+and ``fetch_many`` fans several lookups out over a shared thread pool.
+
+Upstream calls go through one pooled keep-alive session with bounded retries,
+guarded by a circuit breaker that fails fast (serving whatever is cached) once
+OMDb keeps erroring, and by the shared daily budget (``movies.budget``), which
+refuses low-priority calls first as the key's quota runs low; a refused
+lookup is answered like one during an outage.
+
+``afetch_from_omdb`` / ``afetch_many`` are the asyncio counterparts used by
+the async views: same caches, stats and breaker, but the upstream call goes
+through a pooled ``httpx.AsyncClient`` so a single worker can keep many
+requests in flight.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import random
+import threading
+import weakref
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from movierec import metrics
+from . import budget
+
+OMDB_BASE_URL = "http://www.omdbapi.com/"
+
+# Upstream statuses worth retrying
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+
+class CacheStats:
+    """Thread-safe hit/miss/eviction counters for the OMDb cache."""
+
+    FIELDS = ('local_hits', 'shared_hits', 'stale_hits', 'negative_hits',
+              'misses', 'coalesced', 'evictions', 'refreshes', 'upstream_errors',
+              'short_circuited', 'over_budget')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def incr(self, field, amount=1):
+        with self._lock:
+            self._counts[field] += amount
+
+    def reset(self):
+        with self._lock:
+            self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+stats = CacheStats()
+
+
+class LRUCache:
+    """Size-bounded in-process LRU; evictions are counted in ``stats``."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                stats.incr('evictions')
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LRUCache(settings.OMDB_CACHE_LOCAL_MAXSIZE)
+
+# Keys queued or being refreshed in the background, so one stale entry is
+# refreshed once however many requests see it.
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+_refresh_executor = None
+
+
+def shared_cache():
+    return caches[settings.OMDB_CACHE_ALIAS]
+
+
+def normalize_params(params):
+    """Return a canonical, hashable view of the request params (minus apikey)."""
+    return tuple(sorted(
+        (str(key).lower(), str(value).strip().lower())
+        for key, value in params.items()
+        if key != 'apikey' and value not in (None, '')
+    ))
+
+
+def cache_key(params):
+    digest = hashlib.sha1(repr(normalize_params(params)).encode()).hexdigest()
+    return f"omdb:{digest}"
+
+
+def ttl_for(params, data):
+    """Fresh lifetime in seconds for a response to ``params``."""
+    if data.get('Response') == 'False':
+        return settings.OMDB_CACHE_NEGATIVE_TTL
+    if 'i' in params or 't' in params:
+        return settings.OMDB_CACHE_DETAIL_TTL
+    return settings.OMDB_CACHE_SEARCH_TTL
+
+
+def _make_entry(params, data):
+    now = time.time()
+    fresh_until = now + ttl_for(params, data)
+    return {
+        'data': data,
+        'fetched_at': now,
+        'fresh_until': fresh_until,
+        'stale_until': fresh_until + settings.OMDB_CACHE_STALE_TTL,
+    }
+
+
+def _store(key, entry):
+    local_cache.set(key, entry)
+    timeout = max(1, int(entry['stale_until'] - time.time()))
+    shared_cache().set(key, entry, timeout)
+
+
+def _lookup(key):
+    """Return ``(entry, tier)`` for a key, promoting shared hits into the LRU."""
+    entry = local_cache.get(key)
+    if entry is not None:
+        return entry, 'local'
+    entry = shared_cache().get(key)
+    if entry is not None:
+        local_cache.set(key, entry)
+        return entry, 'shared'
+    return None, None
+
+
+class CircuitBreaker:
+    """Classic closed / open / half-open breaker around the upstream API.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    callers are refused for ``reset_timeout`` seconds. The first caller after
+    that is let through as a trial (half-open); its outcome closes or re-opens
+    the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.trial_in_flight = False
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def is_open(self):
+        return self.state != self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self.trial_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.times_opened = 0
+            self.trial_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'times_opened': self.times_opened,
+                'opened_at': self.opened_at or None,
+            }
+
+
+breaker = CircuitBreaker(
+    failure_threshold=settings.OMDB_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.OMDB_BREAKER_RESET_TIMEOUT,
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Shared keep-alive session; connections are pooled across threads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # A read timeout is not retried: the request may be slow rather than lost, and each
+            # attempt would wait the full OMDB_READ_TIMEOUT again (the async client does the same)
+            retry = Retry(
+                total=settings.OMDB_MAX_RETRIES,
+                read=0,
+                backoff_factor=settings.OMDB_RETRY_BACKOFF,
+                backoff_jitter=settings.OMDB_RETRY_JITTER,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(['GET']),
+                raise_on_status=False,
+            )
+            pool_size = settings.OMDB_POOL_SIZE
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                  max_retries=retry, pool_block=False)
+            session = requests.Session()
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _session = session
+        return _session
+
+
+def base_url():
+    return settings.OMDB_BASE_URL
+
+
+def _request(params, priority):
+    """Perform the upstream call. Returns parsed JSON or None on failure or when over budget."""
+    if not breaker.allow_request():
+        stats.incr('short_circuited')
+        return None
+    if not budget.acquire(priority):
+        stats.incr('over_budget')
+        return None
+
+    query = dict(params, apikey=settings.OMDB_API_KEY)
+    timeout = (settings.OMDB_CONNECT_TIMEOUT, settings.OMDB_READ_TIMEOUT)
+    try:
+        response = get_session().get(base_url(), params=query, timeout=timeout)
+        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
+        data = response.json()
+    except requests.exceptions.HTTPError as exc:
+        stats.incr('upstream_errors')
+        # A 4xx (bad key, bad request) says nothing about OMDb's health.
+        if exc.response is not None and exc.response.status_code < 500:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        return None
+    except (requests.exceptions.RequestException, ValueError):
+        stats.incr('upstream_errors')
+        breaker.record_failure()
+        return None
+    breaker.record_success()
+    return data
+
+
+# Upstream calls currently in flight, keyed by cache key. Callers that miss
+# on a key someone else is already fetching wait on the same Future.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _request_coalesced(key, params, priority):
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = _inflight[key] = Future()
+    if not leader:
+        stats.incr('coalesced')
+        return future.result()
+
+    try:
+        data = _request(params, priority)
+        if data is not None:
+            _store(key, _make_entry(params, data))
+        future.set_result(data)
+        return data
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _refresh(key, params):
+    try:
+        data = _request(params, 'background')
+        if data is not None:
+            _store(key, _make_entry(params, data))
+            stats.incr('refreshes')
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
+
+
+def _schedule_refresh(key, params):
+    """Refresh a stale entry on a small pool; when too many are queued the entry is just served stale."""
+    global _refresh_executor
+    with _refreshing_lock:
+        if key in _refreshing or len(_refreshing) >= settings.OMDB_REFRESH_MAX_PENDING:
+            return
+        _refreshing.add(key)
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=settings.OMDB_REFRESH_WORKERS, thread_name_prefix='omdb-refresh',
+            )
+    _refresh_executor.submit(_refresh, key, params)
+
+
+def _hit_status(entry, tier, now):
+    """``negative``, ``stale``, ``local`` or ``shared``: how a cached entry answers a lookup."""
+    if entry['data'].get('Response') == 'False':
+        return 'negative'
+    if now >= entry['fresh_until']:
+        return 'stale'
+    return tier
+
+
+def fetch_from_omdb(params, use_cache=True, priority=None):
+    """Helper function to fetch data from OMDB API with caching and error handling.
+
+    Returns the decoded JSON payload, or None if OMDb could not be reached.
+    ``Response: False`` answers are cached too (for a shorter time).
+    ``priority`` ranks the call against the daily budget (default: by params).
+    """
+    started = time.perf_counter()
+    params = dict(params)
+    priority = priority or budget.priority_for(params)
+    if not use_cache:
+        data = _request(params, priority)
+        metrics.record_omdb('bypass', time.perf_counter() - started)
+        return data
+
+    key = cache_key(params)
+    entry, tier = _lookup(key)
+    now = time.time()
+
+    # While the breaker is open or the budget is spoken for, any cached answer, however old, beats none.
+    if entry is not None and (now < entry['stale_until'] or breaker.is_open() or not budget.has_room(priority)):
+        status = _hit_status(entry, tier, now)
+        stats.incr(f'{status}_hits')
+        if now >= entry['fresh_until'] and not breaker.is_open():
+            _schedule_refresh(key, params)
+        metrics.record_omdb(status, time.perf_counter() - started)
+        return entry['data']
+
+    stats.incr('misses')
+    data = _request_coalesced(key, params, priority)
+    metrics.record_omdb('miss', time.perf_counter() - started)
+    return data
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Shared pool for fan-out lookups, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.OMDB_FANOUT_WORKERS,
+                thread_name_prefix='omdb',
+            )
+        return _executor
+
+
+def fetch_many(params_list, timeout=None, priority=None):
+    """Fetch several param sets concurrently.
+
+    Returns one result per input, in order. Lookups still running when
+    ``timeout`` seconds have passed are reported as None (they keep running
+    and will populate the cache for the next request).
+    """
+    # Each lookup runs in a copy of the caller's context so it still reports to the request profile
+    futures = [
+        get_executor().submit(contextvars.copy_context().run, fetch_from_omdb, params, priority=priority)
+        for params in params_list
+    ]
+    wait(futures, timeout=timeout)
+    return [
+        future.result() if future.done() and not future.exception() else None
+        for future in futures
+    ]
+
+
+# -------------------------
+# asyncio client
+# -------------------------
+
+# One client per event loop: httpx connections cannot be shared across loops.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Pooled ``httpx.AsyncClient`` for the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        connections = settings.OMDB_ASYNC_MAX_CONNECTIONS
+        transport = httpx.AsyncHTTPTransport(
+            retries=settings.OMDB_MAX_RETRIES,  # connection errors only; 5xx are retried below
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+        )
+        timeout = httpx.Timeout(settings.OMDB_READ_TIMEOUT, connect=settings.OMDB_CONNECT_TIMEOUT)
+        client = _async_clients[loop] = httpx.AsyncClient(transport=transport, timeout=timeout)
+    return client
+
+
+async def _arequest(params, priority):
+    """Async twin of ``_request``, with the same retry, stats, breaker and budget policy."""
+    if not breaker.allow_request():
+        stats.incr('short_circuited')
+        return None
+    if not await budget.aacquire(priority):
+        stats.incr('over_budget')
+        return None
+
+    query = dict(params, apikey=settings.OMDB_API_KEY)
+    retries = settings.OMDB_MAX_RETRIES
+    try:
+        for attempt in range(retries + 1):
+            response = await get_async_client().get(base_url(), params=query)
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                break
+            backoff = settings.OMDB_RETRY_BACKOFF * 2 ** attempt
+            await asyncio.sleep(backoff + random.uniform(0, settings.OMDB_RETRY_JITTER))
+        response.raise_for_status()
+        data = response.json()
+    except httpx.HTTPStatusError as exc:
+        stats.incr('upstream_errors')
+        if exc.response.status_code < 500:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        return None
+    except (httpx.HTTPError, ValueError):
+        stats.incr('upstream_errors')
+        breaker.record_failure()
+        return None
+    breaker.record_success()
+    return data
+
+
+# Async upstream calls in flight, keyed by cache key (the async views run on one loop per worker)
+_ainflight = {}
+
+
+async def _arequest_coalesced(key, params, priority):
+    future = _ainflight.get(key)
+    if future is not None:
+        stats.incr('coalesced')
+        return await asyncio.shield(future)
+
+    future = _ainflight[key] = asyncio.get_running_loop().create_future()
+    try:
+        data = await _arequest(params, priority)
+        if data is not None:
+            entry = _make_entry(params, data)
+            local_cache.set(key, entry)
+            await shared_cache().aset(key, entry, max(1, int(entry['stale_until'] - time.time())))
+        future.set_result(data)
+        return data
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        _ainflight.pop(key, None)
+
+
+async def afetch_from_omdb(params, use_cache=True, priority=None):
+    """Async ``fetch_from_omdb``. Stale entries are still refreshed on a background thread."""
+    started = time.perf_counter()
+    params = dict(params)
+    priority = priority or budget.priority_for(params)
+    if not use_cache:
+        data = await _arequest(params, priority)
+        metrics.record_omdb('bypass', time.perf_counter() - started)
+        return data
+
+    key = cache_key(params)
+    entry, tier = local_cache.get(key), 'local'
+    if entry is None:
+        entry, tier = await shared_cache().aget(key), 'shared'
+        if entry is not None:
+            local_cache.set(key, entry)
+    now = time.time()
+
+    if entry is not None and (now < entry['stale_until'] or breaker.is_open() or not await budget.ahas_room(priority)):
+        status = _hit_status(entry, tier, now)
+        stats.incr(f'{status}_hits')
+        if now >= entry['fresh_until'] and not breaker.is_open():
+            _schedule_refresh(key, params)
+        metrics.record_omdb(status, time.perf_counter() - started)
+        return entry['data']
+
+    stats.incr('misses')
+    data = await _arequest_coalesced(key, params, priority)
+    metrics.record_omdb('miss', time.perf_counter() - started)
+    return data
+
+
+# Fan-out lookups that outlived their deadline; referenced so they finish and fill the cache
+_background_tasks = set()
+
+
+async def afetch_many(params_list, timeout=None, priority=None):
+    """Async ``fetch_many``: results in input order, None for lookups still running at ``timeout``."""
+    tasks = [asyncio.ensure_future(afetch_from_omdb(params, priority=priority)) for params in params_list]
+    if not tasks:
+        return []
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    return [
+        task.result() if task.done() and not task.exception() else None
+        for task in tasks
+    ]
+
+
+def refresh(params):
+    """Fetch ``params`` upstream now and store the answer in both cache tiers (for cache warmers)."""
+    params = dict(params)
+    data = _request(params, 'background')
+    if data is not None:
+        _store(cache_key(params), _make_entry(params, data))
+        stats.incr('refreshes')
+    return data
+
+
+def expires_in(params):
+    """Seconds until the cached answer for ``params`` stops being fresh (negative once stale), or None."""
+    entry, _ = _lookup(cache_key(params))
+    return None if entry is None else entry['fresh_until'] - time.time()
+
+
+def invalidate(params):
+    key = cache_key(params)
+    local_cache.delete(key)
+    shared_cache().delete(key)
+
+
+def get_cache_stats():
+    """Counters plus current LRU occupancy, for dashboards and load tests."""
+    snapshot = stats.snapshot()
+    snapshot['local_size'] = len(local_cache)
+    snapshot['local_maxsize'] = local_cache.maxsize
+    return snapshot
+
+
+def get_breaker_stats():
+    return breaker.snapshot()
@@ -0,0 +1,77 @@
+"""
+Whole-page caching for anonymous visitors.
+
+Logged-out visitors all get the same movie list and detail pages, so those
+responses are cached by URL for ``PAGE_CACHE_TTL`` seconds. A request that
+carries a session cookie skips the cache: it may belong to a logged-in user,
+whose pages hold their own flags and review form, and checking the cookie
+instead of ``request.user`` keeps the hit path free of a session query.
+Every response varies on ``Cookie`` so shared caches keep the two apart.
+"""
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+
+def _ttl():
+    return settings.PAGE_CACHE_TTL
+
+
+def page_cache_key(request):
+    return 'page:' + hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+
+
+def _cacheable(request):
+    return (
+        _ttl() > 0
+        and request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+    )
+
+
+def _storable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def _finish(response, cached):
+    patch_vary_headers(response, ['Cookie'])
+    if cached:
+        patch_cache_control(response, max_age=_ttl())
+    return response
+
+
+def cache_anonymous_page(view):
+    """Serve ``view`` from the page cache for anonymous GETs; works on sync and async views."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if not _cacheable(request):
+                return _finish(await view(request, *args, **kwargs), cached=False)
+            key = page_cache_key(request)
+            response = await cache.aget(key)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+                if not _storable(response):
+                    return _finish(response, cached=False)
+                await cache.aset(key, response, _ttl())
+            return _finish(response, cached=True)
+        return wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable(request):
+            return _finish(view(request, *args, **kwargs), cached=False)
+        key = page_cache_key(request)
+        response = cache.get(key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if not _storable(response):
+                return _finish(response, cached=False)
+            cache.set(key, response, _ttl())
+        return _finish(response, cached=True)
+    return wrapper
@@ -0,0 +1,96 @@
+"""
+Cache warming for the OMDb data user traffic is most likely to ask for.
+
+Two kinds of work are considered each cycle:
+
+* the genre search pages behind the logged-out homepage (``homepage_params``),
+  refreshed in the shared OMDb response cache; and
+* the hottest movies by recent reviews and favorites, whose local ``Movie``
+  metadata is refreshed (detail pages read those rows, not the OMDb cache).
+
+Anything that is missing or would expire within ``ahead`` seconds is
+refreshed, hottest first, through a token bucket and within a per-cycle
+budget of upstream calls, so warming never competes with user traffic for
+OMDb's quota.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from reviews.models import Movie, Review
+from . import omdb
+from .metadata import refresh_movie
+from .models import FavoriteMovie
+from .views import GENRES, HOMEPAGE_PAGES
+
+
+
+def search_warmups():
+    """Every genre search page the homepage may pick from."""
+    return [
+        {'s': genre, 'type': 'movie', 'page': page}
+        for genre in GENRES
+        for page in range(1, HOMEPAGE_PAGES + 1)
+    ]
+
+
+def hot_movie_ids(days=None, limit=None):
+    """imdb IDs with the most reviews and favorites in the last ``days`` days, hottest first."""
+    days = days or settings.OMDB_PREFETCH_HOT_DAYS
+    limit = limit or settings.OMDB_PREFETCH_HOT_LIMIT
+    cutoff = timezone.now() - timedelta(days=days)
+
+    activity = Counter()
+    reviews = (
+        Review.objects.filter(created_at__gte=cutoff, movie__isnull=False)
+        .values_list('movie_id').annotate(n=Count('id')).order_by()
+    )
+    favorites = (
+        FavoriteMovie.objects.filter(date_added__gte=cutoff)
+        .values_list('movie_id').annotate(n=Count('id')).order_by()
+    )
+    for imdb_id, count in list(reviews) + list(favorites):
+        activity[imdb_id] += count
+    return [imdb_id for imdb_id, _ in activity.most_common(limit)]
+
+
+def stale_searches(ahead):
+    return [params for params in search_warmups()
+            if (remaining := omdb.expires_in(params)) is None or remaining < ahead]
+
+
+def stale_movies(imdb_ids, ahead):
+    """The given movies (order kept) that have no metadata or whose copy expires within ``ahead`` seconds."""
+    max_age = settings.MOVIE_METADATA_MAX_AGE
+    cutoff = timezone.now() - timedelta(seconds=max(0, max_age - ahead))
+    movies = Movie.objects.only('imdb_id', 'fetched_at').in_bulk(imdb_ids)
+    return [
+        imdb_id for imdb_id in imdb_ids
+        if (movie := movies.get(imdb_id)) is None or not movie.has_metadata or movie.fetched_at < cutoff
+    ]
+
+
+def warm(limiter, budget=None, ahead=None, days=None, limit=None, dry_run=False):
+    """Run one warming cycle; returns counts of ``refreshed``, ``failed`` and ``skipped`` lookups."""
+    budget = budget if budget is not None else settings.OMDB_PREFETCH_BUDGET
+    ahead = ahead if ahead is not None else settings.OMDB_PREFETCH_AHEAD
+
+    work = [('search', params) for params in stale_searches(ahead)]
+    work += [('movie', imdb_id) for imdb_id in stale_movies(hot_movie_ids(days, limit), ahead)]
+
+    counts = Counter()
+    for done, (kind, item) in enumerate(work):
+        if dry_run or done >= budget or omdb.breaker.is_open():
+            counts['skipped'] += len(work) - done
+            break
+        limiter.acquire()
+        if kind == 'search':
+            ok = omdb.refresh(item) is not None
+        else:
+            ok = refresh_movie(item) is not None
+        counts['refreshed' if ok else 'failed'] += 1
+    return counts
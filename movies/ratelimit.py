@@ -0,0 +1,211 @@
+"""
+Rate limiting for upstream OMDb traffic and for clients.
+
+``TokenBucket`` paces a single process (the cache warmer). ``SharedTokenBucket``
+keeps its tokens in a small SQLite file instead, so every worker on the host
+draws from the same bucket: the refill and the withdrawal are one conditional
+upsert, which SQLite applies atomically across processes. It backs the OMDb
+budget (``movies.budget``) and ``throttle``, the per-client-IP limit on the
+search views.
+"""
+
+import logging
+import random
+import sqlite3
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+
+from movierec import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket: ``rate`` tokens per second on average, bursts of up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take ``tokens`` if available right now."""
+        with self._lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens=1):
+        """Seconds until ``tokens`` would be available."""
+        with self._lock:
+            self._refill()
+            return max(0.0, (tokens - self.tokens) / self.rate) if self.rate else float('inf')
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until ``tokens`` are taken; False if that would take longer than ``timeout`` seconds."""
+        deadline = None if timeout is None else self._clock() + timeout
+        while not self.try_acquire(tokens):
+            wait = self.wait_time(tokens)
+            if deadline is not None and self._clock() + wait > deadline:
+                return False
+            self._sleep(wait)
+        return True
+
+
+class SharedTokenBucket:
+    """
+    Token bucket shared by every process that opens the same SQLite file.
+
+    ``key`` gives each client its own bucket under ``name``; a full bucket and
+    a missing row mean the same, so idle keys are pruned now and then.
+    """
+
+    SCHEMA = 'CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+
+    # Tokens in the bucket once refilled up to now, for the row being upserted
+    REFILLED = 'MIN(:capacity, token_buckets.tokens + MAX(0, :now - token_buckets.updated) * :rate)'
+
+    # Chance that an acquire on a keyed bucket also prunes idle keys
+    PRUNE_PROBABILITY = 0.01
+
+    def __init__(self, path, name, rate, capacity=None, clock=time.time, timeout=1.0):
+        self.path = Path(path)
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self._timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(self.SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _row(self, key):
+        return self.name if key is None else f'{self.name}:{key}'
+
+    def try_acquire(self, tokens=1, reserve=0, key=None):
+        """Take ``tokens`` if at least ``reserve`` would be left; fails open if the file is unusable."""
+        if tokens + reserve > self.capacity:
+            return False
+        params = {'name': self._row(key), 'tokens': tokens, 'reserve': reserve, 'now': self._clock(),
+                  'rate': self.rate, 'capacity': self.capacity}
+        try:
+            connection = self._connection()
+            changed = connection.execute(
+                'INSERT INTO token_buckets (name, tokens, updated) VALUES (:name, :capacity - :tokens, :now) '
+                f'ON CONFLICT(name) DO UPDATE SET tokens = {self.REFILLED} - :tokens, updated = :now '
+                f'WHERE {self.REFILLED} - :tokens >= :reserve',
+                params,
+            ).rowcount
+            if key is not None and random.random() < self.PRUNE_PROBABILITY:
+                self.prune()
+        except sqlite3.Error:
+            logger.warning("Token bucket %s unavailable; letting the request through", self.path, exc_info=True)
+            return True
+        return changed == 1
+
+    def level(self, key=None):
+        """Tokens currently available."""
+        try:
+            row = self._connection().execute(
+                'SELECT tokens, updated FROM token_buckets WHERE name = ?', [self._row(key)]).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return self.capacity
+        tokens, updated = row
+        return min(self.capacity, tokens + max(0.0, self._clock() - updated) * self.rate)
+
+    def prune(self):
+        """Drop keyed rows that have refilled completely."""
+        full_after = self.capacity / self.rate if self.rate else float('inf')
+        self._connection().execute(
+            "DELETE FROM token_buckets WHERE name LIKE ? AND updated < ?",
+            [f'{self.name}:%', self._clock() - full_after],
+        )
+
+
+def client_ip(request):
+    """The client address, skipping ``RATELIMIT_PROXY_COUNT`` trusted proxies in X-Forwarded-For."""
+    proxies = settings.RATELIMIT_PROXY_COUNT
+    forwarded = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def shared_bucket(name, rate, capacity):
+    """The process's ``SharedTokenBucket`` for ``name`` in ``RATELIMIT_DB``, reused across calls."""
+    path = settings.RATELIMIT_DB
+    key = (str(path), name, rate, capacity)
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = SharedTokenBucket(path, name, rate, capacity)
+        return bucket
+
+
+def throttle(scope, applies=lambda request: True):
+    """
+    Limit each client IP to ``<SCOPE>_RATELIMIT_RATE`` requests per second
+    (bursts of ``<SCOPE>_RATELIMIT_BURST``) for requests where ``applies`` is
+    true; over the limit they get a 429. A rate of 0 turns the limit off.
+    Works on sync and async views.
+    """
+    prefix = scope.upper()
+
+    def refused(request):
+        rate = getattr(settings, f'{prefix}_RATELIMIT_RATE', 0)
+        if not rate or not applies(request):
+            return None
+        bucket = shared_bucket(f'throttle:{scope}', rate, getattr(settings, f'{prefix}_RATELIMIT_BURST', rate))
+        if bucket.try_acquire(key=client_ip(request)):
+            return None
+        metrics.rate_limited.inc(scope=scope)
+        response = HttpResponse("Too many requests; please slow down.", status=429, content_type='text/plain')
+        response['Retry-After'] = str(max(1, round(1 / rate)))
+        return response
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                # The shared bucket is a SQLite write; keep it off the event loop
+                return (await sync_to_async(refused, thread_sensitive=False)(request)
+                        or await view(request, *args, **kwargs))
+            return wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return refused(request) or view(request, *args, **kwargs)
+        return wrapper
+    return decorator
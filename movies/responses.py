@@ -0,0 +1,84 @@
+"""
+Compact, cacheable JSON responses for the public movie API.
+
+``json_response`` encodes with orjson when it is installed (plain ``json``
+with compact separators otherwise) and gives every body a strong ETag, so a
+client or CDN revalidating with ``If-None-Match`` gets a 304 before anything
+is compressed. Bodies worth it are compressed with brotli (when installed) or
+gzip, as the client's ``Accept-Encoding`` allows; each encoding gets its own
+ETag, as a strong validator must, and responses vary on ``Accept-Encoding``.
+"""
+
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Smaller bodies are not worth compressing (same threshold as Django's GZipMiddleware)
+MIN_COMPRESS_SIZE = 200
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def _encodings():
+    encodings = {'gzip': lambda body: gzip.compress(body, compresslevel=6, mtime=0)}
+    if brotli is not None:
+        encodings = {'br': lambda body: brotli.compress(body, quality=5), **encodings}
+    return encodings
+
+
+ENCODINGS = _encodings()
+
+
+def accepted_encoding(request, size):
+    """The preferred encoding the client accepts for a body of ``size`` bytes, or None."""
+    if size < MIN_COMPRESS_SIZE:
+        return None
+    accepted = {
+        token.split(';')[0].strip().lower()
+        for token in request.headers.get('Accept-Encoding', '').split(',')
+        if not token.replace(' ', '').endswith(';q=0')
+    }
+    return next((name for name in ENCODINGS if name in accepted), None)
+
+
+def _cache_headers(response, etag, max_age):
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def json_response(request, payload, max_age=None):
+    """200 with ``payload`` as compact (possibly compressed) JSON, or 304 if the client's copy is current."""
+    max_age = max_age if max_age is not None else settings.MOVIE_API_MAX_AGE
+    body = dumps(payload)
+    encoding = accepted_encoding(request, len(body))
+    digest = hashlib.sha1(body).hexdigest()
+    etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return _cache_headers(not_modified, etag, max_age)
+
+    response = HttpResponse(ENCODINGS[encoding](body) if encoding else body, content_type='application/json')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return _cache_headers(response, etag, max_age)
@@ -0,0 +1,299 @@
+"""
+Local full-text search over ``reviews.Movie`` rows.
+
+Each worker keeps an in-process inverted index of movie titles, actors,
+directors and genres, so searches are answered without calling OMDb. Every
+query term is prefix matched, which keeps search-as-you-type cheap. A query
+with fewer than ``MOVIE_SEARCH_MIN_LOCAL_RESULTS`` local matches goes to OMDb's
+``s=`` search instead, for every page of it, so one result list is never paged
+from two sources. The movies OMDb returns are stored as ``Movie`` rows and
+added to the index so the next search for them stays local. The index only
+holds movies; a search for series or episodes always asks OMDb.
+
+Servers build the index on a thread at startup (``load_in_background``);
+after that it follows the database lazily: at most every
+``MOVIE_SEARCH_SYNC_INTERVAL`` seconds a search reads the rows saved since the
+last sync (``Movie.updated_at``) and the list of IDs, dropping the ones that
+are gone. Only the ID list is read in full, never the whole table.
+"""
+
+import bisect
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from reviews.models import Movie
+from .omdb import afetch_from_omdb, fetch_from_omdb
+
+# Results per page, matching OMDb's search pages
+PAGE_SIZE = 10
+
+# How much a term matching each field counts toward a movie's score
+FIELD_WEIGHTS = {'title': 3.0, 'director': 2.0, 'actors': 2.0, 'genres': 1.5}
+# Multiplier for a term that is only a prefix of the indexed word
+PREFIX_WEIGHT = 0.6
+
+# A row committed late can carry an updated_at just under the last sync's high-water mark
+SYNC_OVERLAP = timedelta(seconds=60)
+
+_token_re = re.compile(r'[a-z0-9]+')
+
+logger = logging.getLogger(__name__)
+
+
+
+def tokenize(text):
+    """Lowercase ASCII word tokens of ``text``, with accents stripped."""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+    return _token_re.findall(text.lower())
+
+
+def search_result(movie):
+    """A ``Movie`` in OMDb's search-result shape."""
+    return {
+        'Title': movie.title,
+        'Year': movie.year or 'N/A',
+        'imdbID': movie.imdb_id,
+        'Type': 'movie',
+        'Poster': movie.poster or 'N/A',
+    }
+
+
+class SearchIndex:
+    """Inverted index from word to ``{imdb_id: weight}``; safe to share between threads."""
+
+    FIELDS = ('imdb_id', 'title', 'year', 'poster', 'director', 'actors', 'genres', 'updated_at')
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.docs = {}  # imdb_id -> search result dict
+            self.postings = defaultdict(dict)
+            self.words = []  # sorted postings keys, for prefix lookups
+            self._doc_words = {}
+            self._tiebreak = {}  # imdb_id -> (title length, title): shorter titles are closer matches
+            self.latest = None  # newest updated_at seen
+            self.checked_at = 0.0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def __contains__(self, imdb_id):
+        return imdb_id in self.docs
+
+    def add(self, movie):
+        """Index ``movie``, replacing any previous version of it."""
+        weights = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for word in set(tokenize(getattr(movie, field))):
+                weights[word] += weight
+
+        with self._lock:
+            self.discard(movie.imdb_id)
+            for word, weight in weights.items():
+                if word not in self.postings:
+                    bisect.insort(self.words, word)
+                self.postings[word][movie.imdb_id] = weight
+            self._doc_words[movie.imdb_id] = list(weights)
+            self.docs[movie.imdb_id] = search_result(movie)
+            self._tiebreak[movie.imdb_id] = (len(movie.title), movie.title)
+
+    def discard(self, imdb_id):
+        with self._lock:
+            for word in self._doc_words.pop(imdb_id, ()):
+                entries = self.postings[word]
+                entries.pop(imdb_id, None)
+                if not entries:
+                    del self.postings[word]
+                    del self.words[bisect.bisect_left(self.words, word)]
+            self.docs.pop(imdb_id, None)
+            self._tiebreak.pop(imdb_id, None)
+
+    def _term_scores(self, term):
+        """``{imdb_id: score}`` for every movie with a word starting with ``term``."""
+        start = bisect.bisect_left(self.words, term)
+        end = bisect.bisect_left(self.words, term + '\x7f')
+        if end - start == 1 and self.words[start] == term:
+            return self.postings[term]  # the common exact-word case; callers do not mutate it
+        scores = {}
+        for word in self.words[start:end]:
+            factor = 1.0 if word == term else PREFIX_WEIGHT
+            for imdb_id, weight in self.postings[word].items():
+                score = weight * factor
+                if score > scores.get(imdb_id, 0):
+                    scores[imdb_id] = score
+        return scores
+
+    def _matches(self, query):
+        """``{imdb_id: score}`` of the movies matching every term of ``query``; call with the lock held."""
+        terms = sorted(set(tokenize(query)), key=len, reverse=True)  # longest (most selective) first
+        totals = {}
+        for position, term in enumerate(terms):
+            scores = self._term_scores(term)
+            if position == 0:
+                totals = scores
+            else:
+                totals = {imdb_id: total + scores[imdb_id] for imdb_id, total in totals.items() if imdb_id in scores}
+            if not totals:
+                break
+        return totals
+
+    def _ranked(self, totals, limit):
+        tiebreak = self._tiebreak
+
+        def rank(imdb_id):
+            return -totals[imdb_id], tiebreak[imdb_id]
+
+        if limit is None:
+            ranked = sorted(totals, key=rank)
+        else:
+            ranked = heapq.nsmallest(limit, totals, key=rank)
+        return [dict(self.docs[imdb_id]) for imdb_id in ranked]
+
+    def search(self, query, limit=None):
+        """Movies matching every term of ``query``, best first, as search-result dicts.
+
+        With ``limit`` only the best ``limit`` matches are ranked, which keeps
+        broad queries (a genre, a one-letter prefix) cheap.
+        """
+        with self._lock:
+            return self._ranked(self._matches(query), limit)
+
+    def page(self, query, start, stop):
+        """``(results, total)``: matches ``start:stop`` of ``search(query)`` and how many match in all."""
+        with self._lock:
+            totals = self._matches(query)
+            return self._ranked(totals, stop)[start:], len(totals)
+
+    def _add_rows(self, movies):
+        for movie in movies:
+            self.add(movie)
+            if self.latest is None or movie.updated_at > self.latest:
+                self.latest = movie.updated_at
+
+    def rebuild(self):
+        with self._lock:
+            self.clear()
+            self._add_rows(Movie.objects.only(*self.FIELDS).iterator(chunk_size=2000))
+            self.checked_at = time.monotonic()
+
+    def sync(self, force=False):
+        """Catch up with rows saved or deleted since the last sync (at most once per interval)."""
+        interval = settings.MOVIE_SEARCH_SYNC_INTERVAL
+        if self.checked_at and not force and time.monotonic() - self.checked_at < interval:
+            return
+        with self._lock:
+            if not self.checked_at:
+                self.rebuild()
+                return
+            self.checked_at = time.monotonic()
+            changed = Movie.objects.only(*self.FIELDS)
+            if self.latest is not None:
+                changed = changed.filter(updated_at__gte=self.latest - SYNC_OVERLAP)
+            self._add_rows(changed)
+            # Deleted rows leave no trace to query for; compare IDs only
+            for imdb_id in self.docs.keys() - set(Movie.objects.values_list('pk', flat=True)):
+                self.discard(imdb_id)
+
+
+index = SearchIndex()
+
+
+def get_index():
+    index.sync()
+    return index
+
+
+def _load():
+    try:
+        index.sync()
+    except Exception:  # e.g. not migrated yet; the first search builds the index instead
+        logger.exception("Could not build the movie search index at startup")
+    finally:
+        connection.close()
+
+
+def load_in_background():
+    """Build this process's index on a thread, so no request waits for the first build."""
+    threading.Thread(target=_load, name='search-index', daemon=True).start()
+
+
+def ingest(results):
+    """Store OMDb search results as ``Movie`` rows and index the movies the index did not know."""
+    new = [
+        Movie(
+            imdb_id=result['imdbID'],
+            title=result.get('Title', '')[:255],
+            year=(result.get('Year') or '')[:16],
+            poster='' if result.get('Poster') in (None, 'N/A') else result['Poster'][:500],
+        )
+        for result in results
+        if result.get('imdbID') and result.get('Type', 'movie') == 'movie' and result['imdbID'] not in index
+    ]
+    if not new:
+        return
+    Movie.objects.bulk_create(new, ignore_conflicts=True)
+    with index._lock:
+        for movie in new:
+            if movie.imdb_id not in index:  # an existing row keeps its richer indexed copy
+                index.add(movie)
+
+
+def _local_page(query, page, movie_type):
+    """``(results, enough)``: the page from the index, and whether the index answers this query."""
+    if movie_type not in (None, '', 'movie'):
+        return [], False
+    start = (page - 1) * PAGE_SIZE
+    local, total = get_index().page(query, start, start + PAGE_SIZE)
+    return local, total >= settings.MOVIE_SEARCH_MIN_LOCAL_RESULTS
+
+
+def _omdb_params(query, page, movie_type):
+    params = {'s': query, 'page': page}
+    if movie_type:
+        params['type'] = movie_type
+    return params
+
+
+def search_movies(query, page=1, movie_type=None):
+    """One page of movies matching ``query``, answered locally when the index has enough matches.
+
+    Otherwise OMDb is asked (through its response cache) and its results are
+    ingested; if OMDb has nothing either, whatever the index found is returned.
+    """
+    local, enough = _local_page(query, page, movie_type)
+    if enough:
+        return local
+
+    data = fetch_from_omdb(_omdb_params(query, page, movie_type))
+    results = (data or {}).get('Search') or []
+    if not results:
+        return local
+    ingest(results)
+    return results
+
+
+async def asearch_movies(query, page=1, movie_type=None):
+    """Async ``search_movies``; only the OMDb fallback is awaited concurrently."""
+    local, enough = await sync_to_async(_local_page)(query, page, movie_type)
+    if enough:
+        return local
+
+    data = await afetch_from_omdb(_omdb_params(query, page, movie_type))
+    results = (data or {}).get('Search') or []
+    if not results:
+        return local
+    await sync_to_async(ingest)(results)
+    return results
@@ -6,9 +6,12 @@ class MovieListSerializer(serializers.Serializer):
     imdbID = serializers.CharField()
     Type = serializers.CharField()
     Poster = serializers.CharField()
+    average_rating = serializers.FloatField(required=False)
+    review_count = serializers.IntegerField(required=False)
 
 
 class MovieDetailSerializer(serializers.Serializer):
+    imdbID = serializers.CharField(required=False)
     Title = serializers.CharField()
     Year = serializers.CharField(required=False)
     Rated = serializers.CharField(required=False, allow_blank=True)
@@ -21,3 +24,21 @@ class MovieDetailSerializer(serializers.Serializer):
     Plot = serializers.CharField(required=False, allow_blank=True)
     Language = serializers.CharField(required=False, allow_blank=True)
     Poster = serializers.CharField(required=False, allow_blank=True)
+    imdbRating = serializers.CharField(required=False, allow_blank=True)
+
+
+class FavoriteItemSerializer(serializers.Serializer):
+    movie_id = serializers.CharField(max_length=50)
+    movie_title = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+    poster_url = serializers.URLField(required=False, allow_blank=True, allow_null=True, default=None)
+
+
+class FavoriteBatchSerializer(serializers.Serializer):
+    add = FavoriteItemSerializer(many=True, required=False, default=list)
+    remove = serializers.ListField(child=serializers.CharField(max_length=50), required=False, default=list)
+
+    def validate(self, data):
+        limit = self.context.get('max_items', 500)
+        if len(data['add']) + len(data['remove']) > limit:
+            raise serializers.ValidationError(f"At most {limit} favorites per batch.")
+        return data
@@ -0,0 +1,24 @@
+"""Background tasks of the movies app, run by ``manage.py run_tasks``."""
+
+from reviews.models import Movie
+from taskqueue.queue import task
+from .metadata import fetch_movie_payload, refresh_movie, store_movie_payload
+
+
+# Both call OMDb; two at a time across all workers keeps a backlog from eating the daily quota in a burst
+@task('movies.enrich_movie', retry_delay=60, concurrency=2)
+def enrich_movie(imdb_id):
+    """Fill in metadata for a movie row created without it (e.g. by the review form)."""
+    movie = Movie.objects.filter(pk=imdb_id).first()
+    if movie is None or movie.has_metadata:
+        return
+    data = fetch_movie_payload(imdb_id, priority='background')
+    if data is None:
+        raise LookupError(f"No OMDb metadata for {imdb_id}")
+    store_movie_payload(imdb_id, data, movie=movie)
+
+
+@task('movies.refresh_movie', retry_delay=60, concurrency=2)
+def refresh_stale_movie(imdb_id):
+    if refresh_movie(imdb_id) is None:
+        raise LookupError(f"No OMDb metadata for {imdb_id}")
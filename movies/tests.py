@@ -1,3 +1,817 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from movierec import metrics
+from movierec.db_router import PrimaryReplicaRouter, replica_reads
+from movierec.middleware import ReplicaRoutingMiddleware
+from recommendations.models import InteractionChange
+from reviews.models import Movie, Review
+from taskqueue.models import Task
+from . import async_views, budget, metadata, omdb, search
+from .fake_omdb import Dataset, FakeOmdbServer
+from .prefetch import warm
+from .ratelimit import SharedTokenBucket, TokenBucket, throttle
+from .models import FavoriteMovie
+from .metadata import get_movie
+from .serializers import MovieListSerializer
+from .views import grid_version, movie_list_items
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-default'},
+    'omdb': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-omdb'},
+}
+
+
+def omdb_response(payload):
+    response = mock.Mock()
+    response.json.return_value = payload
+    response.raise_for_status.return_value = None
+    return response
+
+
+@override_settings(CACHES=TEST_CACHES)
+class OmdbCacheTests(TestCase):
+    def setUp(self):
+        omdb.local_cache.clear()
+        omdb.shared_cache().clear()
+        omdb.stats.reset()
+        omdb.breaker.reset()
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_repeated_lookup_is_served_from_cache(self, get):
+        get.return_value = omdb_response({'Response': 'True', 'Title': 'Heat'})
+        first = omdb.fetch_from_omdb({'i': 'tt0113277'})
+        second = omdb.fetch_from_omdb({'i': ' TT0113277 '})
+        self.assertEqual(first, second)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(omdb.get_cache_stats()['local_hits'], 1)
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_not_found_answers_are_negatively_cached(self, get):
+        get.return_value = omdb_response({'Response': 'False', 'Error': 'Movie not found!'})
+        omdb.fetch_from_omdb({'s': 'zzzz'})
+        omdb.fetch_from_omdb({'s': 'zzzz'})
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(omdb.get_cache_stats()['negative_hits'], 1)
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_stale_entry_is_served_and_refreshed(self, get):
+        get.return_value = omdb_response({'Response': 'True', 'Search': []})
+        params = {'s': 'heat'}
+        omdb.fetch_from_omdb(params)
+        key = omdb.cache_key(params)
+        entry = omdb.local_cache.get(key)
+        entry['fresh_until'] = 0
+        with mock.patch('movies.omdb._schedule_refresh') as schedule:
+            self.assertEqual(omdb.fetch_from_omdb(params), {'Response': 'True', 'Search': []})
+        schedule.assert_called_once_with(key, params)
+        self.assertEqual(omdb.get_cache_stats()['stale_hits'], 1)
+
+    def test_read_timeouts_are_not_retried(self):
+        server = FakeOmdbServer(latency=0.5).start()
+        self.addCleanup(server.stop)
+        omdb._session = None
+        self.addCleanup(setattr, omdb, '_session', None)
+        with override_settings(OMDB_READ_TIMEOUT=0.1, OMDB_MAX_RETRIES=2):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                omdb.get_session().get(server.url, params={'i': 'tt0113277'}, timeout=(1, 0.1))
+        time.sleep(0.5)  # let the server finish counting the slow request
+        self.assertEqual(server.count, 1)
+
+    @override_settings(OMDB_REFRESH_MAX_PENDING=2)
+    def test_background_refreshes_are_bounded(self):
+        release, ran = threading.Event(), []
+
+        def refresh(key, params):
+            release.wait(5)
+            ran.append(key)
+            with omdb._refreshing_lock:
+                omdb._refreshing.discard(key)
+
+        threads = threading.active_count()
+        with mock.patch('movies.omdb._refresh', refresh):
+            for n in range(10):
+                omdb._schedule_refresh(f'k{n}', {'s': str(n)})
+            self.assertEqual(len(omdb._refreshing), 2)
+            self.assertLessEqual(threading.active_count() - threads, 2)
+            release.set()
+            for _ in range(50):
+                if len(ran) == 2:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(sorted(ran), ['k0', 'k1'])
+
+    def test_lru_evicts_oldest_entry(self):
+        cache = omdb.LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(omdb.get_cache_stats()['evictions'], 1)
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_concurrent_misses_share_one_upstream_call(self, get):
+        release = threading.Event()
+
+        def slow_get(*args, **kwargs):
+            release.wait(2)
+            return omdb_response({'Response': 'True', 'Search': []})
+
+        get.side_effect = slow_get
+        threads = [threading.Thread(target=omdb.fetch_from_omdb, args=({'s': 'comedy'},)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(omdb.get_cache_stats()['coalesced'], 3)
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_fetch_many_returns_partial_results_after_deadline(self, get):
+        def get_by_query(url, params, timeout):
+            if params['s'] == 'slow':
+                time.sleep(0.5)
+            return omdb_response({'Response': 'True', 'Search': [params['s']]})
+
+        get.side_effect = get_by_query
+        results = omdb.fetch_many([{'s': 'fast'}, {'s': 'slow'}], timeout=0.2)
+        self.assertEqual(results, [{'Response': 'True', 'Search': ['fast']}, None])
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_open_breaker_fails_fast_and_serves_cached_data(self, get):
+        get.return_value = omdb_response({'Response': 'True', 'Title': 'Heat'})
+        omdb.fetch_from_omdb({'i': 'tt0113277'})
+        entry = omdb.local_cache.get(omdb.cache_key({'i': 'tt0113277'}))
+        entry['fresh_until'] = entry['stale_until'] = 0
+
+        get.side_effect = omdb.requests.exceptions.ConnectionError
+        for _ in range(omdb.breaker.failure_threshold):
+            omdb.fetch_from_omdb({'s': 'unreachable'}, use_cache=False)
+        self.assertEqual(omdb.get_breaker_stats()['state'], 'open')
+
+        get.reset_mock()
+        self.assertIsNone(omdb.fetch_from_omdb({'s': 'anything'}))
+        self.assertEqual(omdb.fetch_from_omdb({'i': 'tt0113277'}), {'Response': 'True', 'Title': 'Heat'})
+        get.assert_not_called()
+        self.assertEqual(omdb.get_cache_stats()['short_circuited'], 1)
+
+    def test_breaker_half_opens_after_reset_timeout(self):
+        breaker = omdb.CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.snapshot()['state'], 'closed')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class MovieMetadataTests(TestCase):
+    def setUp(self):
+        omdb.local_cache.clear()
+        omdb.shared_cache().clear()
+        omdb.breaker.reset()
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_first_view_stores_metadata_and_later_views_skip_omdb(self, get):
+        get.return_value = omdb_response({
+            'Response': 'True', 'imdbID': 'tt0113277', 'Title': 'Heat', 'Year': '1995',
+            'Genre': 'Action, Crime, Drama', 'Director': 'Michael Mann', 'Runtime': '170 min',
+            'Actors': 'Al Pacino, Robert De Niro', 'Plot': 'A group of high-end thieves...',
+            'Poster': 'N/A',
+        })
+        response = self.client.get(reverse('movies-detail-html', args=['tt0113277']))
+        self.assertContains(response, 'Michael Mann')
+
+        movie = Movie.objects.get(pk='tt0113277')
+        self.assertEqual(movie.genres, 'Action, Crime, Drama')
+        self.assertEqual(movie.poster, '')
+        self.assertIsNotNone(movie.fetched_at)
+
+        omdb.local_cache.clear()
+        omdb.shared_cache().clear()
+        get.reset_mock()
+        response = self.client.get(reverse('movies-detail-html', args=['tt0113277']))
+        self.assertContains(response, 'Heat')
+        get.assert_not_called()
+
+    def test_impossible_review_cursor_is_ignored(self):
+        Movie.objects.create(imdb_id='tt0113277', title='Heat', fetched_at=timezone.now())
+        url = reverse('movies-detail-html', args=['tt0113277'])
+        self.assertEqual(self.client.get(url, {'before': '2024-13-01T00:00:00~1'}).status_code, 200)
+
+    def test_overlong_values_are_cut_to_the_column(self):
+        movie = Movie(imdb_id='tt0120737')
+        movie.apply_omdb({'Title': 'Anthology', 'Director': ', '.join(['Some Director'] * 40), 'Rated': 'X' * 40})
+        self.assertEqual(len(movie.director), 255)
+        self.assertEqual(len(movie.rated), 16)
+        movie.full_clean(exclude=['poster'])
+
+    def test_stale_row_is_served_and_refreshed_in_background(self):
+        Movie.objects.create(imdb_id='tt0113277', title='Heat', fetched_at=timezone.now() - timedelta(days=30))
+        with mock.patch('movies.metadata.schedule_refresh') as schedule:
+            movie = get_movie('tt0113277')
+        self.assertEqual(movie.title, 'Heat')
+        schedule.assert_called_once_with('tt0113277')
+
+    def test_stale_views_queue_one_refresh_per_worker(self):
+        metadata.reset_scheduled()
+        Movie.objects.create(imdb_id='tt0113277', title='Heat', fetched_at=timezone.now() - timedelta(days=30))
+        get_movie('tt0113277')
+        with self.assertNumQueries(1):  # the row only; no second INSERT into the queue
+            get_movie('tt0113277')
+        self.assertEqual(Task.objects.filter(key='refresh-movie:tt0113277').count(), 1)
+
+
+@override_settings(CACHES=TEST_CACHES, MOVIE_SEARCH_MIN_LOCAL_RESULTS=1)
+class MovieSearchTests(TestCase):
+    def setUp(self):
+        omdb.local_cache.clear()
+        omdb.shared_cache().clear()
+        omdb.breaker.reset()
+        search.index.clear()
+        now = timezone.now()
+        Movie.objects.create(imdb_id='tt0113277', title='Heat', genres='Action, Crime, Drama',
+                             actors='Al Pacino, Robert De Niro', director='Michael Mann', fetched_at=now)
+        Movie.objects.create(imdb_id='tt0068646', title='The Godfather', genres='Crime, Drama',
+                             actors='Marlon Brando, Al Pacino', director='Francis Ford Coppola', fetched_at=now)
+        Movie.objects.create(imdb_id='tt0114709', title='Toy Story', genres='Animation, Comedy', fetched_at=now)
+
+    def ids(self, query):
+        return [movie['imdbID'] for movie in search.get_index().search(query)]
+
+    def test_prefix_terms_match_title_actor_and_genre(self):
+        self.assertEqual(set(self.ids('paci')), {'tt0113277', 'tt0068646'})
+        self.assertEqual(self.ids('pacino hea'), ['tt0113277'])
+        self.assertEqual(self.ids('godfather'), ['tt0068646'])
+        self.assertEqual(self.ids('anim'), ['tt0114709'])
+        self.assertEqual(self.ids('pacino toy'), [])
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_local_hits_do_not_call_omdb(self, get):
+        response = self.client.get(reverse('movies-list-html'), {'q': 'de niro'})
+        self.assertContains(response, 'Heat')
+        get.assert_not_called()
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_misses_fall_back_to_omdb_and_are_ingested(self, get):
+        get.return_value = omdb_response({'Response': 'True', 'Search': [
+            {'Title': 'Alien', 'Year': '1979', 'imdbID': 'tt0078748', 'Type': 'movie', 'Poster': 'N/A'},
+        ]})
+        self.assertEqual([m['imdbID'] for m in search.search_movies('alien')], ['tt0078748'])
+        self.assertEqual(Movie.objects.get(pk='tt0078748').title, 'Alien')
+
+        omdb.local_cache.clear()
+        omdb.shared_cache().clear()
+        self.assertEqual([m['Title'] for m in search.search_movies('ali')], ['Alien'])
+        self.assertEqual(get.call_count, 1)
+
+    def test_sync_picks_up_rows_written_elsewhere(self):
+        self.assertEqual(self.ids('thief'), [])
+        Movie.objects.create(imdb_id='tt0083190', title='Thief', fetched_at=timezone.now())
+        search.index.sync(force=True)
+        self.assertEqual(self.ids('thief'), ['tt0083190'])
+
+    def test_sync_follows_thin_rows_and_deletes_without_a_rebuild(self):
+        self.assertEqual(self.ids('heat'), ['tt0113277'])
+        Movie.objects.create(imdb_id='tt0083190', title='Thief')  # e.g. from the review form
+        Movie.objects.filter(pk='tt0114709').delete()
+        with mock.patch.object(search.index, 'rebuild') as rebuild:
+            search.index.sync(force=True)
+        rebuild.assert_not_called()
+        self.assertEqual(self.ids('thief'), ['tt0083190'])
+        self.assertEqual(self.ids('toy'), [])
+        self.assertEqual(len(search.index), Movie.objects.count())
+
+    def test_sync_notices_a_delete_when_the_counts_still_match(self):
+        self.assertEqual(self.ids('toy'), ['tt0114709'])
+        # A row the index never saw (back-dated behind the sync watermark) makes up for the deleted one
+        Movie.objects.create(imdb_id='tt0083190', title='Thief')
+        Movie.objects.filter(pk='tt0083190').update(updated_at=timezone.now() - timedelta(days=1))
+        Movie.objects.filter(pk='tt0114709').delete()
+        search.index.sync(force=True)
+        self.assertEqual(self.ids('toy'), [])
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_source_is_chosen_once_per_query(self, get):
+        get.return_value = omdb_response({'Response': 'True', 'totalResults': '30', 'Search': [
+            {'Title': 'Pacino Doc', 'Year': '2001', 'imdbID': 'tt9000001', 'Type': 'movie', 'Poster': 'N/A'},
+        ]})
+        with override_settings(MOVIE_SEARCH_MIN_LOCAL_RESULTS=2):
+            # Two local matches in all: the first page and the (empty) next one both stay local
+            self.assertEqual(len(search.search_movies('pacino')), 2)
+            self.assertEqual(search.search_movies('pacino', page=2), [])
+            get.assert_not_called()
+            # One local match is too few: every page of the query comes from OMDb
+            self.assertEqual([m['imdbID'] for m in search.search_movies('godfather')], ['tt9000001'])
+        self.assertEqual(get.call_count, 1)
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_other_types_are_not_answered_or_ingested_locally(self, get):
+        get.return_value = omdb_response({'Response': 'True', 'Search': [
+            {'Title': 'Heat Wave', 'Year': '2010', 'imdbID': 'tt9000002', 'Type': 'series', 'Poster': 'N/A'},
+        ]})
+        self.assertEqual([m['imdbID'] for m in search.search_movies('heat', movie_type='series')], ['tt9000002'])
+        self.assertEqual(get.call_args.kwargs['params']['type'], 'series')
+        self.assertNotIn('tt9000002', search.index)
+        self.assertEqual([m['imdbID'] for m in search.search_movies('heat', movie_type='movie')], ['tt0113277'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeOmdbServer(latency=0.05).start()
+        cls.enterClassContext(override_settings(OMDB_BASE_URL=cls.server.url))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        omdb.local_cache.clear()
+        omdb.shared_cache().clear()
+        omdb.breaker.reset()
+        search.index.clear()
+        self.server.count = 0
+
+    def get(self, path, data=None):
+        request = AsyncRequestFactory().get(path, data)
+        request.user = AnonymousUser()
+
+        async def auser():
+            return request.user
+        request.auser = auser
+        return request
+
+    async def test_concurrent_misses_share_one_upstream_call(self):
+        results = await asyncio.gather(*(omdb.afetch_from_omdb({'s': 'river'}) for _ in range(5)))
+        self.assertEqual(self.server.count, 1)
+        self.assertEqual(len({result['Search'][0]['imdbID'] for result in results}), 1)
+        await omdb.afetch_from_omdb({'s': 'river'})
+        self.assertEqual(self.server.count, 1)
+
+    async def test_detail_page_stores_metadata(self):
+        response = await async_views.movie_detail_html(self.get('/'), 'tt0000042')
+        self.assertContains(response, 'Movie tt0000042')
+        movie = await Movie.objects.aget(pk='tt0000042')
+        self.assertTrue(movie.has_metadata)
+
+    async def test_search_falls_back_to_omdb_and_ingests(self):
+        response = await async_views.movie_list_html(self.get('/', {'q': 'silent river'}))
+        self.assertContains(response, 'The Silent River')
+        self.assertGreater(await Movie.objects.filter(title__startswith='The Silent River').acount(), 0)
+
+    async def test_homepage_fans_out_concurrently(self):
+        started = time.monotonic()
+        response = await async_views.movie_list_html(self.get('/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.count, 6)
+        self.assertLess(time.monotonic() - started, 6 * 0.05)
+
+
+class FakeOmdbTests(TestCase):
+    def test_dataset_is_seeded_and_searchable(self):
+        dataset = Dataset(200, seed=3)
+        self.assertEqual(dataset.movies, Dataset(200, seed=3).movies)
+        title = next(iter(dataset.movies.values()))['Title']
+        page = dataset.search(title.lower())
+        self.assertEqual(page['Response'], 'True')
+        self.assertTrue(all(result['Title'].startswith(title) for result in page['Search']))
+        self.assertEqual(dataset.search('no such words')['Response'], 'False')
+
+    @override_settings(CACHES=TEST_CACHES)
+    def test_injected_errors_reach_the_client_as_upstream_errors(self):
+        server = FakeOmdbServer(error_rate=1.0).start()
+        self.addCleanup(server.stop)
+        omdb.stats.reset()
+        omdb.breaker.reset()
+        with override_settings(OMDB_BASE_URL=server.url):
+            self.assertIsNone(omdb.fetch_from_omdb({'i': 'tt1000000'}, use_cache=False))
+        self.assertEqual(server.errors, server.count)  # every attempt, retries included, failed
+        self.assertEqual(omdb.stats.snapshot()['upstream_errors'], 1)
+        omdb.breaker.reset()
+
+
+class SyntheticDataTests(TestCase):
+    def test_generated_data_is_consistent(self):
+        call_command('generate_synthetic_data', users=5, movies=30, reviews=200, favorites=20, stdout=StringIO())
+        self.assertEqual((User.objects.count(), Movie.objects.count(), Review.objects.count()), (5, 30, 200))
+        self.assertEqual(FavoriteMovie.objects.count(), 20)
+        movie = Movie.objects.order_by('-review_count').first()
+        self.assertEqual(movie.review_count, movie.reviews.count())
+        self.assertTrue(movie.has_metadata)
+
+        self.client.force_login(User.objects.first())
+        self.assertEqual(self.client.get(reverse('movie-favorites')).status_code, 200)
+
+
+@override_settings(CACHES=TEST_CACHES, REQUEST_METRICS_SAMPLE_RATE=1.0, METRICS_TOKEN='scrape')
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        omdb.local_cache.clear()
+        omdb.shared_cache().clear()
+        omdb.breaker.reset()
+        search.index.clear()
+        metrics.reset()
+        Movie.objects.create(imdb_id='tt0113277', title='Heat', fetched_at=timezone.now())
+
+    def test_sampled_request_reports_db_template_and_omdb_time(self):
+        with mock.patch('movies.omdb.requests.Session.get') as get, \
+                self.assertLogs('movierec.requests', 'INFO') as logs:
+            get.return_value = omdb_response({'Response': 'False', 'Error': 'Movie not found!'})
+            response = self.client.get(reverse('movies-list-html'), {'q': 'zzz'})
+
+        self.assertIn('omdb;desc="1 calls: 1 miss"', response['Server-Timing'])
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual((line['view'], line['status'], line['omdb_cache']), ('movies-list-html', 200, {'miss': 1}))
+        self.assertGreater(line['db_queries'], 0)
+        self.assertGreater(line['template_ms'], 0)
+
+        with self.assertLogs('movierec.requests', 'INFO'):
+            text = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape').content.decode()
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+            self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer sécret').status_code, 403)
+        self.assertIn('movierec_requests_total{status="200",view="movies-list-html"} 1', text)
+        self.assertIn('movierec_omdb_calls_total{cache="miss",view="movies-list-html"} 1', text)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_disabled_sampling_removes_the_middleware(self):
+        response = self.client.get(reverse('movies-detail-html', args=['tt0113277']))
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('movierec_requests_total{', metrics.render_prometheus())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def route(self, request):
+        seen = []
+
+        def view(request):
+            seen.append(PrimaryReplicaRouter().db_for_read(Movie))
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen[0], response
+
+    def test_safe_requests_read_from_replicas_until_the_client_writes(self):
+        factory = RequestFactory()
+        self.assertEqual(self.route(factory.get('/'))[0], 'replica1')
+
+        alias, response = self.route(factory.post('/'))
+        self.assertEqual(alias, 'default')
+        self.assertIn('db_primary', response.cookies)
+
+        factory.cookies['db_primary'] = '1'
+        self.assertEqual(self.route(factory.get('/'))[0], 'default')
+
+    def test_outside_requests_and_transactions_use_the_primary(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(Movie), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Movie), 'replica1')
+            with mock.patch.object(connections['default'], 'in_atomic_block', True):
+                self.assertEqual(router.db_for_read(Movie), 'default')
+        self.assertEqual(router.db_for_write(Movie), 'default')
+        self.assertFalse(router.allow_migrate('replica1', 'movies'))
+
+
+class FavoriteTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='pw')
+        self.api = APIClient()
+        self.api.force_authenticate(self.alice)
+
+    def test_api_toggle_returns_the_new_state_and_logs_the_change(self):
+        url = reverse('favorite-toggle-api')
+        response = self.api.post(url, {'movie_id': 'tt0113277', 'movie_title': 'Heat'}, format='json')
+        self.assertEqual(response.data, {'movie_id': 'tt0113277', 'is_favorite': True})
+        self.assertEqual(FavoriteMovie.objects.get(user=self.alice).movie_title, 'Heat')
+        self.assertEqual(InteractionChange.objects.filter(user_id=self.alice.pk, movie_id='tt0113277').count(), 1)
+
+        response = self.api.post(url, {'movie_id': 'tt0113277'}, format='json')
+        self.assertFalse(response.data['is_favorite'])
+        self.assertFalse(FavoriteMovie.objects.exists())
+        self.assertEqual(self.api.post(url, {}, format='json').status_code, 400)
+
+    def test_html_toggle_still_redirects(self):
+        self.client.login(username='alice', password='pw')
+        response = self.client.post(reverse('toggle-favorite'), {'movie_id': 'tt0113277', 'movie_title': 'Heat'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(FavoriteMovie.objects.filter(user=self.alice, movie_id='tt0113277').exists())
+
+    @override_settings(FAVORITES_BATCH_MAX=3)
+    def test_batch_adds_and_removes_in_one_request(self):
+        FavoriteMovie.objects.create(user=self.alice, movie_id='tt1', movie_title='One')
+        response = self.api.post(reverse('favorite-batch-api'), {
+            'add': [{'movie_id': 'tt2', 'movie_title': 'Two'}, {'movie_id': 'tt1'}], 'remove': ['tt1', 'tt3'],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)  # four items over a limit of three
+
+        response = self.api.post(reverse('favorite-batch-api'), {
+            'add': [{'movie_id': 'tt2', 'movie_title': 'Two'}], 'remove': ['tt1', 'tt3'],
+        }, format='json')
+        self.assertEqual(response.data['favorites'], {'tt2': True, 'tt1': False, 'tt3': False})
+        self.assertEqual(list(FavoriteMovie.objects.values_list('movie_id', flat=True)), ['tt2'])
+
+    @mock.patch('movies.views.FAVORITES_PER_PAGE', 2)
+    def test_favorites_page_is_paginated_by_keyset(self):
+        for n in range(3):
+            FavoriteMovie.objects.create(user=self.alice, movie_id=f'tt{n}', movie_title=f'Movie {n}')
+        self.client.login(username='alice', password='pw')
+        response = self.client.get(reverse('movie-favorites'))
+        self.assertEqual([f.movie_id for f in response.context['favorites']], ['tt2', 'tt1'])
+        response = self.client.get(reverse('movie-favorites'), {'before': response.context['next_cursor']})
+        self.assertEqual([f.movie_id for f in response.context['favorites']], ['tt0'])
+        self.assertIsNone(response.context['next_cursor'])
+        response = self.client.get(reverse('movie-favorites'), {'before': '2024-13-01T00:00:00~1'})
+        self.assertEqual([f.movie_id for f in response.context['favorites']], ['tt2', 'tt1'])
+
+
+@override_settings(CACHES=TEST_CACHES, PAGE_CACHE_TTL=60)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.heat = Movie.objects.create(imdb_id='tt0113277', title='Heat', fetched_at=timezone.now())
+        self.alice = User.objects.create_user('alice', password='pw')
+
+    def test_anonymous_pages_are_served_from_the_cache(self):
+        url = reverse('movies-detail-html', args=['tt0113277'])
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        self.assertIn('Cookie', second['Vary'])
+        self.assertIn('max-age=60', second['Cache-Control'])
+
+        self.client.login(username='alice', password='pw')
+        response = self.client.get(url)
+        self.assertContains(response, 'Submit Review')
+        self.assertNotIn('max-age', response.get('Cache-Control', ''))
+
+    @mock.patch('movies.views.search_movies')
+    def test_card_grid_is_shared_and_reviewed_flags_are_overlaid(self, search_movies):
+        search_movies.return_value = [{'imdbID': 'tt0113277', 'Title': 'Heat', 'Year': '1995', 'Poster': 'N/A'}]
+        Review.objects.create(user=self.alice, movie=self.heat, rating=8, content='Great')
+        self.client.login(username='alice', password='pw')
+        overlay = '.movie-card[data-imdb-id="tt0113277"] .user-reviewed-badge { display: inline-block; }'
+        self.assertContains(self.client.get(reverse('movies-list-html'), {'q': 'heat'}), overlay)
+
+        movies = [dict(search_movies.return_value[0], average_rating=8.0, review_count=1, because='')]
+        key = make_template_fragment_key('movie_grid', [grid_version(movies)])
+        self.assertIn('Heat', cache.get(key))
+
+        # Another user gets the same cached grid without the overlay
+        self.client.force_login(User.objects.create_user('bob'))
+        cache.set(key, '<div class="movies">shared grid</div>')
+        response = self.client.get(reverse('movies-list-html'), {'q': 'heat'})
+        self.assertContains(response, 'shared grid')
+        self.assertNotContains(response, overlay)
+
+
+@override_settings(CACHES=TEST_CACHES, MOVIE_SEARCH_MIN_LOCAL_RESULTS=1)
+class MovieJSONAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        search.index.clear()
+        Movie.objects.create(imdb_id='tt0113277', title='Heat', year='1995', genres='Crime, Drama',
+                             director='Michael Mann', plot='A group of thieves.', fetched_at=timezone.now(),
+                             rating_sum=17, review_count=2)
+
+    def test_detail_is_compact_json_with_stats(self):
+        response = self.client.get(reverse('movie-detail-api', args=['tt0113277']))
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertNotIn(b': ', response.content)
+        data = response.json()
+        self.assertEqual((data['Title'], data['Director'], data['average_rating']), ('Heat', 'Michael Mann', 8.5))
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_etag_revalidation_and_compression(self):
+        url = reverse('movie-detail-api', args=['tt0113277'])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['Title'], 'Heat')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        etag = response['ETag']
+        self.assertNotEqual(etag, self.client.get(url)['ETag'])
+
+        revalidated = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], etag)
+
+    def test_search_and_missing_movie(self):
+        response = self.client.get(reverse('movie-search-api'), {'q': 'heat'})
+        self.assertEqual([movie['imdbID'] for movie in response.json()['results']], ['tt0113277'])
+        self.assertEqual(self.client.get(reverse('movie-search-api')).status_code, 400)
+        with mock.patch('movies.views.get_movie', return_value=None):
+            self.assertEqual(self.client.get(reverse('movie-detail-api', args=['tt0000001'])).status_code, 404)
+
+    def test_fast_path_matches_the_serializer(self):
+        movies = [search.search_result(Movie.objects.get())]
+        expected = MovieListSerializer([{**movies[0], 'average_rating': 8.5, 'review_count': 2}], many=True).data
+        self.assertEqual(movie_list_items(movies), json.loads(json.dumps(expected)))
+
+
+class TokenBucketTests(TestCase):
+    def test_bursts_then_paces(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+        self.assertTrue(bucket.try_acquire())
+        self.assertTrue(bucket.try_acquire())
+        self.assertFalse(bucket.try_acquire())
+        self.assertTrue(bucket.acquire())
+        self.assertAlmostEqual(now[0], 0.5)
+        self.assertFalse(bucket.acquire(2, timeout=0.1))
+
+
+    def test_shared_bucket_is_shared_between_instances(self):
+        now = [0.0]
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = (SharedTokenBucket(f'{tmp}/buckets.sqlite3', 'omdb', rate=1, capacity=2,
+                                               clock=lambda: now[0]) for _ in range(2))
+            self.assertTrue(first.try_acquire())
+            self.assertFalse(second.try_acquire(reserve=1))
+            self.assertTrue(second.try_acquire())
+            self.assertFalse(first.try_acquire())
+            self.assertTrue(first.try_acquire(key='10.0.0.1'))
+            now[0] = 1.0
+            self.assertAlmostEqual(second.level(), 1.0)
+            self.assertTrue(first.try_acquire())
+
+
+@override_settings(CACHES=TEST_CACHES, OMDB_DAILY_QUOTA=1000, OMDB_BUDGET_BURST=4,
+                   OMDB_BUDGET_RESERVE={'detail': 0, 'search': 0.25, 'homepage': 0.5})
+class OmdbBudgetTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.enterContext(override_settings(RATELIMIT_DB=f'{tmp.name}/ratelimit.sqlite3'))
+        omdb.local_cache.clear()
+        omdb.shared_cache().clear()
+        omdb.stats.reset()
+        omdb.breaker.reset()
+        cache.clear()
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_low_priorities_are_refused_first(self, get):
+        get.return_value = omdb_response({'Response': 'True', 'Search': []})
+        self.assertIsNotNone(omdb.fetch_from_omdb({'s': 'heat', 'page': 1}, priority='homepage'))
+        self.assertIsNotNone(omdb.fetch_from_omdb({'s': 'heat', 'page': 2}, priority='homepage'))
+        self.assertIsNone(omdb.fetch_from_omdb({'s': 'heat', 'page': 3}, priority='homepage'))
+        self.assertIsNotNone(omdb.fetch_from_omdb({'s': 'heat', 'page': 4}))
+        self.assertIsNone(omdb.fetch_from_omdb({'s': 'heat', 'page': 5}))
+        self.assertIsNotNone(omdb.fetch_from_omdb({'i': 'tt0113277'}))
+        self.assertEqual(get.call_count, 4)
+        self.assertEqual(omdb.get_cache_stats()['over_budget'], 2)
+        self.assertIn('movierec_omdb_budget_total{outcome="refused",priority="homepage"}',
+                      metrics.render_prometheus())
+
+    async def test_async_lookups_check_the_budget_off_the_event_loop(self):
+        threads = []
+        acquire = budget.acquire
+
+        def record(priority):
+            threads.append(threading.current_thread())
+            return acquire(priority)
+
+        with mock.patch('movies.budget.acquire', record), \
+                override_settings(OMDB_BUDGET_RESERVE={'search': 1.0}):
+            self.assertIsNone(await omdb.afetch_from_omdb({'s': 'heat', 'page': 1}))
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    @mock.patch('movies.omdb.requests.Session.get')
+    def test_homepage_falls_back_to_local_movies(self, get):
+        Movie.objects.create(imdb_id='tt0113277', title='Heat', rating_sum=9, review_count=1)
+        with override_settings(OMDB_BUDGET_RESERVE={'homepage': 1.0}):
+            response = self.client.get(reverse('movies-list-html'))
+        get.assert_not_called()
+        self.assertContains(response, 'Heat')
+
+    @override_settings(SEARCH_RATELIMIT_RATE=0.01, SEARCH_RATELIMIT_BURST=2, MOVIE_SEARCH_MIN_LOCAL_RESULTS=1)
+    def test_searches_are_limited_per_client_ip(self):
+        Movie.objects.create(imdb_id='tt0113277', title='Heat')
+        url = reverse('movies-list-html')
+        for _ in range(2):
+            self.assertEqual(self.client.get(url, {'q': 'heat'}).status_code, 200)
+        response = self.client.get(url, {'q': 'heat'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '100')
+        self.assertEqual(self.client.get(url, {'q': 'heat'}, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    async def test_async_views_are_throttled_off_the_event_loop(self):
+        threads = []
+        try_acquire = SharedTokenBucket.try_acquire
+
+        def record(bucket, *args, **kwargs):
+            threads.append(threading.current_thread())
+            return try_acquire(bucket, *args, **kwargs)
+
+        @throttle('search')
+        async def view(request):
+            return HttpResponse('ok')
+
+        request = AsyncRequestFactory().get('/')
+        with mock.patch.object(SharedTokenBucket, 'try_acquire', record), \
+                override_settings(SEARCH_RATELIMIT_RATE=0.01, SEARCH_RATELIMIT_BURST=1):
+            self.assertEqual((await view(request)).status_code, 200)
+            self.assertEqual((await view(request)).status_code, 429)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.current_thread(), threads)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CacheWarmingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeOmdbServer().start()
+        cls.enterClassContext(override_settings(OMDB_BASE_URL=cls.server.url))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        omdb.local_cache.clear()
+        omdb.shared_cache().clear()
+        omdb.breaker.reset()
+        user = User.objects.create_user('alice')
+        stale = Movie.objects.create(imdb_id='tt1000001', title='Old', fetched_at=timezone.now() - timedelta(days=30))
+        fresh = Movie.objects.create(imdb_id='tt1000002', title='New', fetched_at=timezone.now())
+        Review.objects.create(user=user, movie=stale, rating=8, content='x')
+        Review.objects.create(user=user, movie=fresh, rating=8, content='x')
+        FavoriteMovie.objects.create(user=user, movie_id='tt1000003', movie_title='Unknown')
+        self.limiter = TokenBucket(rate=1000)
+
+    def test_refreshes_due_searches_and_hot_movies_once(self):
+        counts = warm(self.limiter)
+        self.assertEqual(counts, {'refreshed': 30 + 2})
+        self.assertTrue(Movie.objects.get(pk='tt1000003').has_metadata)
+        self.assertGreater(Movie.objects.get(pk='tt1000001').fetched_at, timezone.now() - timedelta(minutes=1))
+        self.assertEqual(warm(self.limiter), {})
+
+    def test_budget_caps_upstream_calls(self):
+        calls = self.server.count
+        self.assertEqual(warm(self.limiter, budget=5), {'refreshed': 5, 'skipped': 27})
+        self.assertEqual(self.server.count - calls, 5)
+
+
+class MovieDetailReviewsTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(imdb_id='tt0113277', title='Heat', fetched_at=timezone.now())
+
+    def add_reviews(self, count):
+        for i in range(count):
+            user = User.objects.create_user(f'user{Review.objects.count()}')
+            Review.objects.create(user=user, movie=self.movie, rating=7, content=f'review {i}')
+
+    def query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('movies-detail-html', args=['tt0113277']))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_constant_in_review_volume(self):
+        self.add_reviews(1)
+        baseline = self.query_count()
+        self.add_reviews(45)
+        self.assertEqual(self.query_count(), baseline)
+
+    def test_reviews_are_paginated_by_keyset(self):
+        self.add_reviews(25)
+        url = reverse('movies-detail-html', args=['tt0113277'])
+        first = self.client.get(url)
+        self.assertEqual(len(first.context['reviews']), 20)
+        second = self.client.get(url, {'before': first.context['next_cursor']})
+        self.assertEqual([review.content for review in second.context['reviews']],
+                         [f'review {i}' for i in range(4, -1, -1)])
+        self.assertIsNone(second.context['next_cursor'])
@@ -1,9 +1,19 @@
-from django.urls import path
-from . import views
+from django.conf import settings
+from django.urls import path, re_path
+from . import async_views, views
+
+# Under ASGI the OMDb-bound pages are served by their async versions
+page_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('html/', views.movie_list_html, name='movies-list-html'),
-    path('html/<str:movie_id>/', views.movie_detail_html, name='movies-detail-html'),
+    path('', views.MovieListView.as_view(), name='movie-list-api'),
+    path('search/', views.MovieSearchView.as_view(), name='movie-search-api'),
+    re_path(r'^(?P<movie_id>tt\d+)/$', views.MovieDetailJSONView.as_view(), name='movie-detail-api'),
+    path('html/', page_views.movie_list_html, name='movies-list-html'),
+    path('html/<str:movie_id>/', page_views.movie_detail_html, name='movies-detail-html'),
     path('favorites/', views.favorite_list_view, name='movie-favorites'),
     path('favorite/toggle/', views.toggle_favorite_view, name='toggle-favorite'),
-]
\ No newline at end of file
+    path('favorites/toggle/', views.FavoriteToggleView.as_view(), name='favorite-toggle-api'),
+    path('favorites/batch/', views.FavoriteBatchView.as_view(), name='favorite-batch-api'),
+    path('omdb/stats/', views.omdb_stats_view, name='omdb-stats'),
+]
@@ -1,15 +1,31 @@
-import os
+import hashlib
 import random
-import requests
+from django.conf import settings
 from django.shortcuts import render, redirect
-from dotenv import load_dotenv
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Count
+from django.utils.decorators import method_decorator
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+from recommendations.content import index_version, similar_movies
+from recommendations.feeds import get_user_feed, popular_movies
 from reviews.models import Review, Movie
-from .models import FavoriteMovie, FavoriteMovie
-
-load_dotenv()
-OMDB_API_KEY = os.getenv("OMDB_API_KEY")
+from reviews.stats import movie_states, movie_stats
+from rest_framework import generics
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from .favorites import toggle_favorite, update_favorites
+from .budget import get_budget_stats
+from .models import FavoriteMovie
+from .metadata import get_movie
+from .page_cache import cache_anonymous_page
+from .omdb import fetch_many, get_breaker_stats, get_cache_stats
+from .ratelimit import throttle
+from .responses import json_response
+from .search import search_movies
+from .serializers import FavoriteBatchSerializer, FavoriteItemSerializer, MovieDetailSerializer, MovieListSerializer
 
 # Genres for random recommendation
 GENRES = ["Romance", "Comedy", "Action", "Horror", "Animation", "Sci-Fi"]
@@ -17,169 +33,353 @@ GENRES = ["Romance", "Comedy", "Action", "Horror", "Animation", "Sci-Fi"]
 # Number of movies per genre recommendation
 MOVIES_PER_GENRE = 12
 
-def fetch_from_omdb(params):
-    """Helper function to fetch data from OMDB API with error handling."""
-    base_url = "http://www.omdbapi.com/"
-    params['apikey'] = OMDB_API_KEY
-    try:
-        response = requests.get(base_url, params=params, timeout=10)
-        response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-        return response.json()
-    except (requests.exceptions.RequestException, requests.exceptions.ConnectionError):
-        # Return None or an empty dict if the request fails
-        return None
+# The logged-out homepage picks from the first pages of each genre search
+HOMEPAGE_PAGES = 5
 
-def movie_list_html(request):
-    query = request.GET.get("q")
-    top_rated_btn = request.GET.get("top_rated")
-    genre_filter = request.GET.get("genre")
+# Reviews shown per page on the movie detail page
+REVIEWS_PER_PAGE = 20
+
+# Favorites shown per page on the favorites page
+FAVORITES_PER_PAGE = 24
+
+# Movie fields the shared card grid renders; a change to any of them re-renders the grid
+GRID_FIELDS = ('imdbID', 'Title', 'Year', 'Poster', 'because', 'average_rating', 'review_count')
+
+# Keys of each movie in the JSON list API, and values for those a source leaves out
+LIST_FIELDS = tuple(MovieListSerializer().fields)
+LIST_DEFAULTS = {'Type': 'movie', 'Poster': 'N/A', 'Year': 'N/A'}
+
+def is_search(request):
+    """Whether a movie list request is a search (query, top rated or genre) rather than the homepage."""
+    return any(request.GET.get(name) for name in ("q", "top_rated", "genre"))
+
+
+def list_params(request):
+    """``(query, top_rated, genre, page)`` from the movie list's query string."""
     try:
         page = int(request.GET.get("page", 1))
     except ValueError:
         page = 1
+    return request.GET.get("q"), request.GET.get("top_rated"), request.GET.get("genre"), page
+
+
+def homepage_params():
+    """One random OMDb search page per genre, for the logged-out homepage."""
+    return [
+        {
+            's': genre,
+            'type': 'movie',
+            'page': random.randint(1, HOMEPAGE_PAGES) # Search within the first pages for variety
+        }
+        for genre in GENRES
+    ]
+
+
+def list_context(movies, user, genre_filter, page):
+    """Template context for the movie list, with review stats and the user's flags on each movie."""
+    # Remove duplicates that might arise from random selections
+    unique_movies_dict = {movie['imdbID']: movie for movie in movies}
+    imdb_ids = list(unique_movies_dict.keys())
+
+    # Review stats (precomputed on Movie, cached per movie) and the user's
+    # favorite/reviewed flags, in at most two queries
+    states = movie_states(user, imdb_ids)
+    for imdb_id, movie in unique_movies_dict.items():
+        movie.update(states[imdb_id])
+
+    movies = list(unique_movies_dict.values())
+    return {
+        "movies": movies,
+        "genres": GENRES,
+        "current_genre": genre_filter or "",
+        "current_page": page,
+        # The card grid is rendered once per distinct content and shared by
+        # every user; the user's flags are overlaid outside the cached fragment.
+        "grid_version": grid_version(movies),
+        "reviewed_ids": [movie['imdbID'] for movie in movies if movie['user_has_reviewed']],
+        "fragment_ttl": settings.FRAGMENT_CACHE_TTL,
+    }
 
+
+def grid_version(movies):
+    """Digest of everything the shared movie card grid shows, for its fragment cache key."""
+    digest = hashlib.sha1()
+    for movie in movies:
+        for key in GRID_FIELDS:
+            digest.update(f"{movie.get(key, '')}\x1f".encode())
+    return digest.hexdigest()
+
+
+def homepage_fallback():
+    """Locally known popular movies, for a homepage OMDb could not fill (outage or budget)."""
+    return [dict(item) for item in popular_movies()]
+
+
+@cache_anonymous_page
+@throttle('search', applies=is_search)
+def movie_list_html(request):
+    query, top_rated_btn, genre_filter, page = list_params(request)
     movies = []
 
     if query:
-        # Search by user query
-        params = {'s': query, 'page': page}
-        data = fetch_from_omdb(params)
-        if data:
-            movies = data.get("Search", [])
+        # Search by user query, answered from the local index where possible
+        movies = search_movies(query, page)
 
     elif top_rated_btn:
-        # Fetch a single page of top-rated movies to reduce API calls
-        params = {'s': 'top rated', 'page': page}
-        data = fetch_from_omdb(params)
-        if data:
-            movies = data.get("Search", [])
+        # A single page of top-rated movies
+        movies = search_movies('top rated', page)
 
     elif genre_filter:
-        # Fetch a single page for the selected genre
-        params = {'s': genre_filter, 'page': page}
-        data = fetch_from_omdb(params)
-        if data:
-            movies = data.get("Search", [])
+        # A single page for the selected genre
+        movies = search_movies(genre_filter, page)
+
+    elif request.user.is_authenticated and (feed := get_user_feed(request.user)):
+        # Logged-in users get their precomputed recommendation feed; no OMDb calls
+        movies = [dict(item) for item in feed]
 
     else:
-        # Optimized: Fetch one random movie from each genre
-        for genre in GENRES:
-            params = {
-                's': genre,
-                'type': 'movie',
-                'page': random.randint(1, 5) # Search within first 5 pages for variety
-            }
-            data = fetch_from_omdb(params)
+        # Fetch one random movie from each genre, all genres concurrently.
+        # Genres that miss the deadline are simply left out of this render.
+        deadline = settings.OMDB_HOMEPAGE_DEADLINE
+        for data in fetch_many(homepage_params(), timeout=deadline, priority='homepage'):
             if data and data.get("Search"):
                 movies.append(random.choice(data["Search"]))
+        movies = movies or homepage_fallback()
 
-    # Remove duplicates that might arise from random selections
-    unique_movies_dict = {movie['imdbID']: movie for movie in movies}
-    imdb_ids = list(unique_movies_dict.keys())
+    return render(request, "movies/movie_list.html", list_context(movies, request.user, genre_filter, page))
 
-    # Fetch review statistics for the movies being displayed
-    review_stats = Review.objects.filter(movie__imdb_id__in=imdb_ids).values('movie__imdb_id').annotate(
-        average_rating=Avg('rating'),
-        review_count=Count('id')
-    )
 
-    # Create a dictionary for easy lookup of review stats
-    stats_map = {stat['movie__imdb_id']: stat for stat in review_stats}
-
-    # Check which movies are in the user's favorites
-    user_favorited_ids = set()
-    if request.user.is_authenticated:
-        user_favorited_ids = set(FavoriteMovie.objects.filter(
-            user=request.user,
-            movie_id__in=imdb_ids
-        ).values_list('movie_id', flat=True))
-
-    # Check which movies the current user has reviewed
-    user_reviewed_ids = set()
-    if request.user.is_authenticated:
-        user_reviewed_ids = set(Review.objects.filter(
-            user=request.user,
-            movie__imdb_id__in=imdb_ids
-        ).values_list('movie__imdb_id', flat=True))
-
-    # Add review stats and favorite status to each movie
-    for imdb_id, movie in unique_movies_dict.items():
-        stats = stats_map.get(imdb_id)
-        movie['average_rating'] = round(stats['average_rating'], 1) if stats else 0
-        movie['review_count'] = stats['review_count'] if stats else 0
-        movie['is_favorite'] = imdb_id in user_favorited_ids
-        movie['user_has_reviewed'] = imdb_id in user_reviewed_ids
-    
-    return render(request, "movies/movie_list.html", {
-        "movies": list(unique_movies_dict.values()),
-        "genres": GENRES,
-        "current_genre": genre_filter or "",
-        "current_page": page
-    })
+def detail_context(movie, reviews, next_cursor, **extra):
+    """Template context for the detail page.
+
+    The metadata block is cached per movie and metadata version, and "more
+    like this" per movie and content index build; ``similar`` is a callable
+    so the lookup only runs when its fragment is not cached.
+    """
+    return {
+        "movie": movie.as_omdb(),
+        "movie_version": movie.fetched_at.isoformat() if movie.fetched_at else movie.title,
+        "similar": lambda: similar_movies(movie.imdb_id),
+        "similar_version": index_version(),
+        "fragment_ttl": settings.FRAGMENT_CACHE_TTL,
+        "reviews": reviews,
+        "next_cursor": next_cursor,
+        **extra,
+    }
 
 
+@cache_anonymous_page
 def movie_detail_html(request, movie_id):
-    """Fetches and displays detailed information for a single movie."""
-    # Fetch movie details from OMDB
-    movie_data = fetch_from_omdb({'i': movie_id, 'plot': 'full'})
-    if not movie_data or movie_data.get('Response') == 'False':
+    """Displays detailed information for a single movie from the local metadata store."""
+    movie = get_movie(movie_id)
+    if movie is None:
         return render(request, '404.html', {'message': f"Movie with ID '{movie_id}' not found."}, status=404)
 
-    # Find or create movie in local DB to associate reviews with
-    movie, created = Movie.objects.get_or_create(
-        imdb_id=movie_id,
-        defaults={'title': movie_data.get('Title', 'N/A')}
-    )
-
     if request.method == 'POST':
         if not request.user.is_authenticated:
             return redirect('login')
 
-        rating = request.POST.get('rating')
-        content = request.POST.get('content')
-        error_message = None
-
-        try:
-            rating_int = int(rating)
-            if not 1 <= rating_int <= 10:
-                raise ValueError("Rating must be between 1 and 10.")
-
-            if content:
-                Review.objects.create(user=request.user, movie=movie, rating=rating_int, content=content)
-                return redirect('movies-detail-html', movie_id=movie_id)
-        except (ValueError, TypeError):
-            error_message = "Invalid rating. Please provide a number between 1 and 10."
-        
+        rating_int, content, error_message = review_form(request.POST)
+        if rating_int is not None and content:
+            Review.objects.create(user=request.user, movie=movie, rating=rating_int, content=content)
+            return redirect('movies-detail-html', movie_id=movie_id)
+
         # Re-render page with error if submission fails
-        reviews = Review.objects.filter(movie=movie).order_by('-created_at')
-        context = {'movie': movie_data, 'reviews': reviews, 'error_message': error_message}
+        reviews, next_cursor = review_page(movie)
+        context = detail_context(movie, reviews, next_cursor, error_message=error_message)
         return render(request, 'movies/movie_detail.html', context)
 
-    reviews = Review.objects.filter(movie=movie).order_by('-created_at')
-    return render(request, "movies/movie_detail.html", {"movie": movie_data, "reviews": reviews})
+    reviews, next_cursor = review_page(movie, request.GET.get('before'))
+    return render(request, "movies/movie_detail.html", detail_context(movie, reviews, next_cursor))
+
+
+def review_form(data):
+    """``(rating, content, error_message)`` from a posted review; rating is None when invalid."""
+    try:
+        rating_int = int(data.get('rating'))
+        if not 1 <= rating_int <= 10:
+            raise ValueError("Rating must be between 1 and 10.")
+    except (ValueError, TypeError):
+        return None, data.get('content'), "Invalid rating. Please provide a number between 1 and 10."
+    return rating_int, data.get('content'), None
+
+
+def parse_cursor(cursor):
+    """``(timestamp, id)`` from a ``<iso timestamp>~<id>`` page cursor, or None if it is malformed."""
+    timestamp, _, pk = (cursor or '').rpartition('~')
+    try:
+        timestamp = parse_datetime(timestamp)
+    except ValueError:  # well-formed but impossible, e.g. month 13
+        return None
+    if timestamp is None or not pk.isdigit():
+        return None
+    return timestamp, int(pk)
+
+
+def review_page(movie, cursor=None):
+    """One page of a movie's reviews, newest first, and the cursor for the next page.
+
+    Keyset pagination on (created_at, id): the cursor is the position of the
+    last review shown, so deep pages cost the same as the first one.
+    """
+    reviews = (
+        Review.objects.filter(movie=movie)
+        .select_related('user')
+        .only('id', 'rating', 'content', 'created_at', 'user__username')
+        .order_by('-created_at', '-id')
+    )
+    position = parse_cursor(cursor)
+    if position:
+        created_at, review_id = position
+        reviews = reviews.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=review_id))
+
+    page = list(reviews[:REVIEWS_PER_PAGE + 1])
+    next_cursor = None
+    if len(page) > REVIEWS_PER_PAGE:
+        page = page[:REVIEWS_PER_PAGE]
+        next_cursor = f"{page[-1].created_at.isoformat()}~{page[-1].id}"
+    return page, next_cursor
 
 
 @login_required
 def toggle_favorite_view(request):
     """Add or remove a movie from the user's favorites."""
-    if request.method == 'POST':
-        movie_id = request.POST.get('movie_id')
-        movie_title = request.POST.get('movie_title')
-        poster_url = request.POST.get('poster_url')
-
-        favorite, created = FavoriteMovie.objects.get_or_create(
-            user=request.user,
-            movie_id=movie_id,
-            defaults={'movie_title': movie_title, 'poster_url': poster_url}
+    if request.method == 'POST' and request.POST.get('movie_id'):
+        toggle_favorite(
+            request.user, request.POST['movie_id'], request.POST.get('movie_title'), request.POST.get('poster_url'),
         )
 
-        if not created:
-            # If the favorite already existed, delete it
-            favorite.delete()
-
     return redirect(request.META.get('HTTP_REFERER', 'movies-list-html'))
 
+
+def favorite_page(user, cursor=None):
+    """One page of the user's favorites, newest first, and the cursor for the next page.
+
+    Keyset pagination on (date_added, id), served by the (user, date_added, id) index.
+    """
+    favorites = FavoriteMovie.objects.filter(user=user).order_by('-date_added', '-id')
+    position = parse_cursor(cursor)
+    if position:
+        date_added, favorite_id = position
+        favorites = favorites.filter(Q(date_added__lt=date_added) | Q(date_added=date_added, id__lt=favorite_id))
+
+    page = list(favorites[:FAVORITES_PER_PAGE + 1])
+    next_cursor = None
+    if len(page) > FAVORITES_PER_PAGE:
+        page = page[:FAVORITES_PER_PAGE]
+        next_cursor = f"{page[-1].date_added.isoformat()}~{page[-1].id}"
+    return page, next_cursor
+
+
 @login_required
 def favorite_list_view(request):
-    favorites = FavoriteMovie.objects.filter(user=request.user)
-    return render(request, 'movies/favorites.html', {'favorites': favorites})
+    favorites, next_cursor = favorite_page(request.user, request.GET.get('before'))
+    # Prefer locally stored metadata over the title/poster copied at favorite time
+    movies = Movie.objects.in_bulk([favorite.movie_id for favorite in favorites])
+    for favorite in favorites:
+        favorite.movie = movies.get(favorite.movie_id)
+    return render(request, 'movies/favorites.html', {'favorites': favorites, 'next_cursor': next_cursor})
+
+@staff_member_required
+def omdb_stats_view(request):
+    """Cache counters and circuit breaker state of this worker's OMDb client, and the shared budget."""
+    return JsonResponse({
+        'cache': get_cache_stats(),
+        'circuit_breaker': get_breaker_stats(),
+        'budget': get_budget_stats(),
+    })
+
+
+# -------------------------
+# DRF API Views
+# -------------------------
+
+class FavoriteToggleView(generics.GenericAPIView):
+    """Flip one favorite; responds with its new state instead of redirecting."""
+    serializer_class = FavoriteItemSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        is_favorite = toggle_favorite(request.user, data['movie_id'], data['movie_title'], data['poster_url'])
+        return Response({'movie_id': data['movie_id'], 'is_favorite': is_favorite})
+
+
+class FavoriteBatchView(generics.GenericAPIView):
+    """Add and remove many favorites in one transaction: ``{"add": [{...}], "remove": ["tt..."]}``."""
+    serializer_class = FavoriteBatchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'max_items': settings.FAVORITES_BATCH_MAX}
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        favorites = update_favorites(
+            request.user,
+            add=[(item['movie_id'], item['movie_title'], item['poster_url']) for item in data['add']],
+            remove=data['remove'],
+        )
+        return Response({'favorites': favorites})
+
+
+def movie_list_items(movies):
+    """
+    ``MovieListSerializer``'s output for ``movies`` with their review stats,
+    built as plain dicts: the same shape without DRF's per-field work, which
+    dominates serializing a long list.
+    """
+    stats = movie_stats([movie['imdbID'] for movie in movies])
+    return [
+        {field: movie.get(field, LIST_DEFAULTS.get(field)) for field in LIST_FIELDS} | stats[movie['imdbID']]
+        for movie in movies
+    ]
+
+
+def list_payload(movies, page):
+    return {'page': page, 'results': movie_list_items(list({movie['imdbID']: movie for movie in movies}.values()))}
+
+
+class PublicMovieAPIView(generics.GenericAPIView):
+    """Base for the JSON movie API: the same answer for everyone, so it skips authentication and is CDN-cacheable."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+
+class MovieListView(PublicMovieAPIView):
+    """Movies as JSON: ``?genre=`` or ``?top_rated=1`` pages, otherwise the locally popular movies."""
+
+    def get(self, request):
+        _, top_rated, genre, page = list_params(request)
+        if top_rated or genre:
+            movies = search_movies('top rated' if top_rated else genre, page)
+        else:
+            movies = popular_movies()
+        return json_response(request, list_payload(movies, page))
+
+
+@method_decorator(throttle('search'), name='dispatch')
+class MovieSearchView(PublicMovieAPIView):
+    """``?q=`` search as JSON, answered like the HTML search (local index first, then OMDb)."""
+
+    def get(self, request):
+        query, _, _, page = list_params(request)
+        if not query or not query.strip():
+            raise ValidationError({'q': "A search query is required."})
+        return json_response(request, {'query': query, **list_payload(search_movies(query, page), page)})
+
+
+class MovieDetailJSONView(PublicMovieAPIView):
+    """One movie's metadata from the local store, plus its review stats."""
+
+    def get(self, request, movie_id):
+        movie = get_movie(movie_id)
+        if movie is None:
+            raise NotFound(f"Movie with ID '{movie_id}' not found.")
+        payload = MovieDetailSerializer(movie.as_omdb()).data
+        payload.update(average_rating=movie.average_rating, review_count=movie.review_count)
+        return json_response(request, payload)
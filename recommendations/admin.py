@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import MovieNeighbor
+
+@admin.register(MovieNeighbor)
+class MovieNeighborAdmin(admin.ModelAdmin):
+    list_display = ('movie_id', 'rank', 'neighbor_id', 'score')
+    search_fields = ('movie_id', 'neighbor_id')
@@ -0,0 +1,249 @@
+"""
+Content-based "more like this" from OMDb metadata.
+
+Every movie with metadata becomes a TF-IDF vector over hashed features of its
+genres, director, actors, language and plot words, L2-normalized so a dot
+product is the cosine similarity. Unlike the collaborative model this needs
+no reviews, so a title nobody has rated yet still gets neighbours.
+
+``build_content_index`` writes the index as plain ``.npy`` files (the vectors
+as CSR rows, the same matrix as CSC postings per feature, the idf weights and
+the movie IDs) into a fresh directory, then publishes it by atomically
+replacing ``current.json``. Workers open the files with ``mmap_mode='r'``, so
+every worker on a host shares one page-cache copy, and pick up a new build
+within ``CONTENT_INDEX_RELOAD_INTERVAL`` seconds.
+
+A query sums the postings of the movie's features with one ``bincount`` and
+partitions out the top K: a few milliseconds on tens of thousands of movies,
+without touching the database. Movies enriched after the last build are
+vectorized on the fly from the stored idf weights.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from scipy import sparse
+
+from movies.search import tokenize
+from reviews.models import Movie
+
+# Hashed feature space; collisions only blur rare features together
+N_FEATURES = 2 ** 18
+
+# Term weight of one value of each field (plot words count per occurrence)
+FIELD_WEIGHTS = {'genre': 2.0, 'director': 1.5, 'actor': 1.0, 'language': 0.5, 'plot': 0.25}
+
+# First few billed actors only; the tail of a cast list says little about the movie
+MAX_ACTORS = 4
+
+PLOT_STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his in into is it its of on or that the their them
+they this to was when where which while who whom will with after before about against between during
+through over under again then once there these those what how all any both each few more most other
+some such only own same than too very can just one two new life find must
+""".split())
+
+ARRAYS = ('ids', 'row_indptr', 'row_indices', 'row_data', 'col_indptr', 'col_indices', 'col_data', 'idf')
+
+
+
+def index_dir():
+    return Path(settings.CONTENT_INDEX_DIR)
+
+
+def _feature(field, token):
+    return zlib.crc32(f'{field}:{token}'.encode()) & (N_FEATURES - 1)
+
+
+def _names(value):
+    return [name.strip().lower() for name in (value or '').split(',') if name.strip() and name.strip() != 'n/a']
+
+
+def movie_terms(movie):
+    """``{feature: term weight}`` for a ``Movie`` row."""
+    terms = Counter()
+    for field, values in (
+        ('genre', _names(movie.genres)),
+        ('director', _names(movie.director)),
+        ('actor', _names(movie.actors)[:MAX_ACTORS]),
+        ('language', _names(movie.language)[:1]),
+    ):
+        for value in values:
+            terms[_feature(field, value)] += FIELD_WEIGHTS[field]
+    for word in tokenize(movie.plot):
+        if len(word) > 2 and word not in PLOT_STOPWORDS and not word.isdigit():
+            terms[_feature('plot', word)] += FIELD_WEIGHTS['plot']
+    return terms
+
+
+def build_matrix(term_rows):
+    """L2-normalized TF-IDF CSR matrix and idf weights from one ``{feature: tf}`` dict per movie."""
+    indptr = np.zeros(len(term_rows) + 1, dtype=np.int64)
+    indices, data = [], []
+    for i, terms in enumerate(term_rows):
+        indices.extend(terms)
+        data.extend(terms.values())
+        indptr[i + 1] = len(indices)
+    matrix = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), indptr),
+        shape=(len(term_rows), N_FEATURES),
+    )
+    df = np.bincount(matrix.indices, minlength=N_FEATURES)
+    idf = (np.log((1 + len(term_rows)) / (1 + df)) + 1).astype(np.float32)
+    matrix = matrix.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags(1 / norms).dot(matrix).astype(np.float32).tocsr()
+    return matrix, idf
+
+
+def build(directory=None, batch_size=2000):
+    """Vectorize every movie with metadata and publish a new index; returns a summary dict."""
+    root = Path(directory or index_dir())
+    fields = ('imdb_id', 'genres', 'director', 'actors', 'language', 'plot')
+    movies = Movie.objects.filter(fetched_at__isnull=False).only(*fields).order_by('imdb_id')
+    ids, rows = [], []
+    for movie in movies.iterator(chunk_size=batch_size):
+        terms = movie_terms(movie)
+        if terms:
+            ids.append(movie.imdb_id)
+            rows.append(terms)
+    matrix, idf = build_matrix(rows)
+    columns = matrix.tocsc()
+
+    version = timezone.now().strftime('%Y%m%d%H%M%S%f')
+    target = root / version
+    target.mkdir(parents=True)
+    arrays = {
+        'ids': np.asarray(ids, dtype=str),
+        'row_indptr': matrix.indptr.astype(np.int64), 'row_indices': matrix.indices.astype(np.int32),
+        'row_data': matrix.data.astype(np.float32),
+        'col_indptr': columns.indptr.astype(np.int64), 'col_indices': columns.indices.astype(np.int32),
+        'col_data': columns.data.astype(np.float32),
+        'idf': idf,
+    }
+    for name, array in arrays.items():
+        np.save(target / f'{name}.npy', array)
+
+    pointer = root / 'current.json'
+    previous = json.loads(pointer.read_text())['version'] if pointer.exists() else None
+    tmp = root / f'current.json.{os.getpid()}'
+    tmp.write_text(json.dumps({'version': version, 'movies': len(ids), 'nnz': int(matrix.nnz)}))
+    os.replace(tmp, pointer)
+
+    # Keep the build before this one: a worker may have it open until its next reload check
+    for old in root.iterdir():
+        if old.is_dir() and old.name not in (version, previous):
+            shutil.rmtree(old, ignore_errors=True)
+    return {'version': version, 'movies': len(ids), 'nnz': int(matrix.nnz),
+            'bytes': sum(array.nbytes for array in arrays.values())}
+
+
+class ContentIndex:
+    """A published index, memory-mapped."""
+
+    def __init__(self, directory, version):
+        path = Path(directory) / version
+        self.version = version
+        arrays = {name: np.load(path / f'{name}.npy', mmap_mode='r') for name in ARRAYS}
+        self.ids = arrays['ids']
+        self.position = {imdb_id: i for i, imdb_id in enumerate(self.ids.tolist())}
+        self.row_indptr, self.row_indices, self.row_data = arrays['row_indptr'], arrays['row_indices'], arrays['row_data']
+        self.col_indptr, self.col_indices, self.col_data = arrays['col_indptr'], arrays['col_indices'], arrays['col_data']
+        self.idf = arrays['idf']
+
+    def __len__(self):
+        return len(self.ids)
+
+    def vector(self, imdb_id):
+        """``(features, weights)`` of a movie: its stored row, or computed from the local metadata."""
+        i = self.position.get(imdb_id)
+        if i is not None:
+            start, end = self.row_indptr[i], self.row_indptr[i + 1]
+            return np.asarray(self.row_indices[start:end]), np.asarray(self.row_data[start:end])
+        movie = Movie.objects.filter(pk=imdb_id, fetched_at__isnull=False).first()
+        terms = movie_terms(movie) if movie else None
+        if not terms:
+            return None
+        features = np.fromiter(terms, dtype=np.int32, count=len(terms))
+        weights = np.fromiter(terms.values(), dtype=np.float32, count=len(terms)) * self.idf[features]
+        return features, weights / (np.linalg.norm(weights) or 1)
+
+    def similar(self, imdb_id, k=10):
+        """Up to ``k`` ``(imdb_id, score)`` pairs most like ``imdb_id``, best first."""
+        vector = self.vector(imdb_id)
+        if vector is None or not len(self):
+            return []
+        features, weights = vector
+        starts, ends = self.col_indptr[features], self.col_indptr[features + 1]
+        lengths = ends - starts
+        if not lengths.sum():
+            return []
+        postings = np.concatenate([self.col_indices[s:e] for s, e in zip(starts, ends)])
+        contributions = np.concatenate([self.col_data[s:e] for s, e in zip(starts, ends)]) * np.repeat(weights, lengths)
+        scores = np.bincount(postings, weights=contributions, minlength=len(self))
+        own = self.position.get(imdb_id)
+        if own is not None:
+            scores[own] = 0
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(str(self.ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_index():
+    """This worker's view of the published index, or None before the first build."""
+    global _index, _checked_at
+    now = time.monotonic()
+    if _checked_at and now - _checked_at < settings.CONTENT_INDEX_RELOAD_INTERVAL:
+        return _index
+    with _lock:
+        _checked_at = now
+        directory = index_dir()
+        try:
+            version = json.loads((directory / 'current.json').read_text())['version']
+        except (OSError, ValueError, KeyError):
+            _index = None
+            return None
+        if _index is None or _index.version != version:
+            _index = ContentIndex(directory, version)
+    return _index
+
+
+def reset():
+    """Forget the loaded index (tests, benchmarks)."""
+    global _index, _checked_at
+    with _lock:
+        _index, _checked_at = None, 0.0
+
+
+def index_version():
+    index = get_index()
+    return index.version if index else None
+
+
+def similar_movies(imdb_id, k=None):
+    """Display dicts for the movies most like ``imdb_id``, best first."""
+    index = get_index()
+    if index is None:
+        return []
+    ranked = index.similar(imdb_id, k or settings.CONTENT_SIMILAR_COUNT)
+    movies = Movie.objects.only('imdb_id', 'title', 'year', 'poster').in_bulk([pk for pk, _ in ranked])
+    return [
+        {'imdbID': pk, 'Title': movie.title, 'Year': movie.year, 'Poster': movie.poster, 'score': round(score, 3)}
+        for pk, score in ranked if (movie := movies.get(pk))
+    ]
@@ -0,0 +1,444 @@
+"""
+Item-item collaborative filtering over ``Review`` and ``FavoriteMovie`` rows.
+
+Offline, every interaction becomes one cell of a sparse user x movie matrix
+(rating / 10 for reviews, 1.0 for favorites; the stronger signal wins when a
+user did both). The item x item product of that matrix is computed in
+row-chunks so memory stays bounded; it is stored as raw co-occurrence dot
+products (``CoOccurrence``) together with each movie's squared column norm
+(``MovieNorm``), and the top-K cosine neighbours of every movie are stored in
+``MovieNeighbor``.
+
+Between rebuilds, ``process_changes`` folds logged (user, movie) changes into
+the stored dot products and norms and patches only the neighbour lists they
+affect, so posting a review never triggers a full rebuild.
+
+Online, a user's recommendations are the neighbours of the movies they liked,
+weighted by how much they liked them: one indexed query, no matrix maths.
+"""
+
+import math
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from scipy import sparse
+
+from movies.models import FavoriteMovie
+from reviews.models import Review
+from .models import CoOccurrence, InteractionChange, MovieNeighbor, MovieNorm, UserInteraction
+
+FAVORITE_WEIGHT = 1.0
+MAX_RATING = 10.0
+
+# Dot products / norms below this are treated as zero (float residue after decrements)
+EPSILON = 1e-6
+
+# Upper bound for one dense block of the similarity product
+CHUNK_BYTES = 64 * 1024 * 1024
+
+
+
+def _neighbor_count(k=None):
+    return k or settings.RECOMMENDER_NEIGHBORS
+
+
+# -------------------------
+# Offline model
+# -------------------------
+
+def build_interaction_matrix(user_idx, item_idx, weights, n_users, n_items):
+    """Sparse user x item matrix; repeated (user, item) pairs keep their strongest weight."""
+    keys = np.asarray(user_idx, dtype=np.int64) * n_items + np.asarray(item_idx, dtype=np.int64)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    values = np.zeros(len(unique_keys), dtype=np.float32)
+    np.maximum.at(values, inverse, np.asarray(weights, dtype=np.float32))
+    rows, cols = np.divmod(unique_keys, n_items)
+    return sparse.csr_matrix((values, (rows, cols)), shape=(n_users, n_items), dtype=np.float32)
+
+
+def column_sq_norms(matrix):
+    return np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel()
+
+
+def cooccurrence_chunks(matrix, chunk_bytes=CHUNK_BYTES):
+    """Yield ``(start, stop, dots)`` where ``dots`` is rows start..stop of ``matrix.T @ matrix``."""
+    n_items = matrix.shape[1]
+    items = matrix.T.tocsr()  # item x user
+    chunk = max(1, chunk_bytes // (4 * max(n_items, 1)))
+    for start in range(0, n_items, chunk):
+        stop = min(start + chunk, n_items)
+        yield start, stop, (items[start:stop] @ matrix).tocsr()
+
+
+def top_k_from_dots(start, stop, dots, norms, k):
+    """Top-``k`` cosine neighbours for rows start..stop given their raw dot products."""
+    sims = dots.toarray()
+    safe = np.where(norms > 0, norms, 1.0)
+    sims /= safe[start:stop, None]
+    sims /= safe[None, :]
+    sims[np.arange(stop - start), np.arange(start, stop)] = 0  # an item is not its own neighbour
+
+    idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(sims, idx, axis=1)
+    order = np.argsort(-top, axis=1, kind='stable')
+    idx = np.take_along_axis(idx, order, axis=1).astype(np.int32)
+    top = np.take_along_axis(top, order, axis=1).astype(np.float32)
+
+    empty = top <= 0
+    idx[empty] = -1
+    top[empty] = 0
+    return idx, top
+
+
+def top_k_neighbors(matrix, k, chunk_bytes=CHUNK_BYTES):
+    """Top-``k`` cosine neighbours of every item column of ``matrix``.
+
+    Returns ``(neighbors, scores)``, both shaped ``(n_items, k)`` and sorted by
+    descending score. Slots without a positive similarity hold -1 / 0.
+    """
+    n_items = matrix.shape[1]
+    k = min(k, n_items - 1)
+    if k <= 0:
+        return np.empty((n_items, 0), dtype=np.int32), np.empty((n_items, 0), dtype=np.float32)
+
+    norms = np.sqrt(column_sq_norms(matrix))
+    neighbors = np.full((n_items, k), -1, dtype=np.int32)
+    scores = np.zeros((n_items, k), dtype=np.float32)
+    for start, stop, dots in cooccurrence_chunks(matrix, chunk_bytes):
+        neighbors[start:stop], scores[start:stop] = top_k_from_dots(start, stop, dots, norms, k)
+    return neighbors, scores
+
+
+def load_interactions():
+    """``(user_ids, movie_ids, weights)`` arrays for every review and favorite."""
+    reviews = list(Review.objects.filter(movie__isnull=False).values_list('user_id', 'movie_id', 'rating'))
+    favorites = list(FavoriteMovie.objects.values_list('user_id', 'movie_id'))
+
+    user_ids = [row[0] for row in reviews] + [row[0] for row in favorites]
+    movie_ids = [row[1] for row in reviews] + [row[1] for row in favorites]
+    weights = np.concatenate([
+        np.array([row[2] for row in reviews], dtype=np.float32) / MAX_RATING,
+        np.full(len(favorites), FAVORITE_WEIGHT, dtype=np.float32),
+    ])
+    return np.array(user_ids, dtype=np.int64), np.array(movie_ids, dtype=object), weights
+
+
+def interaction_model(user_ids, movie_ids, weights):
+    """``(users, items, matrix)`` for raw interaction arrays."""
+    users, user_idx = np.unique(user_ids, return_inverse=True)
+    items, item_idx = np.unique(movie_ids, return_inverse=True)
+    matrix = build_interaction_matrix(user_idx, item_idx, weights, len(users), len(items))
+    return users, items, matrix
+
+
+def compute_neighbors(user_ids, movie_ids, weights, k):
+    """Run the offline model on raw interaction arrays; returns ``(items, neighbors, scores)``."""
+    if len(movie_ids) == 0:
+        return np.array([], dtype=object), np.empty((0, 0), dtype=np.int32), np.empty((0, 0), dtype=np.float32)
+    _, items, matrix = interaction_model(user_ids, movie_ids, weights)
+    neighbors, scores = top_k_neighbors(matrix, k)
+    return items, neighbors, scores
+
+
+def _neighbor_rows(movie_id, ranked):
+    return [
+        MovieNeighbor(movie_id=movie_id, neighbor_id=neighbor_id, score=float(score), rank=rank)
+        for rank, (neighbor_id, score) in enumerate(ranked)
+    ]
+
+
+def rebuild(k=None, batch_size=5000):
+    """Recompute every stored table of the model from scratch. Returns a small summary.
+
+    Changes logged before the rebuild started are already reflected in it and
+    are dropped from the change log; later ones are left for ``process_changes``.
+    """
+    k = _neighbor_count(k)
+    last_change = InteractionChange.objects.order_by('-id').values_list('id', flat=True).first()
+    user_ids, movie_ids, weights = load_interactions()
+
+    with transaction.atomic():
+        for model in (MovieNeighbor, CoOccurrence, MovieNorm, UserInteraction):
+            model.objects.all().delete()
+        if last_change is not None:
+            InteractionChange.objects.filter(id__lte=last_change).delete()
+        if len(movie_ids) == 0:
+            return {'interactions': 0, 'movies': 0, 'neighbors': 0, 'pairs': 0}
+
+        users, items, matrix = interaction_model(user_ids, movie_ids, weights)
+        coo = matrix.tocoo()
+        UserInteraction.objects.bulk_create(
+            (UserInteraction(user_id=int(users[u]), movie_id=items[i], weight=float(w))
+             for u, i, w in zip(coo.row, coo.col, coo.data)),
+            batch_size=batch_size,
+        )
+        sq_norms = column_sq_norms(matrix)
+        MovieNorm.objects.bulk_create(
+            (MovieNorm(movie_id=items[i], sq_norm=float(sq_norms[i])) for i in range(len(items))),
+            batch_size=batch_size,
+        )
+
+        norms = np.sqrt(sq_norms)
+        k_eff = min(k, len(items) - 1)
+        pairs = stored = 0
+        for start, stop, dots in cooccurrence_chunks(matrix):
+            chunk = dots.tocoo()
+            upper = chunk.col > chunk.row + start
+            CoOccurrence.objects.bulk_create(
+                (CoOccurrence(movie_a=items[start + a], movie_b=items[b], dot=float(d))
+                 for a, b, d in zip(chunk.row[upper], chunk.col[upper], chunk.data[upper])),
+                batch_size=batch_size,
+            )
+            pairs += int(upper.sum())
+            if k_eff <= 0:
+                continue
+            idx, top = top_k_from_dots(start, stop, dots, norms, k_eff)
+            rows = []
+            for offset in range(stop - start):
+                ranked = [(items[j], s) for j, s in zip(idx[offset], top[offset]) if j >= 0]
+                rows.extend(_neighbor_rows(items[start + offset], ranked))
+            MovieNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+            stored += len(rows)
+
+    return {'interactions': len(movie_ids), 'movies': len(items), 'neighbors': stored, 'pairs': pairs}
+
+
+# -------------------------
+# Incremental updates
+# -------------------------
+
+def current_weights(pairs):
+    """Weight each (user_id, movie_id) pair should have according to the source tables."""
+    user_ids = {user_id for user_id, _ in pairs}
+    movie_ids = {movie_id for _, movie_id in pairs}
+    weights = defaultdict(float)
+    reviews = Review.objects.filter(user_id__in=user_ids, movie_id__in=movie_ids).values_list('user_id', 'movie_id', 'rating')
+    for user_id, movie_id, rating in reviews:
+        weights[user_id, movie_id] = max(weights[user_id, movie_id], rating / MAX_RATING)
+    favorites = FavoriteMovie.objects.filter(user_id__in=user_ids, movie_id__in=movie_ids).values_list('user_id', 'movie_id')
+    for key in favorites:
+        weights[key] = max(weights[key], FAVORITE_WEIGHT)
+    return {pair: weights.get(pair, 0.0) for pair in pairs}
+
+
+def _add_to_dot(movie_x, movie_y, amount):
+    movie_a, movie_b = sorted((movie_x, movie_y))
+    updated = CoOccurrence.objects.filter(movie_a=movie_a, movie_b=movie_b).update(dot=F('dot') + amount)
+    if not updated:
+        CoOccurrence.objects.create(movie_a=movie_a, movie_b=movie_b, dot=amount)
+
+
+def apply_weight_change(user_id, movie_id, new_weight, touched):
+    """Fold one cell's new weight into the stored dots and norm.
+
+    Returns True if anything changed. ``touched`` collects, per other movie of
+    this user, the movies whose dot product with it moved.
+    """
+    row = UserInteraction.objects.filter(user_id=user_id, movie_id=movie_id).first()
+    old_weight = row.weight if row else 0.0
+    if math.isclose(old_weight, new_weight, abs_tol=EPSILON):
+        return False
+
+    delta = new_weight - old_weight
+    others = UserInteraction.objects.filter(user_id=user_id).exclude(movie_id=movie_id).values_list('movie_id', 'weight')
+    for other_id, other_weight in others:
+        _add_to_dot(movie_id, other_id, delta * other_weight)
+        touched[other_id].add(movie_id)
+
+    norm_delta = new_weight ** 2 - old_weight ** 2
+    if not MovieNorm.objects.filter(pk=movie_id).update(sq_norm=F('sq_norm') + norm_delta):
+        MovieNorm.objects.create(movie_id=movie_id, sq_norm=norm_delta)
+
+    if new_weight <= EPSILON:
+        UserInteraction.objects.filter(user_id=user_id, movie_id=movie_id).delete()
+    elif row:
+        UserInteraction.objects.filter(pk=row.pk).update(weight=new_weight)
+    else:
+        UserInteraction.objects.create(user_id=user_id, movie_id=movie_id, weight=new_weight)
+    return True
+
+
+def stored_similarities(movie_id):
+    """``{other_id: cosine}`` for every movie co-occurring with ``movie_id``."""
+    dots = {}
+    for movie_a, movie_b, dot in CoOccurrence.objects.filter(Q(movie_a=movie_id) | Q(movie_b=movie_id)).values_list('movie_a', 'movie_b', 'dot'):
+        if dot > EPSILON:
+            dots[movie_b if movie_a == movie_id else movie_a] = dot
+    if not dots:
+        return {}
+    norms = dict(MovieNorm.objects.filter(movie_id__in=[movie_id, *dots]).values_list('movie_id', 'sq_norm'))
+    own = norms.get(movie_id, 0.0)
+    if own <= EPSILON:
+        return {}
+    return {
+        other_id: dot / math.sqrt(own * norms[other_id])
+        for other_id, dot in dots.items()
+        if norms.get(other_id, 0.0) > EPSILON
+    }
+
+
+def stored_similarity(movie_x, movie_y):
+    movie_a, movie_b = sorted((movie_x, movie_y))
+    dot = CoOccurrence.objects.filter(movie_a=movie_a, movie_b=movie_b).values_list('dot', flat=True).first() or 0.0
+    norms = dict(MovieNorm.objects.filter(movie_id__in=[movie_x, movie_y]).values_list('movie_id', 'sq_norm'))
+    if dot <= EPSILON or min(norms.get(movie_x, 0.0), norms.get(movie_y, 0.0)) <= EPSILON:
+        return 0.0
+    return dot / math.sqrt(norms[movie_x] * norms[movie_y])
+
+
+def _rank(similarities, k):
+    return sorted(similarities.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+def _replace_neighbors(movie_id, ranked):
+    MovieNeighbor.objects.filter(movie_id=movie_id).delete()
+    MovieNeighbor.objects.bulk_create(_neighbor_rows(movie_id, ranked))
+
+
+def recompute_neighbors(movie_id, k=None):
+    """Rebuild one movie's neighbour list from the stored dots and norms."""
+    _replace_neighbors(movie_id, _rank(stored_similarities(movie_id), _neighbor_count(k)))
+
+
+def merge_neighbor(movie_id, changed_id, k=None):
+    """Patch ``movie_id``'s list after only its similarity with ``changed_id`` moved.
+
+    Falls back to a full recompute when ``changed_id`` drops out of a full list,
+    since the replacement candidate is unknown.
+    """
+    k = _neighbor_count(k)
+    current = dict(MovieNeighbor.objects.filter(movie_id=movie_id).values_list('neighbor_id', 'score'))
+    similarity = stored_similarity(movie_id, changed_id)
+    floor = min(current.values()) if len(current) >= k else 0.0
+
+    if changed_id in current and len(current) >= k and similarity < floor:
+        recompute_neighbors(movie_id, k)
+        return
+    if similarity > EPSILON and (changed_id in current or len(current) < k or similarity > floor):
+        current[changed_id] = similarity
+    elif changed_id in current:
+        del current[changed_id]
+    else:
+        return
+    _replace_neighbors(movie_id, _rank(current, k))
+
+
+def process_changes(batch_size=500, k=None):
+    """Consume up to ``batch_size`` logged changes. Returns how many were consumed."""
+    k = _neighbor_count(k)
+    with transaction.atomic():
+        changes = list(InteractionChange.objects.order_by('id')[:batch_size])
+        if not changes:
+            return 0
+        pairs = sorted({(change.user_id, change.movie_id) for change in changes})
+        weights = current_weights(pairs)
+
+        changed = set()
+        touched = defaultdict(set)
+        for user_id, movie_id in pairs:
+            if apply_weight_change(user_id, movie_id, weights[user_id, movie_id], touched):
+                changed.add(movie_id)
+
+        CoOccurrence.objects.filter(dot__lte=EPSILON).delete()
+        MovieNorm.objects.filter(sq_norm__lte=EPSILON).delete()
+
+        # A changed movie's norm moved too, so its similarity with every movie
+        # it co-occurs with (or is listed by) moved, not just this user's movies.
+        for movie_id in changed:
+            recompute_neighbors(movie_id, k)
+            related = CoOccurrence.objects.filter(Q(movie_a=movie_id) | Q(movie_b=movie_id)).values_list('movie_a', 'movie_b')
+            listed_by = MovieNeighbor.objects.filter(neighbor_id=movie_id).values_list('movie_id', flat=True)
+            for other_id in {*(a if b == movie_id else b for a, b in related), *listed_by}:
+                touched[other_id].add(movie_id)
+        for movie_id, changed_ids in touched.items():
+            if movie_id in changed:
+                continue
+            if len(changed_ids) > 1:
+                recompute_neighbors(movie_id, k)
+            else:
+                merge_neighbor(movie_id, next(iter(changed_ids)), k)
+
+        InteractionChange.objects.filter(id__in=[change.id for change in changes]).delete()
+    return len(changes)
+
+
+def check_consistency(k=None, tolerance=1e-4):
+    """Compare stored neighbour lists against a full in-memory rebuild.
+
+    Returns a list of ``(movie_id, problem)`` strings; empty means consistent.
+    Neighbours tied on score may legitimately differ, so lists are compared
+    by their score sequence plus membership of clearly-ranked entries.
+    """
+    k = _neighbor_count(k)
+    items, neighbors, scores = compute_neighbors(*load_interactions(), k)
+    expected = {}
+    for i, movie_id in enumerate(items):
+        expected[movie_id] = [(items[j], float(s)) for j, s in zip(neighbors[i], scores[i]) if j >= 0]
+
+    stored = defaultdict(list)
+    for movie_id, neighbor_id, score in MovieNeighbor.objects.order_by('movie_id', 'rank').values_list('movie_id', 'neighbor_id', 'score'):
+        stored[movie_id].append((neighbor_id, score))
+
+    problems = []
+    for movie_id in sorted(set(expected) | set(stored)):
+        want, have = expected.get(movie_id, []), stored.get(movie_id, [])
+        if len(want) != len(have):
+            problems.append((movie_id, f"{len(have)} neighbours stored, {len(want)} expected"))
+            continue
+        if any(abs(a[1] - b[1]) > tolerance for a, b in zip(want, have)):
+            problems.append((movie_id, "neighbour scores differ"))
+            continue
+        cutoff = want[-1][1] + tolerance if want else 0
+        clear_want = {neighbor for neighbor, score in want if score > cutoff}
+        clear_have = {neighbor for neighbor, score in have if score > cutoff}
+        if clear_want != clear_have:
+            problems.append((movie_id, "neighbour sets differ"))
+    return problems
+
+
+# -------------------------
+# Serving
+# -------------------------
+
+def user_seeds(user):
+    """Movies the user liked, with how strongly (0..1)."""
+    min_rating = settings.RECOMMENDER_MIN_SEED_RATING
+    seeds = {}
+    for movie_id, rating in Review.objects.filter(user=user, movie__isnull=False).values_list('movie_id', 'rating'):
+        seeds[movie_id] = max(seeds.get(movie_id, 0), rating / MAX_RATING if rating >= min_rating else 0)
+    for movie_id in FavoriteMovie.objects.filter(user=user).values_list('movie_id', flat=True):
+        seeds[movie_id] = FAVORITE_WEIGHT
+    return seeds
+
+
+def recommend_for_user(user, limit=12):
+    """Personalized recommendations as ``[{'imdb_id', 'score', 'because_id'}]``.
+
+    ``because_id`` is the liked movie that contributed most to the
+    recommendation, for "because you rated X" captions. Movies the user has
+    already reviewed or favorited are never returned.
+    """
+    seeds = user_seeds(user)
+    liked = {movie_id: weight for movie_id, weight in seeds.items() if weight > 0}
+    if not liked:
+        return []
+
+    totals = defaultdict(float)
+    because = {}
+    rows = MovieNeighbor.objects.filter(movie_id__in=liked).values_list('movie_id', 'neighbor_id', 'score')
+    for movie_id, neighbor_id, score in rows:
+        if neighbor_id in seeds:
+            continue
+        contribution = score * liked[movie_id]
+        totals[neighbor_id] += contribution
+        if contribution > because.get(neighbor_id, (None, 0))[1]:
+            because[neighbor_id] = (movie_id, contribution)
+
+    ranked = sorted(totals, key=totals.get, reverse=True)[:limit]
+    return [
+        {'imdb_id': imdb_id, 'score': totals[imdb_id], 'because_id': because[imdb_id][0]}
+        for imdb_id in ranked
+    ]
@@ -0,0 +1,135 @@
+"""
+Per-user recommendation feeds for the homepage.
+
+Feeds are computed off the request path by ``build_user_feeds`` and read
+from the Django cache, falling back to the ``UserFeed`` table. A user's feed
+is invalidated (cache entry dropped, row marked stale) whenever their reviews
+or favorites change, and a rebuild is queued (``recommendations.tasks``).
+Until it runs, the stale row keeps being served. Users without anything to go
+on get the popularity ranking computed from the local review aggregates.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import ExpressionWrapper, F, FloatField, Q
+from django.utils import timezone
+
+from reviews.models import Movie
+from taskqueue.queue import enqueue_many
+from .engine import recommend_for_user, user_seeds
+from .models import UserFeed
+
+POPULAR_CACHE_KEY = 'recfeed:popular'
+# Popular movies kept in the cache, so the list survives filtering out what a user has seen
+POPULAR_POOL_SIZE = 100
+
+
+
+def feed_cache_key(user_id):
+    return f'recfeed:user:{user_id}'
+
+
+def _display(movie, because=None):
+    return {
+        'imdbID': movie.imdb_id,
+        'Title': movie.title,
+        'Year': movie.year,
+        'Poster': movie.poster,
+        'because': because,
+    }
+
+
+def popular_movies(limit=None, exclude=()):
+    """Best-rated local movies; averages are damped toward 5/10 so a single review cannot top the list."""
+    limit = limit or settings.RECOMMENDATIONS_PER_USER
+    items = cache.get(POPULAR_CACHE_KEY)
+    if items is None:
+        prior = settings.RECOMMENDER_POPULARITY_PRIOR  # pseudo-reviews at a rating of 5
+        damped_average = ExpressionWrapper(
+            (F('rating_sum') + 5.0 * prior) / (F('review_count') + prior),
+            output_field=FloatField(),
+        )
+        movies = (
+            Movie.objects.filter(review_count__gt=0)
+            .only('imdb_id', 'title', 'year', 'poster')
+            .annotate(popularity=damped_average)
+            .order_by('-popularity', '-review_count', 'imdb_id')[:POPULAR_POOL_SIZE]
+        )
+        items = [_display(movie) for movie in movies]
+        cache.set(POPULAR_CACHE_KEY, items, settings.RECOMMENDER_POPULAR_CACHE_TTL)
+    return [item for item in items if item['imdbID'] not in exclude][:limit]
+
+
+def compute_feed(user):
+    """``(items, source)`` for a user: personalized picks, or popular movies on cold start."""
+    picks = recommend_for_user(user, limit=settings.RECOMMENDATIONS_PER_USER)
+    ids = {pick['imdb_id'] for pick in picks} | {pick['because_id'] for pick in picks}
+    movies = Movie.objects.only('imdb_id', 'title', 'year', 'poster').in_bulk(ids)
+
+    items = []
+    for pick in picks:
+        movie = movies.get(pick['imdb_id'])
+        if movie is None:  # only known from someone's favorites; nothing to show
+            continue
+        because = movies.get(pick['because_id'])
+        items.append(_display(movie, because.title if because else pick['because_id']))
+    if items:
+        return items, 'personal'
+    return popular_movies(exclude=user_seeds(user)), 'popular'
+
+
+def build_feed(user):
+    items, source = compute_feed(user)
+    UserFeed.objects.update_or_create(
+        user=user,
+        defaults={'items': items, 'source': source, 'computed_at': timezone.now(), 'is_stale': False},
+    )
+    cache.set(feed_cache_key(user.pk), items, settings.RECOMMENDER_FEED_CACHE_TTL)
+    return items
+
+
+def get_user_feed(user):
+    """The user's feed without computing anything: cache, then table, then popular movies."""
+    items = cache.get(feed_cache_key(user.pk))
+    if items is not None:
+        return items
+
+    feed = UserFeed.objects.filter(user=user).only('items', 'is_stale').first()
+    if feed is None:
+        # Ask the job for a feed and make do with the popular list meanwhile
+        UserFeed.objects.get_or_create(user=user, defaults={'is_stale': True})
+        return popular_movies()
+    if not feed.is_stale:
+        cache.set(feed_cache_key(user.pk), feed.items, settings.RECOMMENDER_FEED_CACHE_TTL)
+    return feed.items or popular_movies()
+
+
+def schedule_feed_builds(user_ids):
+    """Queue feed rebuilds, delayed a little so a burst of changes by one user makes one rebuild."""
+    enqueue_many(
+        'recommendations.build_user_feed',
+        [(f'user-feed:{user_id}', {'user_id': user_id}) for user_id in user_ids],
+        delay=settings.RECOMMENDER_FEED_REBUILD_DELAY,
+    )
+
+
+def invalidate_user_feed(user_id):
+    invalidate_user_feeds([user_id])
+
+
+def invalidate_user_feeds(user_ids):
+    user_ids = list(user_ids)
+    cache.delete_many([feed_cache_key(user_id) for user_id in user_ids])
+    UserFeed.objects.filter(user_id__in=user_ids).update(is_stale=True)
+    schedule_feed_builds(user_ids)
+
+
+def feeds_to_build(max_age=None):
+    """Feeds that are stale, never computed, or older than ``max_age`` seconds."""
+    max_age = max_age or settings.RECOMMENDER_FEED_MAX_AGE
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    return UserFeed.objects.filter(
+        Q(is_stale=True) | Q(computed_at__isnull=True) | Q(computed_at__lt=cutoff)
+    ).select_related('user')
@@ -0,0 +1,50 @@
+import time
+import tracemalloc
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recommendations.engine import build_interaction_matrix, top_k_neighbors
+
+
+def synthetic_interactions(n_reviews, rng):
+    """Review-like data with a long-tailed movie popularity, roughly 20 reviews per user."""
+    n_users = max(10, n_reviews // 20)
+    n_items = max(100, n_reviews // 50)
+    popularity = 1.0 / np.arange(1, n_items + 1) ** 0.8
+    popularity /= popularity.sum()
+    user_idx = rng.integers(0, n_users, size=n_reviews)
+    item_idx = rng.choice(n_items, size=n_reviews, p=popularity)
+    weights = rng.integers(1, 11, size=n_reviews).astype(np.float32) / 10
+    return user_idx, item_idx, weights, n_users, n_items
+
+
+class Command(BaseCommand):
+    help = "Time and measure peak memory of the recommender build on synthetic data (nothing is stored)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                            help="Numbers of reviews to simulate.")
+        parser.add_argument('-k', '--neighbors', type=int, default=settings.RECOMMENDER_NEIGHBORS)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        self.stdout.write(f"{'reviews':>10} {'users':>8} {'movies':>8} {'matrix s':>9} {'knn s':>8} {'peak MB':>8}")
+        for size in options['sizes']:
+            user_idx, item_idx, weights, n_users, n_items = synthetic_interactions(size, rng)
+
+            tracemalloc.start()
+            started = time.perf_counter()
+            matrix = build_interaction_matrix(user_idx, item_idx, weights, n_users, n_items)
+            built = time.perf_counter()
+            top_k_neighbors(matrix, options['neighbors'])
+            finished = time.perf_counter()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.stdout.write(
+                f"{size:>10} {n_users:>8} {n_items:>8} {built - started:>9.2f} "
+                f"{finished - built:>8.2f} {peak / 2**20:>8.1f}"
+            )
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recommendations.content import ContentIndex, build, index_dir
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the content-based similarity index (\"more like this\") from local movie metadata and "
+        "publish it for the web workers, which memory-map it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help="Index directory (default: CONTENT_INDEX_DIR).")
+        parser.add_argument('--sample', help="Print the nearest neighbours of this imdb ID after building.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        summary = build(options['dir'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {summary['movies']} movies ({summary['nnz']} features, "
+            f"{summary['bytes'] / 2 ** 20:.1f} MiB) into {options['dir'] or index_dir()} "
+            f"as version {summary['version']} in {elapsed:.2f}s."
+        ))
+
+        if options['sample']:
+            index = ContentIndex(options['dir'] or index_dir(), summary['version'])
+            started = time.perf_counter()
+            similar = index.similar(options['sample'], 10)
+            elapsed = (time.perf_counter() - started) * 1000
+            for imdb_id, score in similar:
+                self.stdout.write(f"  {imdb_id}  {score:.3f}")
+            self.stdout.write(f"Query took {elapsed:.1f} ms.")
@@ -0,0 +1,35 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from recommendations.feeds import build_feed, feeds_to_build
+
+
+class Command(BaseCommand):
+    help = "Compute materialized homepage feeds for users whose feed is stale, missing or old."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Build a feed for every active user.")
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--loop', action='store_true', help="Keep polling for stale feeds instead of exiting.")
+        parser.add_argument('--interval', type=float, default=10.0, help="Seconds to sleep when nothing is stale (--loop).")
+
+    def handle(self, *args, **options):
+        if options['all']:
+            users = get_user_model().objects.filter(is_active=True).iterator()
+            built = sum(1 for user in users if build_feed(user) is not None)
+            self.stdout.write(self.style.SUCCESS(f"Built {built} feed(s)."))
+            return
+
+        while True:
+            feeds = list(feeds_to_build()[:options['batch_size']])
+            for feed in feeds:
+                build_feed(feed.user)
+            if feeds:
+                self.stdout.write(f"Built {len(feeds)} feed(s).")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS("All feeds up to date."))
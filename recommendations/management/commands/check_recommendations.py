@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.engine import check_consistency
+
+
+class Command(BaseCommand):
+    help = "Compare the stored (incrementally maintained) neighbour lists against a full in-memory rebuild."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-k', '--neighbors', type=int, default=settings.RECOMMENDER_NEIGHBORS)
+        parser.add_argument('--tolerance', type=float, default=1e-4)
+
+    def handle(self, *args, **options):
+        problems = check_consistency(k=options['neighbors'], tolerance=options['tolerance'])
+        for movie_id, problem in problems:
+            self.stdout.write(f"{movie_id}: {problem}")
+        if problems:
+            raise CommandError(f"{len(problems)} movie(s) differ from a full rebuild.")
+        self.stdout.write(self.style.SUCCESS("Stored neighbours match a full rebuild."))
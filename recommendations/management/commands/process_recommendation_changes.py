@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recommendations.engine import process_changes
+
+
+class Command(BaseCommand):
+    help = "Fold logged review/favorite changes into the recommender model in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('-k', '--neighbors', type=int, default=settings.RECOMMENDER_NEIGHBORS)
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new changes instead of exiting.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when the log is empty (--loop).")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            consumed = process_changes(batch_size=options['batch_size'], k=options['neighbors'])
+            total += consumed
+            if consumed:
+                self.stdout.write(f"Applied {consumed} change(s).")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Change log drained ({total} change(s) applied)."))
@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recommendations.engine import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the item-item similarity model from all reviews and favorites."
+
+    def add_arguments(self, parser):
+        parser.add_argument('-k', '--neighbors', type=int, default=settings.RECOMMENDER_NEIGHBORS,
+                            help="Neighbours to keep per movie.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        summary = rebuild(k=options['neighbors'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {summary['neighbors']} neighbours and {summary['pairs']} co-occurring pairs "
+            f"for {summary['movies']} movies from {summary['interactions']} interactions in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movie_id', models.CharField(max_length=20)),
+                ('neighbor_id', models.CharField(max_length=20)),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'ordering': ['movie_id', 'rank'],
+                'indexes': [models.Index(fields=['movie_id', 'rank'], name='recommendat_movie_i_79104b_idx')],
+                'unique_together': {('movie_id', 'neighbor_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteractionChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField()),
+                ('movie_id', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovieNorm',
+            fields=[
+                ('movie_id', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('sq_norm', models.FloatField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='movieneighbor',
+            name='neighbor_id',
+            field=models.CharField(db_index=True, max_length=20),
+        ),
+        migrations.CreateModel(
+            name='CoOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movie_a', models.CharField(max_length=20)),
+                ('movie_b', models.CharField(db_index=True, max_length=20)),
+                ('dot', models.FloatField()),
+            ],
+            options={
+                'unique_together': {('movie_a', 'movie_b')},
+            },
+        ),
+        migrations.CreateModel(
+            name='UserInteraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.IntegerField()),
+                ('movie_id', models.CharField(max_length=20)),
+                ('weight', models.FloatField()),
+            ],
+            options={
+                'unique_together': {('user_id', 'movie_id')},
+            },
+        ),
+    ]
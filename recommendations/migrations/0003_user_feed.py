@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0002_incremental_model'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('items', models.JSONField(default=list)),
+                ('source', models.CharField(default='personal', max_length=16)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('is_stale', models.BooleanField(db_index=True, default=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation_feed', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
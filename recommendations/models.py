@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.db import models
+
+
+class MovieNeighbor(models.Model):
+    """
+    One of the top-K most similar movies to ``movie_id`` (item-item collaborative filtering).
+
+    IDs are plain imdb IDs rather than foreign keys because favorites can point
+    at movies that have no local ``reviews.Movie`` row.
+    """
+    movie_id = models.CharField(max_length=20)
+    neighbor_id = models.CharField(max_length=20, db_index=True)
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('movie_id', 'neighbor_id')
+        ordering = ['movie_id', 'rank']
+        indexes = [models.Index(fields=['movie_id', 'rank'])]
+
+    def __str__(self):
+        return f"{self.movie_id} -> {self.neighbor_id} ({self.score:.3f})"
+
+
+class UserInteraction(models.Model):
+    """The weight the model currently holds for one (user, movie) cell."""
+    user_id = models.IntegerField()
+    movie_id = models.CharField(max_length=20)
+    weight = models.FloatField()
+
+    class Meta:
+        unique_together = ('user_id', 'movie_id')
+
+
+class MovieNorm(models.Model):
+    """Sum of squared interaction weights of a movie (its column norm, squared)."""
+    movie_id = models.CharField(max_length=20, primary_key=True)
+    sq_norm = models.FloatField()
+
+
+class CoOccurrence(models.Model):
+    """Dot product of two movie columns, stored once per pair with ``movie_a < movie_b``."""
+    movie_a = models.CharField(max_length=20)
+    movie_b = models.CharField(max_length=20, db_index=True)
+    dot = models.FloatField()
+
+    class Meta:
+        unique_together = ('movie_a', 'movie_b')
+
+
+class InteractionChange(models.Model):
+    """
+    Durable log of (user, movie) cells whose reviews or favorites changed.
+
+    Rows are written by ``recommendations.signals`` and consumed in batches by
+    ``process_recommendation_changes``; the current weight is re-read from the
+    source tables at processing time, so the log only records *which* cell moved.
+    """
+    user_id = models.IntegerField()
+    movie_id = models.CharField(max_length=20)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"user {self.user_id} / {self.movie_id} @ {self.created_at}"
+
+
+class UserFeed(models.Model):
+    """
+    Materialized homepage feed for one user (the DB fallback behind the cache).
+
+    ``items`` holds ready-to-render movie dicts in OMDb's search-result shape.
+    ``is_stale`` is set when the user's reviews or favorites change; the
+    ``build_user_feeds`` job recomputes stale and missing feeds.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='recommendation_feed')
+    items = models.JSONField(default=list)
+    source = models.CharField(max_length=16, default='personal')  # 'personal' or 'popular'
+    computed_at = models.DateTimeField(null=True, blank=True)
+    is_stale = models.BooleanField(default=True, db_index=True)
+
+    def __str__(self):
+        return f"Feed for {self.user} ({len(self.items)} movies)"
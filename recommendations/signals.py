@@ -0,0 +1,53 @@
+"""
+Log every review / favorite change so the recommender can fold it in later,
+and invalidate the author's materialized feed.
+
+Only the (user, movie) cell is recorded; ``engine.process_changes`` reads the
+cell's current weight when it consumes the log.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from movies.models import FavoriteMovie
+from reviews.models import Review
+from reviews.signals import interactions_changed
+from .feeds import invalidate_user_feed, invalidate_user_feeds
+from .models import InteractionChange
+
+
+def log_change(user_id, movie_id):
+    if user_id is not None and movie_id:
+        InteractionChange.objects.create(user_id=user_id, movie_id=movie_id)
+        invalidate_user_feed(user_id)
+
+
+@receiver(interactions_changed)
+def log_bulk_changes(sender, pairs, **kwargs):
+    changes = [InteractionChange(user_id=user_id, movie_id=movie_id) for user_id, movie_id in pairs]
+    InteractionChange.objects.bulk_create(changes)
+    invalidate_user_feeds({user_id for user_id, _ in pairs})
+
+
+@receiver(post_save, sender=Review)
+def log_review_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    log_change(instance.user_id, instance.movie_id)
+    # reviews.signals remembers the pre-save row; a review moved to another movie changes both cells
+    previous = getattr(instance, '_previous_state', None)
+    if previous and previous['movie_id'] != instance.movie_id:
+        log_change(instance.user_id, previous['movie_id'])
+
+
+@receiver(post_delete, sender=Review)
+def log_review_deleted(sender, instance, **kwargs):
+    log_change(instance.user_id, instance.movie_id)
+
+
+@receiver(post_save, sender=FavoriteMovie)
+@receiver(post_delete, sender=FavoriteMovie)
+def log_favorite_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    log_change(instance.user_id, instance.movie_id)
@@ -0,0 +1,13 @@
+"""Background tasks of the recommendations app, run by ``manage.py run_tasks``."""
+
+from django.contrib.auth.models import User
+
+from taskqueue.queue import task
+from .feeds import build_feed
+
+
+@task('recommendations.build_user_feed')
+def build_user_feed(user_id):
+    user = User.objects.filter(pk=user_id).first()
+    if user is not None:
+        build_feed(user)
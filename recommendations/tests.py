@@ -0,0 +1,175 @@
+import random
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from movies.models import FavoriteMovie
+from reviews.models import Movie, Review
+from . import content
+from .engine import (
+    build_interaction_matrix, check_consistency, process_changes, rebuild, recommend_for_user, top_k_neighbors,
+)
+from .feeds import build_feed, feeds_to_build, get_user_feed
+from .models import InteractionChange, MovieNeighbor, UserFeed
+
+
+class TopKNeighborTests(TestCase):
+    def test_items_liked_by_the_same_users_are_neighbours(self):
+        # users 0 and 1 like items 0 and 1; user 2 likes item 2 only
+        matrix = build_interaction_matrix([0, 0, 1, 1, 2], [0, 1, 0, 1, 2], [1, 1, 1, 1, 1], 3, 3)
+        neighbors, scores = top_k_neighbors(matrix, k=2)
+        self.assertEqual(neighbors[0, 0], 1)
+        self.assertAlmostEqual(float(scores[0, 0]), 1.0, places=5)
+        self.assertEqual(neighbors[2].tolist(), [-1, -1])
+
+    def test_small_chunks_give_the_same_result(self):
+        rng = np.random.default_rng(1)
+        matrix = build_interaction_matrix(rng.integers(0, 30, 300), rng.integers(0, 40, 300), rng.random(300), 30, 40)
+        expected = top_k_neighbors(matrix, k=5)[1]
+        chunked = top_k_neighbors(matrix, k=5, chunk_bytes=4 * 40 * 3)[1]
+        np.testing.assert_allclose(chunked, expected, rtol=1e-5)
+
+
+class RecommendForUserTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob = (User.objects.create_user(name) for name in ('alice', 'bob'))
+        for imdb_id, title in (('tt1', 'Heat'), ('tt2', 'Collateral'), ('tt3', 'Thief')):
+            Movie.objects.create(imdb_id=imdb_id, title=title)
+
+    def test_recommends_neighbours_of_liked_movies(self):
+        Review.objects.create(user=self.bob, movie_id='tt1', rating=9, content='x')
+        Review.objects.create(user=self.bob, movie_id='tt2', rating=8, content='x')
+        FavoriteMovie.objects.create(user=self.bob, movie_id='tt3', movie_title='Thief')
+        Review.objects.create(user=self.alice, movie_id='tt1', rating=10, content='x')
+
+        summary = rebuild(k=5)
+        self.assertEqual(summary['movies'], 3)
+        self.assertTrue(MovieNeighbor.objects.filter(movie_id='tt1', neighbor_id='tt2').exists())
+
+        picks = recommend_for_user(self.alice)
+        self.assertEqual({pick['imdb_id'] for pick in picks}, {'tt2', 'tt3'})
+        self.assertTrue(all(pick['because_id'] == 'tt1' for pick in picks))
+
+    def test_disliked_movies_do_not_seed_recommendations(self):
+        Review.objects.create(user=self.bob, movie_id='tt1', rating=9, content='x')
+        Review.objects.create(user=self.bob, movie_id='tt2', rating=8, content='x')
+        Review.objects.create(user=self.alice, movie_id='tt1', rating=2, content='x')
+        rebuild(k=5)
+        self.assertEqual(recommend_for_user(self.alice), [])
+
+
+class IncrementalUpdateTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(f'user{i}') for i in range(6)]
+        self.movies = [Movie.objects.create(imdb_id=f'tt{i}', title=f'Movie {i}') for i in range(8)]
+
+    def test_writes_are_logged_and_consumed(self):
+        review = Review.objects.create(user=self.users[0], movie=self.movies[0], rating=8, content='x')
+        review.movie = self.movies[1]
+        review.save()
+        FavoriteMovie.objects.create(user=self.users[0], movie_id='tt2', movie_title='Movie 2')
+        logged = set(InteractionChange.objects.values_list('movie_id', flat=True))
+        self.assertEqual(logged, {'tt0', 'tt1', 'tt2'})
+
+        self.assertEqual(process_changes(batch_size=2), 2)
+        process_changes()
+        self.assertFalse(InteractionChange.objects.exists())
+
+    def test_incremental_updates_match_full_rebuild(self):
+        rng = random.Random(7)
+        for user in self.users:
+            for movie in rng.sample(self.movies, 4):
+                Review.objects.create(user=user, movie=movie, rating=rng.randint(1, 10), content='x')
+        rebuild(k=3)
+
+        reviews = list(Review.objects.all())
+        for review in rng.sample(reviews, 5):
+            review.rating = rng.randint(1, 10)
+            review.save()
+        for review in rng.sample(reviews, 3):
+            if review.pk and Review.objects.filter(pk=review.pk).exists():
+                review.delete()
+        FavoriteMovie.objects.create(user=self.users[0], movie_id='tt7', movie_title='Movie 7')
+        FavoriteMovie.objects.create(user=self.users[1], movie_id='tt9', movie_title='Unreviewed')
+
+        while process_changes(batch_size=4, k=3):
+            pass
+        self.assertEqual(check_consistency(k=3), [])
+
+
+class UserFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob = (User.objects.create_user(name, password='pw') for name in ('alice', 'bob'))
+        for imdb_id, title in (('tt1', 'Heat'), ('tt2', 'Collateral'), ('tt3', 'Thief')):
+            Movie.objects.create(imdb_id=imdb_id, title=title)
+        Review.objects.create(user=self.bob, movie_id='tt1', rating=9, content='x')
+        Review.objects.create(user=self.bob, movie_id='tt2', rating=8, content='x')
+        Review.objects.create(user=self.alice, movie_id='tt1', rating=10, content='x')
+        rebuild(k=5)
+
+    def test_warm_feed_renders_homepage_without_omdb(self):
+        build_feed(self.alice)
+        self.client.login(username='alice', password='pw')
+        with mock.patch('movies.views.fetch_many') as fetch_many, self.assertNumQueries(4):
+            response = self.client.get(reverse('movies-list-html'))
+        fetch_many.assert_not_called()
+        self.assertContains(response, 'Collateral')
+        self.assertContains(response, 'Because you liked Heat')
+
+    def test_new_user_gets_popular_movies_and_is_queued(self):
+        carol = User.objects.create_user('carol')
+        self.assertEqual([item['imdbID'] for item in get_user_feed(carol)], ['tt1', 'tt2'])
+        self.assertIn(carol.pk, feeds_to_build().values_list('user_id', flat=True))
+
+    def test_review_invalidates_feed(self):
+        build_feed(self.alice)
+        Review.objects.create(user=self.alice, movie_id='tt2', rating=7, content='x')
+        self.assertTrue(UserFeed.objects.get(user=self.alice).is_stale)
+        build_feed(self.alice)
+        self.assertNotIn('tt2', [item['imdbID'] for item in get_user_feed(self.alice)])
+
+
+class ContentIndexTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        for imdb_id, title, genres, director, actors in (
+            ('tt0113277', 'Heat', 'Crime, Drama, Thriller', 'Michael Mann', 'Al Pacino, Robert De Niro'),
+            ('tt0369339', 'Collateral', 'Crime, Drama, Thriller', 'Michael Mann', 'Tom Cruise, Jamie Foxx'),
+            ('tt0068646', 'The Godfather', 'Crime, Drama', 'Francis Ford Coppola', 'Marlon Brando, Al Pacino'),
+            ('tt0114709', 'Toy Story', 'Animation, Adventure, Comedy', 'John Lasseter', 'Tom Hanks, Tim Allen'),
+        ):
+            Movie.objects.create(imdb_id=imdb_id, title=title, genres=genres, director=director,
+                                 actors=actors, fetched_at=now)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        settings = override_settings(CONTENT_INDEX_DIR=tmp.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        content.reset()
+        self.addCleanup(content.reset)
+        content.build()
+
+    def test_shared_director_genres_and_cast_rank_first(self):
+        ranked = [item['imdbID'] for item in content.similar_movies('tt0113277')]
+        self.assertEqual(ranked[:2], ['tt0369339', 'tt0068646'])
+        self.assertNotIn('tt0113277', ranked)
+        self.assertNotIn('tt0114709', ranked)
+
+    def test_movies_enriched_after_the_build_get_neighbours(self):
+        Movie.objects.create(imdb_id='tt0083190', title='Thief', genres='Crime, Drama',
+                             director='Michael Mann', actors='James Caan', fetched_at=timezone.now())
+        ranked = [item['imdbID'] for item in content.similar_movies('tt0083190')]
+        self.assertEqual(set(ranked[:2]), {'tt0113277', 'tt0369339'})
+
+    def test_detail_page_shows_more_like_this(self):
+        cache.clear()
+        response = self.client.get(reverse('movies-detail-html', args=['tt0113277']))
+        self.assertContains(response, 'More Like This')
+        self.assertContains(response, reverse('movies-detail-html', args=['tt0369339']))
@@ -5,8 +5,8 @@ from .models import Review, Movie
 
 @admin.register(Movie)
 class MovieAdmin(admin.ModelAdmin):
-    list_display = ('title', 'imdb_id')
-    search_fields = ('title', 'imdb_id')
+    list_display = ('title', 'imdb_id', 'year', 'director', 'fetched_at')
+    search_fields = ('title', 'imdb_id', 'director', 'actors')
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
@@ -0,0 +1,39 @@
+"""Async version of the review form, routed instead of ``create_review_view`` when ``ASYNC_VIEWS`` is on."""
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect
+
+from movies.async_views import arender
+from movies.metadata import schedule_enrichment
+from movies.search import asearch_movies
+from .models import Movie, Review
+from .views import parse_review_form
+
+
+@login_required
+async def create_review_view(request):
+    search_query = request.GET.get('q', '')
+    search_results = []
+
+    if search_query:
+        search_results = await asearch_movies(search_query, movie_type='movie')
+
+    context = {'search_query': search_query, 'search_results': search_results}
+    if request.method == 'POST':
+        form, error_message = parse_review_form(request.POST)
+        if form:
+            movie, created = await Movie.objects.aget_or_create(
+                imdb_id=form['imdb_id'],
+                defaults={'title': form['title']}
+            )
+            await Review.objects.acreate(
+                user=await request.auser(), movie=movie, rating=form['rating'], content=form['content']
+            )
+            if not movie.has_metadata:
+                await sync_to_async(schedule_enrichment)(movie.imdb_id)
+            return redirect('movies-list-html')
+        if error_message:
+            context['error_message'] = error_message
+
+    return await arender(request, 'movies/create_review.html', context)
@@ -0,0 +1,304 @@
+"""
+Streaming bulk import and export of reviews.
+
+Both directions use the same flat row shape (``FIELDS``) as CSV or JSON
+Lines, so an export can be imported into another database as-is. Rows are
+read and written through generators: the import holds one batch in memory at
+a time and the export walks the queryset with a chunked iterator.
+
+Each import batch is written with a handful of ``bulk_create`` and
+executemany UPDATE calls in one transaction. Bulk writes skip model signals, so
+the batch recomputes the rating aggregates of the movies it touched and sends
+``interactions_changed`` for the recommender.
+"""
+
+import csv
+import json
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from movies.metadata import fetch_movie_payloads
+from movies.models import FavoriteMovie
+from .models import Movie, Review
+from .signals import interactions_changed, recompute_aggregates
+
+FIELDS = ('username', 'imdb_id', 'title', 'rating', 'content', 'created_at', 'favorite')
+FORMATS = ('csv', 'jsonl')
+CONFLICT_POLICIES = ('skip', 'update')
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+
+
+def detect_format(path):
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(stream, fmt):
+    """Yield one parsed row per input row; a JSON line that does not parse raises ValueError with its line number."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f"Line {number}: {exc}") from None
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def update_rows(model, objects, fields):
+    """
+    Write ``fields`` of already-saved ``objects`` with one executemany of a
+    plain UPDATE. ``bulk_update`` builds a CASE expression per row, which
+    costs more than the rest of an import batch together.
+    """
+    columns = [model._meta.get_field(name) for name in fields]
+    qn = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        qn(model._meta.db_table), ', '.join(f'{qn(field.column)} = %s' for field in columns), qn(model._meta.pk.column),
+    )
+    params = [
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in columns] + [obj.pk]
+        for obj in objects
+    ]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+
+def parse_row(raw):
+    """Normalize one input row; raises ValueError when it cannot be imported."""
+    if not isinstance(raw, dict):
+        raise ValueError("row is not an object")
+    username = str(raw.get('username') or '').strip()
+    imdb_id = str(raw.get('imdb_id') or '').strip()
+    if not username or not imdb_id:
+        raise ValueError("username and imdb_id are required")
+
+    rating = raw.get('rating')
+    if rating in (None, ''):
+        rating = None
+    else:
+        rating = int(rating)
+        if not 1 <= rating <= 10:
+            raise ValueError("rating must be between 1 and 10")
+
+    created_at = raw.get('created_at') or None
+    if created_at is not None:
+        created_at = parse_datetime(str(created_at))
+        if created_at is None:
+            raise ValueError("created_at is not an ISO 8601 datetime")
+        if timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at)
+
+    favorite = raw.get('favorite')
+    if not isinstance(favorite, bool):
+        favorite = str(favorite or '').strip().lower() in TRUE_VALUES
+
+    return {
+        'username': username,
+        'imdb_id': imdb_id,
+        'title': str(raw.get('title') or '').strip(),
+        'rating': rating,
+        'content': str(raw.get('content') or ''),
+        'created_at': created_at,
+        'favorite': favorite,
+    }
+
+
+class ReviewImporter:
+    """
+    Imports batches of rows. Counts accumulate in ``counts``; the first
+    ``max_errors`` rejected rows are kept in ``errors`` as ``(row, message)``.
+
+    A row with a rating becomes a review, a row with ``favorite`` set becomes
+    a favorite, and either may name a movie missing locally: it is created
+    from the row's title or, when the title is empty, from OMDb (one
+    concurrent lookup per batch). A review for a (user, movie) pair that
+    already has one is skipped or overwrites it, per ``on_conflict``.
+    """
+
+    def __init__(self, create_users=False, on_conflict='skip', resolve_titles=True, timeout=None, max_errors=20):
+        if on_conflict not in CONFLICT_POLICIES:
+            raise ValueError(f"on_conflict must be one of {CONFLICT_POLICIES}")
+        self.create_users = create_users
+        self.on_conflict = on_conflict
+        self.resolve_titles = resolve_titles
+        self.timeout = timeout
+        self.max_errors = max_errors
+        self.counts = Counter()
+        self.errors = []
+
+    def run(self, rows, batch_size=1000):
+        """Import ``rows`` lazily; yields the running counts after each batch."""
+        for batch in batched(rows, batch_size):
+            self.import_batch(batch)
+            yield self.counts
+
+    def import_batch(self, raw_rows):
+        rows = []
+        for raw in raw_rows:
+            self.counts['rows'] += 1
+            number = self.counts['rows']
+            try:
+                row = parse_row(raw)
+            except (ValueError, TypeError) as exc:
+                self.reject(number, str(exc))
+            else:
+                row['number'] = number
+                rows.append(row)
+        if not rows:
+            return
+
+        with transaction.atomic():
+            users = self.resolve_users({row['username'] for row in rows})
+            known = []
+            for row in rows:
+                if row['username'] in users:
+                    row['user_id'] = users[row['username']]
+                    known.append(row)
+                else:
+                    self.reject(row['number'], f"unknown user {row['username']!r}")
+            if not known:
+                return
+            self.ensure_movies(known)
+            pairs = self.write_reviews([row for row in known if row['rating'] is not None])
+            pairs |= self.write_favorites([row for row in known if row['favorite']])
+            if pairs:
+                recompute_aggregates({movie_id for _, movie_id in pairs})
+                interactions_changed.send(sender=self.__class__, pairs=sorted(pairs))
+
+    def reject(self, number, message):
+        self.counts['invalid'] += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((number, message))
+
+    def resolve_users(self, usernames):
+        users = dict(User.objects.filter(username__in=usernames).values_list('username', 'pk'))
+        missing = usernames - users.keys()
+        if missing and self.create_users:
+            password = make_password(None)  # unusable; imported accounts reset their password to log in
+            User.objects.bulk_create([User(username=name, password=password) for name in missing],
+                                     ignore_conflicts=True)
+            users.update(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+            self.counts['users_created'] += len(missing)
+        return users
+
+    def ensure_movies(self, rows):
+        titles = {}
+        for row in rows:
+            titles[row['imdb_id']] = titles.get(row['imdb_id']) or row['title']
+        existing = dict(Movie.objects.filter(pk__in=titles).values_list('imdb_id', 'title'))
+        missing = [imdb_id for imdb_id in titles if imdb_id not in existing]
+        if not missing:
+            return
+
+        movies = {imdb_id: Movie(imdb_id=imdb_id, title=titles[imdb_id]) for imdb_id in missing}
+        untitled = [imdb_id for imdb_id, movie in movies.items() if not movie.title]
+        payloads = fetch_movie_payloads(untitled, timeout=self.timeout, priority='background') if self.resolve_titles and untitled else {}
+        for imdb_id in untitled:
+            if imdb_id in payloads:
+                movies[imdb_id].apply_omdb(payloads[imdb_id])
+            else:
+                movies[imdb_id].title = imdb_id  # placeholder until the metadata refresh finds it
+        Movie.objects.bulk_create(movies.values(), ignore_conflicts=True)
+        self.counts['movies_created'] += len(movies)
+        self.counts['titles_resolved'] += len(payloads)
+
+    def write_reviews(self, rows):
+        latest = {(row['user_id'], row['imdb_id']): row for row in rows}  # later rows win within a batch
+        existing = {}
+        for review in Review.objects.filter(
+            user_id__in={user_id for user_id, _ in latest}, movie_id__in={movie_id for _, movie_id in latest},
+        ).only('id', 'user_id', 'movie_id', 'created_at').order_by('id'):
+            existing.setdefault((review.user_id, review.movie_id), review)
+
+        created, updated = [], []
+        for key, row in latest.items():
+            review = existing.get(key)
+            if review is None:
+                created.append((Review(user_id=key[0], movie_id=key[1], rating=row['rating'],
+                                       content=row['content']), row['created_at']))
+            elif self.on_conflict == 'update':
+                review.rating, review.content = row['rating'], row['content']
+                review.created_at = row['created_at'] or review.created_at
+                review.updated_at = timezone.now()
+                updated.append(review)
+        self.counts['reviews_skipped'] += len(latest) - len(created) - len(updated)
+
+        Review.objects.bulk_create([review for review, _ in created])
+        # auto_now_add overrides created_at on insert, so historical timestamps are set afterwards
+        dated = []
+        for review, created_at in created:
+            if created_at is not None and review.pk is not None:
+                review.created_at = created_at
+                dated.append(review)
+        update_rows(Review, dated, ['created_at'])
+        update_rows(Review, updated, ['rating', 'content', 'created_at', 'updated_at'])
+        self.counts['reviews_created'] += len(created)
+        self.counts['reviews_updated'] += len(updated)
+        return {(review.user_id, review.movie_id) for review, _ in created} | {
+            (review.user_id, review.movie_id) for review in updated
+        }
+
+    def write_favorites(self, rows):
+        pairs = {(row['user_id'], row['imdb_id']) for row in rows}
+        if not pairs:
+            return set()
+        existing = set(FavoriteMovie.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs}, movie_id__in={movie_id for _, movie_id in pairs},
+        ).values_list('user_id', 'movie_id'))
+        new = pairs - existing
+        titles = dict(Movie.objects.filter(pk__in={movie_id for _, movie_id in new}).values_list('imdb_id', 'title'))
+        FavoriteMovie.objects.bulk_create(
+            [FavoriteMovie(user_id=user_id, movie_id=movie_id, movie_title=titles[movie_id])
+             for user_id, movie_id in new],
+            ignore_conflicts=True,
+        )
+        self.counts['favorites_created'] += len(new)
+        return new
+
+
+# -------------------------
+# Export
+# -------------------------
+
+EXPORT_COLUMNS = ('user__username', 'movie_id', 'movie__title', 'rating', 'content', 'created_at')
+EXPORT_FIELDS = FIELDS[:len(EXPORT_COLUMNS)]
+
+
+def export_rows(queryset, chunk_size=2000):
+    """Review rows in ``EXPORT_FIELDS`` order, streamed from the database ``chunk_size`` at a time."""
+    rows = queryset.select_related(None).order_by('id').values_list(*EXPORT_COLUMNS)
+    for username, imdb_id, title, rating, content, created_at in rows.iterator(chunk_size=chunk_size):
+        yield username, imdb_id, title or '', rating, content, created_at.isoformat()
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the line back, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n'
@@ -0,0 +1,61 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.bulk import CONFLICT_POLICIES, FIELDS, FORMATS, ReviewImporter, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Import reviews and favorites from CSV or JSON Lines (columns: " + ", ".join(FIELDS) + "). "
+        "The file is streamed in batches, so memory use does not grow with its size. Missing movies "
+        "are created, with titles looked up on OMDb when the row has none."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or - for stdin.")
+        parser.add_argument('--format', choices=FORMATS, help="Input format (default: from the file extension).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--on-conflict', choices=CONFLICT_POLICIES, default='skip',
+                            help="What to do with a review for a user and movie that already have one.")
+        parser.add_argument('--create-users', action='store_true',
+                            help="Create unknown usernames (with unusable passwords) instead of skipping their rows.")
+        parser.add_argument('--no-resolve', action='store_true',
+                            help="Do not call OMDb for missing titles; the imdb ID stands in until a refresh.")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Seconds to wait for each batch's OMDb lookups.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path == '-' else detect_format(path))
+        importer = ReviewImporter(
+            create_users=options['create_users'], on_conflict=options['on_conflict'],
+            resolve_titles=not options['no_resolve'], timeout=options['timeout'],
+        )
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(exc)
+        started = time.perf_counter()
+        try:
+            for counts in importer.run(read_rows(stream, fmt), options['batch_size']):
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{counts['rows']} rows ({counts['rows'] / elapsed:.0f} rows/s)")
+        except ValueError as exc:  # a line of JSON that does not parse
+            raise CommandError(exc)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for row, message in importer.errors:
+            self.stderr.write(f"Row {row}: {message}")
+        counts = importer.counts
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {counts['rows']} rows in {elapsed:.1f}s ({counts['rows'] / max(elapsed, 1e-9):.0f} rows/s): "
+            f"{counts['reviews_created']} reviews created, {counts['reviews_updated']} updated, "
+            f"{counts['reviews_skipped']} skipped, {counts['favorites_created']} favorites, "
+            f"{counts['movies_created']} movies ({counts['titles_resolved']} resolved on OMDb), "
+            f"{counts['users_created']} users, {counts['invalid']} rejected."
+        ))
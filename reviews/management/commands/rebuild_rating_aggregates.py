@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from reviews.models import Movie, Review
+from reviews.stats import invalidate_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute Movie.rating_sum / review_count from the reviews table, or just report drift with --verify."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Only report movies whose aggregates are wrong.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        totals = {
+            row['movie_id']: (row['total'], row['count'])
+            for row in Review.objects.filter(movie__isnull=False)
+            .values('movie_id')
+            .annotate(total=Sum('rating'), count=Count('id'))
+        }
+
+        stale = []
+        for movie in Movie.objects.only('imdb_id', 'rating_sum', 'review_count').iterator(chunk_size=options['batch_size']):
+            expected = totals.get(movie.imdb_id, (0, 0))
+            if (movie.rating_sum, movie.review_count) != expected:
+                if options['verify']:
+                    self.stdout.write(
+                        f"{movie.imdb_id}: stored sum={movie.rating_sum} count={movie.review_count}, "
+                        f"expected sum={expected[0]} count={expected[1]}"
+                    )
+                movie.rating_sum, movie.review_count = expected
+                stale.append(movie)
+
+        if options['verify']:
+            style = self.style.WARNING if stale else self.style.SUCCESS
+            self.stdout.write(style(f"{len(stale)} movie(s) with out-of-date aggregates."))
+            return
+
+        with transaction.atomic():
+            Movie.objects.bulk_update(stale, ['rating_sum', 'review_count'], batch_size=options['batch_size'])
+            invalidate_stats([movie.imdb_id for movie in stale])
+        self.stdout.write(self.style.SUCCESS(f"Fixed aggregates for {len(stale)} movie(s)."))
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_movie_remove_review_movie_title_alter_review_rating_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='actors',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='director',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='fetched_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='genres',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='imdb_rating',
+            field=models.CharField(blank=True, max_length=8),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='language',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='plot',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='poster',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rated',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='released',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='runtime',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='writer',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='year',
+            field=models.CharField(blank=True, max_length=16),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:01
+
+from django.db import migrations, models
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Movie = apps.get_model('reviews', 'Movie')
+    Review = apps.get_model('reviews', 'Review')
+    totals = (
+        Review.objects.filter(movie__isnull=False)
+        .values('movie_id')
+        .annotate(total=models.Sum('rating'), count=models.Count('id'))
+    )
+    for row in totals:
+        Movie.objects.filter(pk=row['movie_id']).update(rating_sum=row['total'], review_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0004_movie_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
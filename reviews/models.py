@@ -1,19 +1,103 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Movie(models.Model):
     """
     Represents a movie stored in the local database.
+
+    Besides anchoring reviews, the row caches the OMDb detail record so pages
+    can render without calling OMDb. ``fetched_at`` is empty for rows that were
+    only created from a title (e.g. via the review form) and never enriched.
     """
     imdb_id = models.CharField(max_length=20, unique=True, primary_key=True)
     title = models.CharField(max_length=255)
+    year = models.CharField(max_length=16, blank=True)
+    rated = models.CharField(max_length=16, blank=True)
+    released = models.CharField(max_length=32, blank=True)
+    runtime = models.CharField(max_length=32, blank=True)
+    genres = models.CharField(max_length=255, blank=True)  # comma separated, as OMDb sends it
+    director = models.CharField(max_length=255, blank=True)
+    writer = models.TextField(blank=True)
+    actors = models.TextField(blank=True)
+    plot = models.TextField(blank=True)
+    language = models.CharField(max_length=255, blank=True)
+    poster = models.URLField(max_length=500, blank=True)
+    imdb_rating = models.CharField(max_length=8, blank=True)
+    fetched_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Any save, including rows created without metadata; the search index syncs on it
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Rating aggregates, kept in step with Review rows by reviews.signals
+    rating_sum = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+
+    # OMDb payload key -> model field
+    OMDB_FIELDS = {
+        'Title': 'title',
+        'Year': 'year',
+        'Rated': 'rated',
+        'Released': 'released',
+        'Runtime': 'runtime',
+        'Genre': 'genres',
+        'Director': 'director',
+        'Writer': 'writer',
+        'Actors': 'actors',
+        'Plot': 'plot',
+        'Language': 'language',
+        'Poster': 'poster',
+        'imdbRating': 'imdb_rating',
+    }
 
     def __str__(self):
         return f"{self.title} ({self.imdb_id})"
 
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.review_count, 1) if self.review_count else 0
+
+    @property
+    def has_metadata(self):
+        return self.fetched_at is not None
+
+    def is_stale(self):
+        max_age = timedelta(seconds=settings.MOVIE_METADATA_MAX_AGE)
+        return not self.has_metadata or timezone.now() - self.fetched_at > max_age
+
+    def apply_omdb(self, data):
+        """Copy a validated OMDb detail payload onto this row (does not save).
+
+        Values are cut to the column's ``max_length``: anthology films list more
+        directors than fit, and PostgreSQL rejects an over-long value outright.
+        """
+        for key, field in self.OMDB_FIELDS.items():
+            value = data.get(key) or ''
+            max_length = self._meta.get_field(field).max_length
+            setattr(self, field, '' if value == 'N/A' else value[:max_length])
+        self.fetched_at = timezone.now()
+
+    def as_omdb(self):
+        """The row in OMDb's payload shape, so templates can treat both alike."""
+        data = {key: getattr(self, field) or 'N/A' for key, field in self.OMDB_FIELDS.items()}
+        data['imdbID'] = self.imdb_id
+        return data
+
 class Review(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='reviews', null=True)
-    rating = models.IntegerField()
+    rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(10)])
     content = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the reviews API (newest first)
+            models.Index(fields=['-created_at', '-id'], name='review_created_idx'),
+            # Per-movie review pages on the detail view
+            models.Index(fields=['movie', '-created_at', '-id'], name='review_movie_created_idx'),
+        ]
\ No newline at end of file
@@ -2,7 +2,18 @@ from rest_framework import serializers
 from .models import Review
 
 class ReviewSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+    movie_title = serializers.CharField(source='movie.title', read_only=True, default=None)
+
     class Meta:
         model = Review
         fields = '__all__'
-        read_only_fields = ['user', 'created_at']
+        read_only_fields = ['user', 'created_at', 'updated_at']
+
+    def __init__(self, *args, **kwargs):
+        # Optional sparse fieldset, e.g. fields=['id', 'rating']
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
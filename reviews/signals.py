@@ -0,0 +1,76 @@
+"""
+Keep the denormalized ``Movie.rating_sum`` / ``Movie.review_count`` in step
+with ``Review`` rows.
+
+Every change is applied as a single ``UPDATE ... SET x = x + n`` so concurrent
+writers never lose an increment. Queryset ``update()``/``delete()`` bypass
+signals; run ``manage.py rebuild_rating_aggregates`` after bulk edits, or
+call ``recompute_aggregates`` for the movies a bulk write touched.
+
+Writers that bypass model signals (bulk imports, favorite toggles) send
+``interactions_changed`` with the ``(user_id, movie_id)`` pairs they wrote,
+standing in for the per-row ``post_save`` signals other apps listen to.
+"""
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from .models import Movie, Review
+from .stats import invalidate_stats
+
+
+def adjust_aggregates(movie_id, rating_delta, count_delta):
+    if movie_id is None:
+        return
+    Movie.objects.filter(pk=movie_id).update(
+        rating_sum=F('rating_sum') + rating_delta,
+        review_count=F('review_count') + count_delta,
+    )
+    invalidate_stats([movie_id])
+
+
+def recompute_aggregates(movie_ids):
+    """Recount the aggregates of the given movies from their reviews in one UPDATE."""
+    movie_ids = list(movie_ids)
+    reviews = Review.objects.filter(movie_id=OuterRef('pk')).order_by().values('movie_id')
+    Movie.objects.filter(pk__in=movie_ids).update(
+        rating_sum=Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), 0,
+                            output_field=IntegerField()),
+        review_count=Coalesce(Subquery(reviews.annotate(count=Count('id')).values('count')), 0,
+                              output_field=IntegerField()),
+    )
+    invalidate_stats(movie_ids)
+
+
+# Sent with ``pairs``, the (user_id, movie_id) cells written without model signals
+interactions_changed = Signal()
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if instance.pk and not raw:
+        instance._previous_state = (
+            Review.objects.filter(pk=instance.pk).values('movie_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=Review)
+def add_review_to_aggregates(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    if created or previous is None:
+        adjust_aggregates(instance.movie_id, instance.rating, 1)
+    elif previous['movie_id'] != instance.movie_id:
+        adjust_aggregates(previous['movie_id'], -previous['rating'], -1)
+        adjust_aggregates(instance.movie_id, instance.rating, 1)
+    elif previous['rating'] != instance.rating:
+        adjust_aggregates(instance.movie_id, instance.rating - previous['rating'], 0)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_from_aggregates(sender, instance, **kwargs):
+    adjust_aggregates(instance.movie_id, -instance.rating, -1)
@@ -0,0 +1,82 @@
+"""
+Review stats and per-user flags for a batch of movies.
+
+``movie_stats`` reads the denormalized ``Movie.rating_sum`` /
+``review_count`` and caches each movie's numbers separately, so a page that
+shares most of its movies with another page reuses their entries; the
+aggregate signals drop a movie's entry when its aggregates change.
+``user_flags`` answers "favorited?" and "reviewed?" for every movie with one
+UNION query. Together a batch costs at most two queries, and one when every
+movie's stats are cached.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Value
+
+from movies.models import FavoriteMovie
+from .models import Movie, Review
+
+EMPTY_STATS = {'average_rating': 0, 'review_count': 0}
+
+
+
+def stats_cache_key(imdb_id):
+    return f'movie-stats:{imdb_id}'
+
+
+def movie_stats(imdb_ids):
+    """``{imdb_id: {'average_rating', 'review_count'}}`` for every id; unknown movies get zeros."""
+    imdb_ids = list(dict.fromkeys(imdb_ids))
+    cached = cache.get_many([stats_cache_key(imdb_id) for imdb_id in imdb_ids])
+    stats = {imdb_id: cached[key] for imdb_id in imdb_ids if (key := stats_cache_key(imdb_id)) in cached}
+
+    missing = [imdb_id for imdb_id in imdb_ids if imdb_id not in stats]
+    if missing:
+        found = Movie.objects.only('imdb_id', 'rating_sum', 'review_count').in_bulk(missing)
+        fresh = {
+            imdb_id: ({'average_rating': movie.average_rating, 'review_count': movie.review_count}
+                      if (movie := found.get(imdb_id)) else EMPTY_STATS)
+            for imdb_id in missing
+        }
+        cache.set_many({stats_cache_key(imdb_id): value for imdb_id, value in fresh.items()},
+                       settings.MOVIE_STATS_CACHE_TTL)
+        stats.update(fresh)
+    return stats
+
+
+def invalidate_stats(imdb_ids):
+    """Drop cached stats once the surrounding transaction commits (so no reader re-caches the old row)."""
+    keys = [stats_cache_key(imdb_id) for imdb_id in imdb_ids if imdb_id]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def user_flags(user, imdb_ids):
+    """``(favorite_ids, reviewed_ids)`` among ``imdb_ids`` for ``user``, in one query."""
+    if not user.is_authenticated or not imdb_ids:
+        return set(), set()
+    favorites = FavoriteMovie.objects.filter(user=user, movie_id__in=imdb_ids).annotate(
+        kind=Value('favorite')).values_list('movie_id', 'kind').order_by()
+    reviewed = Review.objects.filter(user=user, movie_id__in=imdb_ids).annotate(
+        kind=Value('reviewed')).values_list('movie_id', 'kind').order_by()
+    favorite_ids, reviewed_ids = set(), set()
+    for imdb_id, kind in favorites.union(reviewed):
+        (favorite_ids if kind == 'favorite' else reviewed_ids).add(imdb_id)
+    return favorite_ids, reviewed_ids
+
+
+def movie_states(user, imdb_ids):
+    """Stats plus ``is_favorite`` / ``user_has_reviewed`` for each movie, keyed by imdb ID."""
+    imdb_ids = list(dict.fromkeys(imdb_ids))
+    stats = movie_stats(imdb_ids)
+    favorite_ids, reviewed_ids = user_flags(user, imdb_ids)
+    return {
+        imdb_id: {
+            **stats[imdb_id],
+            'is_favorite': imdb_id in favorite_ids,
+            'user_has_reviewed': imdb_id in reviewed_ids,
+        }
+        for imdb_id in imdb_ids
+    }
@@ -1,3 +1,245 @@
-from django.test import TestCase
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from movies import fake_omdb, omdb
+from movies.models import FavoriteMovie
+from movies.tests import TEST_CACHES, omdb_response
+from recommendations.models import InteractionChange
+from .models import Movie, Review
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.movie = Movie.objects.create(imdb_id='tt0113277', title='Heat')
+        self.other = Movie.objects.create(imdb_id='tt0110912', title='Pulp Fiction')
+
+    def test_create_update_delete_keep_aggregates_in_step(self):
+        review = Review.objects.create(user=self.user, movie=self.movie, rating=8, content='Great')
+        Review.objects.create(user=self.user, movie=self.movie, rating=6, content='Fine')
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_sum, self.movie.review_count), (14, 2))
+        self.assertEqual(self.movie.average_rating, 7.0)
+
+        review.rating = 10
+        review.save()
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_sum, self.movie.review_count), (16, 2))
+
+        review.movie = self.other
+        review.save()
+        self.movie.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.movie.rating_sum, self.movie.review_count), (6, 1))
+        self.assertEqual((self.other.rating_sum, self.other.review_count), (10, 1))
+
+        review.delete()
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.rating_sum, self.other.review_count), (0, 0))
+
+    def test_api_writes_update_aggregates(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(reverse('review-list'), {'movie': self.movie.pk, 'rating': 9, 'content': 'Wow'})
+        self.assertEqual(response.status_code, 201)
+        client.patch(reverse('review-detail', args=[response.data['id']]), {'rating': 5})
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_sum, self.movie.review_count), (5, 1))
+
+    def test_api_rejects_ratings_outside_1_to_10(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for rating in (0, -5, 11, 5000000000):
+            response = client.post(reverse('review-list'), {'movie': self.movie.pk, 'rating': rating, 'content': 'Hm'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('rating', response.data)
+        self.assertFalse(Review.objects.exists())
+
+    def test_rebuild_command_repairs_drift(self):
+        Review.objects.create(user=self.user, movie=self.movie, rating=7, content='Good')
+        Movie.objects.filter(pk=self.movie.pk).update(rating_sum=0, review_count=0)
+
+        out = StringIO()
+        call_command('rebuild_rating_aggregates', '--verify', stdout=out)
+        self.assertIn('1 movie(s) with out-of-date aggregates', out.getvalue())
+
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_sum, self.movie.review_count), (7, 1))
+
+
+class ReviewApiTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        self.heat = Movie.objects.create(imdb_id='tt0113277', title='Heat')
+        self.thief = Movie.objects.create(imdb_id='tt0083190', title='Thief')
+        for rating in range(1, 8):
+            Review.objects.create(user=self.alice, movie=self.heat, rating=rating, content=f'{rating}')
+        Review.objects.create(user=self.bob, movie=self.thief, rating=9, content='bob')
+        self.client = APIClient()
+
+    def test_cursor_pagination_walks_newest_first(self):
+        response = self.client.get(reverse('review-list'), {'page_size': 5})
+        self.assertEqual([r['content'] for r in response.data['results']], ['bob', '7', '6', '5', '4'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([r['content'] for r in response.data['results']], ['3', '2', '1'])
+        self.assertIsNone(response.data['next'])
+
+    def test_filters_and_sparse_fields(self):
+        response = self.client.get(reverse('review-list'), {
+            'movie': 'tt0113277', 'min_rating': 3, 'max_rating': 5, 'fields': 'rating,username',
+        })
+        self.assertEqual(response.data['results'], [
+            {'username': 'alice', 'rating': 5}, {'username': 'alice', 'rating': 4}, {'username': 'alice', 'rating': 3},
+        ])
+        self.assertEqual(self.client.get(reverse('review-list'), {'user': 'x'}).status_code, 400)
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('review-list'), {'page_size': 8})
+
+    def test_unchanged_page_returns_304(self):
+        first = self.client.get(reverse('review-list'))
+        with self.assertNumQueries(1):
+            cached = self.client.get(reverse('review-list'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        review = Review.objects.get(content='bob')
+        review.rating = 10
+        review.save()
+        self.assertEqual(self.client.get(reverse('review-list'), HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_renamed_movie_or_user_changes_the_etag(self):
+        first = self.client.get(reverse('review-list'))['ETag']
+        self.heat.title = 'Heat (1995)'
+        self.heat.save()
+        second = self.client.get(reverse('review-list'))['ETag']
+        self.assertNotEqual(second, first)
+        self.alice.username = 'alicia'
+        self.alice.save()
+        self.assertNotEqual(self.client.get(reverse('review-list'))['ETag'], second)
+
+    def test_export_streams_filtered_reviews(self):
+        self.assertEqual(self.client.get(reverse('review-export', args=['csv'])).status_code, 401)
+        self.client.force_authenticate(self.alice)
+        response = self.client.get(reverse('review-export', args=['csv']), {'movie': 'tt0113277', 'min_rating': 6})
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'username,imdb_id,title,rating,content,created_at')
+        self.assertEqual([line.split(',')[3] for line in lines[1:]], ['6', '7'])
+
+        response = self.client.get(reverse('review-export', args=['jsonl']), {'user': self.bob.pk})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(row['username'], row['imdb_id'], row['rating']) for row in rows], [('bob', 'tt0083190', 9)])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReviewImportTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice')
+        Movie.objects.create(imdb_id='tt0113277', title='Heat')
+        Review.objects.create(user=self.alice, movie_id='tt0113277', rating=5, content='old')
+
+    def run_import(self, text, *args):
+        path = Path(tempfile.mkdtemp(), 'reviews.csv')
+        path.write_text(text)
+        out = StringIO()
+        call_command('import_reviews', str(path), *args, stdout=out, stderr=out)
+        return out.getvalue()
+
+    def test_import_creates_reviews_movies_and_favorites(self):
+        text = (
+            "username,imdb_id,title,rating,content,created_at,favorite\n"
+            "alice,tt0113277,Heat,9,again,,\n"
+            "bob,tt0083190,Thief,8,tense,2020-01-02T03:04:05+00:00,yes\n"
+            "carol,tt0083190,,11,bad rating,,\n"
+        )
+        out = self.run_import(text, '--create-users', '--no-resolve')
+        self.assertIn('Row 3: rating must be between 1 and 10', out)
+
+        out = self.run_import("username,imdb_id,rating\nnobody,tt0113277,5\nalice,tt0113277,6\n")
+        self.assertIn("Row 1: unknown user 'nobody'", out)
+
+        self.assertEqual(Review.objects.get(user=self.alice).content, 'old')  # skipped by default
+        review = Review.objects.get(user__username='bob')
+        self.assertEqual((review.movie.title, review.rating), ('Thief', 8))
+        self.assertEqual(review.created_at.year, 2020)
+        self.assertEqual((review.movie.rating_sum, review.movie.review_count), (8, 1))
+        self.assertTrue(FavoriteMovie.objects.filter(user__username='bob', movie_id='tt0083190').exists())
+        self.assertTrue(InteractionChange.objects.filter(user_id=review.user_id, movie_id='tt0083190').exists())
+
+        self.run_import("username,imdb_id,rating,content\nalice,tt0113277,9,again\n", '--on-conflict', 'update')
+        self.assertEqual(Review.objects.get(user=self.alice).content, 'again')
+        self.assertEqual(Movie.objects.get(pk='tt0113277').rating_sum, 9)
+
+    def test_jsonl_rows_that_are_not_objects_are_rejected(self):
+        text = '[1, 2]\n\n"x"\n{"username": "alice", "imdb_id": "tt0113277", "favorite": true}\n'
+        out = self.run_import(text, '--format', 'jsonl')
+        self.assertIn('Row 1: row is not an object', out)
+        self.assertIn('Row 2: row is not an object', out)
+        self.assertTrue(FavoriteMovie.objects.filter(user=self.alice, movie_id='tt0113277').exists())
+
+        # Broken JSON stops the import at its own line, whatever the batching
+        with self.assertRaisesMessage(CommandError, 'Line 4: Expecting'):
+            self.run_import('{"username": "alice"}\n\n{}\n{oops\n', '--format', 'jsonl', '--batch-size', '2')
+
+    def test_missing_titles_are_resolved_from_omdb(self):
+        def lookup(url, params, timeout):
+            found = params['i'] == 'tt0122690'
+            return omdb_response(fake_omdb.movie(params['i']) if found else {'Response': 'False'})
+
+        omdb.local_cache.clear()
+        omdb.breaker.reset()
+        with mock.patch('movies.omdb.requests.Session.get', side_effect=lookup) as get:
+            self.run_import("username,imdb_id,rating,content\nalice,tt0122690,7,ok\nalice,tt9999999,6,?\n")
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(Movie.objects.get(pk='tt0122690').title, 'Movie tt0122690')
+        self.assertEqual(Movie.objects.get(pk='tt9999999').title, 'tt9999999')
+
+
+@override_settings(CACHES=TEST_CACHES, MOVIE_STATS_MAX_IDS=3)
+class MovieStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user('alice')
+        bob = User.objects.create_user('bob')
+        self.heat = Movie.objects.create(imdb_id='tt0113277', title='Heat')
+        Review.objects.create(user=self.alice, movie=self.heat, rating=8, content='Great')
+        Review.objects.create(user=bob, movie=self.heat, rating=5, content='Long')
+        FavoriteMovie.objects.create(user=self.alice, movie_id='tt0083190', movie_title='Thief')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_stats_and_flags_in_two_queries_then_one(self):
+        url = reverse('movie-stats')
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'ids': 'tt0113277,tt0083190'})
+        self.assertEqual(response.data['results'], {
+            'tt0113277': {'average_rating': 6.5, 'review_count': 2, 'is_favorite': False, 'user_has_reviewed': True},
+            'tt0083190': {'average_rating': 0, 'review_count': 0, 'is_favorite': True, 'user_has_reviewed': False},
+        })
+        with self.assertNumQueries(1):
+            self.client.post(url, {'ids': ['tt0113277', 'tt0083190']}, format='json')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=self.alice, movie=self.heat, rating=2, content='Again')
+        response = self.client.get(url, {'ids': 'tt0113277'})
+        self.assertEqual(response.data['results']['tt0113277']['review_count'], 3)
+
+    def test_id_limit_and_anonymous_flags(self):
+        url = reverse('movie-stats')
+        self.assertEqual(self.client.get(url, {'ids': 'a,b,c,d'}).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 400)
+        response = APIClient().get(url, {'ids': 'tt0083190'})
+        self.assertFalse(response.data['results']['tt0083190']['is_favorite'])
@@ -1,8 +1,16 @@
-from django.urls import path
-from .views import ReviewListCreateView, ReviewDetailView, create_review_view
+from django.conf import settings
+from django.urls import path, re_path
+from . import async_views, views
+from .views import MovieStatsView, ReviewListCreateView, ReviewDetailView, ReviewExportView
+
+# Under ASGI the review form (which searches OMDb) is served by its async version
+page_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path('', ReviewListCreateView.as_view(), name='review-list'),
+    # The format is in the path: DRF reserves the ?format= query parameter
+    re_path(r'^export\.(?P<fmt>csv|jsonl)$', ReviewExportView.as_view(), name='review-export'),
+    path('stats/', MovieStatsView.as_view(), name='movie-stats'),
     path('<int:pk>/', ReviewDetailView.as_view(), name='review-detail'),
-    path('review/create/', create_review_view, name='create-review'),
+    path('review/create/', page_views.create_review_view, name='create-review'),
 ]
@@ -1,31 +1,153 @@
-import os
-import requests
+import hashlib
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
 
-from movies.views import fetch_from_omdb
+from movies.metadata import schedule_enrichment
+from movies.search import search_movies
+from .bulk import csv_lines, export_rows, jsonl_lines
 from .models import Review, Movie
+from .pagination import ReviewCursorPagination
 from .serializers import ReviewSerializer
+from .stats import movie_states
 
-from rest_framework import generics
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.response import Response
 
 
 # -------------------------
 # DRF API Views
 # -------------------------
 
+def _int_param(params, name):
+    try:
+        return int(params[name])
+    except ValueError:
+        raise ValidationError({name: "Must be an integer."})
+
+
+def filter_reviews(queryset, params):
+    """Apply the ``movie``, ``user``, ``min_rating`` and ``max_rating`` query params."""
+    if params.get('movie'):
+        queryset = queryset.filter(movie_id=params['movie'])
+    if params.get('user'):
+        queryset = queryset.filter(user_id=_int_param(params, 'user'))
+    if params.get('min_rating'):
+        queryset = queryset.filter(rating__gte=_int_param(params, 'min_rating'))
+    if params.get('max_rating'):
+        queryset = queryset.filter(rating__lte=_int_param(params, 'max_rating'))
+    return queryset
+
+
 class ReviewListCreateView(generics.ListCreateAPIView):
-    queryset = Review.objects.all().order_by('-created_at')
+    """
+    Newest-first, cursor-paginated reviews.
+
+    Query params: ``movie`` (imdb ID), ``user`` (user ID), ``min_rating`` /
+    ``max_rating``, ``fields`` (comma-separated sparse fieldset) and
+    ``page_size``. Responses carry an ETag derived from the ids and update
+    times of the rows on the page, so polling clients get a 304 after a
+    single narrow query.
+    """
+    queryset = Review.objects.select_related('user', 'movie')
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = ReviewCursorPagination
+
+    def get_queryset(self):
+        return filter_reviews(super().get_queryset(), self.request.query_params)
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.request.query_params.get('fields')
+        if fields and self.request.method == 'GET':
+            kwargs['fields'] = [name.strip() for name in fields.split(',') if name.strip()]
+        return super().get_serializer(*args, **kwargs)
+
+    def page_etag(self, queryset):
+        """
+        ETag for the requested page, computed without loading or serializing
+        full rows. The page shows the reviewer's name and the movie's title, so
+        ``user.username`` and the movie's ``updated_at`` go into the digest too.
+        """
+        paginator = self.pagination_class()
+        narrow = queryset.only('id', 'created_at', 'updated_at', 'user__username', 'movie__updated_at')
+        keys = paginator.paginate_queryset(narrow, self.request, view=self)
+        digest = hashlib.sha1(self.request.get_full_path().encode())
+        for review in keys:
+            movie_updated = review.movie.updated_at.isoformat() if review.movie else ''
+            digest.update(f"{review.pk}:{review.updated_at.isoformat()}:{review.user.username}:{movie_updated};".encode())
+        digest.update(str(paginator.has_next).encode())
+        return quote_etag(digest.hexdigest())
+
+    def list(self, request, *args, **kwargs):
+        etag = self.page_etag(self.filter_queryset(self.get_queryset()))
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ReviewExportView(generics.GenericAPIView):
+    """
+    Every review matching the list filters as CSV or JSON Lines, oldest
+    first, in the format ``import_reviews`` reads. The response is streamed
+    from a chunked database cursor, so exports of any size run in constant
+    memory. Signed-in users only: an unfiltered export is the whole table.
+    """
     queryset = Review.objects.all()
+    permission_classes = [IsAuthenticated]
+    CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson'}
+
+    def get(self, request, fmt):
+        rows = export_rows(filter_reviews(self.get_queryset(), request.query_params))
+        lines = csv_lines(rows) if fmt == 'csv' else jsonl_lines(rows)
+        response = StreamingHttpResponse(lines, content_type=self.CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="reviews.{fmt}"'
+        return response
+
+
+class MovieStatsView(generics.GenericAPIView):
+    """
+    Review stats plus the caller's ``is_favorite`` / ``user_has_reviewed``
+    flags for up to ``MOVIE_STATS_MAX_IDS`` movies in one round-trip:
+    ``GET ?ids=tt1,tt2`` or ``POST {"ids": [...]}`` for longer lists.
+    Answered with at most two queries (see ``reviews.stats``).
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        ids = request.query_params.get('ids', '')
+        return self.respond([imdb_id.strip() for imdb_id in ids.split(',')])
+
+    def post(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(imdb_id, str) for imdb_id in ids):
+            raise ValidationError({'ids': "Must be a list of imdb IDs."})
+        return self.respond([imdb_id.strip() for imdb_id in ids])
+
+    def respond(self, ids):
+        ids = list(dict.fromkeys(imdb_id for imdb_id in ids if imdb_id))
+        limit = settings.MOVIE_STATS_MAX_IDS
+        if not ids:
+            raise ValidationError({'ids': "At least one imdb ID is required."})
+        if len(ids) > limit:
+            raise ValidationError({'ids': f"At most {limit} imdb IDs per request."})
+        response = Response({'results': movie_states(self.request.user, ids)})
+        patch_vary_headers(response, ['Cookie', 'Authorization'])
+        return response
+
+
+class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Review.objects.select_related('user', 'movie')
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -34,42 +156,46 @@ class ReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
 # Template-based Views
 # -------------------------
 
+def parse_review_form(data):
+    """``(fields, error_message)`` for the review form; ``fields`` is None unless the form is complete and valid."""
+    imdb_id = data.get('imdb_id')
+    title = data.get('title')
+    rating = data.get('rating')
+    content = data.get('content')
+    if not (imdb_id and title and rating and content):
+        return None, None
+    try:
+        rating_int = int(rating)
+        if not 1 <= rating_int <= 10:
+            raise ValueError("Rating must be between 1 and 10.")
+    except (ValueError, TypeError):
+        return None, "Invalid rating. Please provide a number between 1 and 10."
+    return {'imdb_id': imdb_id, 'title': title, 'rating': rating_int, 'content': content}, None
+
+
 @login_required
 def create_review_view(request):
     search_query = request.GET.get('q', '')
     search_results = []
 
     if search_query:
-        params = {'s': search_query, 'type': 'movie'}
-        data = fetch_from_omdb(params)
-        if data and data.get('Response') == 'True':
-            search_results = data.get('Search', [])
+        search_results = search_movies(search_query, movie_type='movie')
 
+    context = {'search_query': search_query, 'search_results': search_results}
     if request.method == 'POST':
-        imdb_id = request.POST.get('imdb_id')
-        title = request.POST.get('title')
-        rating = request.POST.get('rating')
-        content = request.POST.get('content')
-        error_message = None
-
-        if imdb_id and title and rating and content:
-            try:
-                rating_int = int(rating)
-                if not 1 <= rating_int <= 10:
-                    raise ValueError("Rating must be between 1 and 10.")
-                
-                movie, created = Movie.objects.get_or_create(
-                    imdb_id=imdb_id,
-                    defaults={'title': title}
-                )
-                Review.objects.create(
-                    user=request.user, movie=movie, rating=rating_int, content=content
-                )
-                return redirect('movies-list-html')
-            except (ValueError, TypeError):
-                error_message = "Invalid rating. Please provide a number between 1 and 10."
-                context = {'search_query': search_query, 'search_results': search_results, 'error_message': error_message}
-                return render(request, 'movies/create_review.html', context)
+        form, error_message = parse_review_form(request.POST)
+        if form:
+            movie, created = Movie.objects.get_or_create(
+                imdb_id=form['imdb_id'],
+                defaults={'title': form['title']}
+            )
+            Review.objects.create(
+                user=request.user, movie=movie, rating=form['rating'], content=form['content']
+            )
+            if not movie.has_metadata:
+                schedule_enrichment(movie.imdb_id)
+            return redirect('movies-list-html')
+        if error_message:
+            context['error_message'] = error_message
 
-    context = {'search_query': search_query, 'search_results': search_results}
     return render(request, 'movies/create_review.html', context)
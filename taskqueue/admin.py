@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import Task
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'key', 'status', 'attempts', 'created_at', 'started_at', 'finished_at')
+    search_fields = ('name', 'key')
+    list_filter = ('status', 'name')
@@ -0,0 +1,58 @@
+import os
+import socket
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from taskqueue.queue import purge, queue_stats, run_batch
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (metadata enrichment and refreshes, feed rebuilds)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.TASK_WORKER_CONCURRENCY,
+                            help="Tasks run at once by this worker (threads).")
+        parser.add_argument('--loop', action='store_true', help="Keep polling for new tasks instead of exiting.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Seconds to sleep when nothing is due (--loop).")
+        parser.add_argument('--stats', action='store_true', help="Print queue depth and latency, then exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.print_stats()
+            return
+
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        concurrency = max(1, options['concurrency'])
+        totals = Counter()
+        last_purge = 0.0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='task') as executor:
+            while True:
+                outcomes = run_batch(worker, concurrency, executor if concurrency > 1 else None)
+                totals.update(outcomes)
+                if outcomes:
+                    self.stdout.write(", ".join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items())))
+                    continue
+                if time.monotonic() - last_purge > 600:
+                    purge()
+                    last_purge = time.monotonic()
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Task queue drained ({totals['done']} done, {totals['retried']} retried, {totals['failed']} failed)."
+        ))
+
+    def print_stats(self):
+        stats = queue_stats()
+        for name, statuses in sorted(stats['depth'].items()):
+            self.stdout.write(f"{name:<36} " + "  ".join(f"{status}={count}" for status, count in sorted(statuses.items())))
+        recent = {key: '-' if value is None else f'{value}s' for key, value in stats['recent'].items()}
+        self.stdout.write(
+            f"oldest due: {stats['oldest_due_seconds']}s  finished in the last hour: {stats['recent']['done']}  "
+            f"wait p50/p95: {recent['wait_p50']}/{recent['wait_p95']}  "
+            f"run p50/p95: {recent['run_p50']}/{recent['run_p95']}"
+        )
@@ -0,0 +1,236 @@
+"""
+A small durable task queue in the database.
+
+Request handlers ``enqueue`` follow-up work (metadata enrichment and
+refreshes, feed rebuilds) as ``Task`` rows, written in the same transaction as
+the change that caused it, and ``manage.py run_tasks`` workers run it off the
+request path. Task functions are registered with ``@task`` in each app's
+``tasks.py``.
+
+A worker claims a due task with one conditional UPDATE, so any number of
+workers can poll the same table, on SQLite or PostgreSQL, without running a
+task twice. A claim is a lease of ``TASK_LEASE_SECONDS``: a task whose worker
+died is claimed again once its lease runs out. A task that raises is retried
+with exponential backoff until it has had ``max_attempts``, then marked
+failed. ``concurrency`` caps how many tasks of one name run at once across
+all workers (checked when claiming, so it is a soft limit).
+
+With ``TASKS_INLINE`` on, ``enqueue`` runs the function itself once the
+current transaction commits, for development without a worker. A key still
+waiting to run is not queued twice, and a task that raises is logged rather
+than failing the request that queued it.
+"""
+
+import logging
+import time
+from collections import Counter, namedtuple
+from functools import partial
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from movierec import metrics
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TaskSpec = namedtuple('TaskSpec', 'name func max_attempts retry_delay concurrency')
+
+_registry = {}
+
+
+def task(name, max_attempts=3, retry_delay=30, concurrency=None):
+    """Register ``func`` as task ``name``; failed runs are retried after ``retry_delay`` seconds, doubling."""
+    def decorator(func):
+        _registry[name] = TaskSpec(name, func, max_attempts, retry_delay, concurrency)
+        return func
+    return decorator
+
+
+def get_spec(name):
+    try:
+        return _registry[name]
+    except KeyError:
+        raise LookupError(f"Unknown task {name!r}") from None
+
+
+def enqueue(name, key=None, delay=0, **kwargs):
+    """Queue a call of task ``name`` with JSON-serializable ``kwargs``; a no-op while ``key`` is already pending."""
+    enqueue_many(name, [(key, kwargs)], delay)
+
+
+def enqueue_many(name, calls, delay=0):
+    """Queue several ``(key, kwargs)`` calls of task ``name`` in one INSERT."""
+    spec = get_spec(name)
+    calls = list(calls)
+    if settings.TASKS_INLINE:
+        # The connection's own on_commit list is what is still pending; a rollback empties it
+        pending = {getattr(func, 'task_key', None) for _, func, _ in transaction.get_connection().run_on_commit}
+        for key, kwargs in calls:
+            if key is not None and (name, key) in pending:
+                continue
+            callback = partial(_run_inline, spec, kwargs)
+            callback.task_key = (name, key)
+            pending.add(callback.task_key)
+            transaction.on_commit(callback)
+        return
+    run_after = timezone.now() + timedelta(seconds=delay)
+    Task.objects.bulk_create(
+        [Task(name=name, key=key, kwargs=kwargs, max_attempts=spec.max_attempts, run_after=run_after)
+         for key, kwargs in calls],
+        ignore_conflicts=True,
+    )
+
+
+def _run_inline(spec, kwargs):
+    try:
+        spec.func(**kwargs)
+    except Exception:
+        logger.exception("Inline task %s failed", spec.name)
+
+
+def _due(now):
+    return Q(status=Task.PENDING, run_after__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+
+
+def claim(worker, limit):
+    """Lease up to ``limit`` due tasks to ``worker``, oldest first, within each task's concurrency."""
+    now = timezone.now()
+    running = Counter(dict(
+        Task.objects.filter(status=Task.RUNNING, locked_until__gte=now)
+        .values_list('name').annotate(n=Count('id')).order_by()
+    ))
+    candidates = Task.objects.filter(_due(now)).order_by('run_after', 'id').values_list('id', 'name')[:limit * 4]
+
+    claimed = []
+    for pk, name in candidates:
+        if len(claimed) >= limit:
+            break
+        spec = _registry.get(name)
+        if spec and spec.concurrency and running[name] >= spec.concurrency:
+            continue
+        # Only one worker's UPDATE can still find the row due
+        updated = Task.objects.filter(_due(now), pk=pk).update(
+            status=Task.RUNNING, worker=worker, started_at=now, attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.TASK_LEASE_SECONDS),
+        )
+        if updated:
+            running[name] += 1
+            claimed.append(pk)
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_after', 'id'))
+
+
+def _retry_or_fail(task_row, spec, error):
+    now = timezone.now()
+    mine = Task.objects.filter(pk=task_row.pk, status=Task.RUNNING, worker=task_row.worker)
+    if spec is not None and task_row.attempts < task_row.max_attempts:
+        delay = spec.retry_delay * 2 ** (task_row.attempts - 1)
+        try:
+            with transaction.atomic():
+                mine.update(status=Task.PENDING, run_after=now + timedelta(seconds=delay),
+                            locked_until=None, last_error=error)
+            return 'retried'
+        except IntegrityError:
+            # Someone queued the same key meanwhile; that task will do the work
+            error += "\n(superseded by a newer pending task with the same key)"
+    mine.update(status=Task.FAILED, finished_at=now, locked_until=None, last_error=error)
+    return 'failed'
+
+
+def execute(task_row):
+    """Run one claimed task and record the outcome: ``done``, ``retried`` or ``failed``."""
+    spec = _registry.get(task_row.name)
+    started = time.perf_counter()
+    try:
+        if spec is None:
+            raise LookupError(f"Unknown task {task_row.name!r}")
+        spec.func(**task_row.kwargs)
+    except Exception as exc:
+        logger.warning("Task %s #%s failed (attempt %s of %s)", task_row.name, task_row.pk,
+                       task_row.attempts, task_row.max_attempts, exc_info=True)
+        outcome = _retry_or_fail(task_row, spec, f"{type(exc).__name__}: {exc}")
+    else:
+        Task.objects.filter(pk=task_row.pk, status=Task.RUNNING, worker=task_row.worker).update(
+            status=Task.DONE, finished_at=timezone.now(), locked_until=None, last_error='')
+        outcome = 'done'
+    metrics.tasks_total.inc(task=task_row.name, outcome=outcome)
+    metrics.task_duration.observe(time.perf_counter() - started, task=task_row.name)
+    metrics.task_wait.observe((task_row.started_at - task_row.run_after).total_seconds(), task=task_row.name)
+    return outcome
+
+
+def _execute_in_thread(task_row):
+    close_old_connections()
+    try:
+        return execute(task_row)
+    finally:
+        close_old_connections()
+
+
+def run_batch(worker, concurrency=1, executor=None):
+    """Claim and run up to ``concurrency`` tasks (on ``executor`` if given); returns outcome counts."""
+    claimed = claim(worker, concurrency)
+    if executor is None or len(claimed) < 2:
+        return Counter(execute(task_row) for task_row in claimed)
+    return Counter(executor.map(_execute_in_thread, claimed))
+
+
+def purge(keep=None):
+    """Delete tasks that finished successfully more than ``keep`` seconds ago; returns how many."""
+    keep = keep if keep is not None else settings.TASK_KEEP_DONE
+    cutoff = timezone.now() - timedelta(seconds=keep)
+    deleted, _ = Task.objects.filter(status=Task.DONE, finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def _quantile(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else None
+
+
+def queue_stats(window=3600):
+    """
+    Queue depth by task and status, how long the oldest due task has waited,
+    and wait (due -> started) / run time quantiles of the tasks finished in
+    the last ``window`` seconds.
+    """
+    now = timezone.now()
+    depth = {}
+    active = Task.objects.filter(status__in=[Task.PENDING, Task.RUNNING, Task.FAILED])
+    for name, status, count in active.values_list('name', 'status').annotate(n=Count('id')).order_by():
+        depth.setdefault(name, {})[status] = count
+    oldest = Task.objects.filter(status=Task.PENDING, run_after__lte=now).aggregate(oldest=Min('run_after'))['oldest']
+
+    finished = (
+        Task.objects.filter(status=Task.DONE, finished_at__gte=now - timedelta(seconds=window))
+        .order_by('-finished_at').values_list('run_after', 'started_at', 'finished_at')[:1000]
+    )
+    waits = [(started - due).total_seconds() for due, started, _ in finished]
+    runs = [(end - started).total_seconds() for _, started, end in finished]
+    return {
+        'depth': depth,
+        'oldest_due_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0,
+        'recent': {
+            'done': len(runs),
+            'wait_p50': _quantile(waits, 0.5), 'wait_p95': _quantile(waits, 0.95),
+            'run_p50': _quantile(runs, 0.5), 'run_p95': _quantile(runs, 0.95),
+        },
+    }
+
+
+def export_metrics():
+    """Copy ``queue_stats`` into the Prometheus gauges (called when /metrics is scraped)."""
+    stats = queue_stats()
+    metrics.task_queue_depth.clear()
+    for name, statuses in stats['depth'].items():
+        for status, count in statuses.items():
+            metrics.task_queue_depth.set(count, task=name, status=status)
+    metrics.task_oldest_due.set(stats['oldest_due_seconds'])
+    for kind in ('wait', 'run'):
+        for quantile, suffix in (('0.5', 'p50'), ('0.95', 'p95')):
+            value = stats['recent'][f'{kind}_{suffix}']
+            if value is not None:
+                metrics.task_latency.set(value, kind=kind, quantile=quantile)
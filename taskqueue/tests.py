@@ -0,0 +1,128 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from movies import omdb
+from movies.tests import TEST_CACHES, omdb_response
+from reviews.models import Movie
+from .models import Task
+from .queue import claim, enqueue, execute, queue_stats, run_batch, task
+
+calls = []
+
+HEAT = {'Response': 'True', 'imdbID': 'tt0113277', 'Title': 'Heat', 'Year': '1995', 'Genre': 'Crime, Drama',
+        'Director': 'Michael Mann', 'Plot': 'A group of professional bank robbers.'}
+
+
+@task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('tests.flaky', max_attempts=2, retry_delay=10)
+def flaky():
+    raise RuntimeError("upstream down")
+
+
+@task('tests.limited', concurrency=1)
+def limited():
+    pass
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_pending_key_is_deduplicated(self):
+        enqueue('tests.record', key='k', value=1)
+        enqueue('tests.record', key='k', value=2)
+        self.assertEqual(run_batch('w1', 5), {'done': 1})
+        self.assertEqual(calls, [1])
+        # Once the first one ran the key can be queued again
+        enqueue('tests.record', key='k', value=3)
+        self.assertEqual(Task.objects.filter(status=Task.PENDING).count(), 1)
+
+    def test_failures_back_off_then_fail(self):
+        enqueue('tests.flaky')
+        with self.assertLogs('taskqueue.queue', 'WARNING'):
+            self.assertEqual(run_batch('w1'), {'retried': 1})
+        row = Task.objects.get()
+        self.assertEqual((row.status, row.attempts), (Task.PENDING, 1))
+        self.assertGreater(row.run_after, timezone.now() + timedelta(seconds=5))
+        self.assertIn("upstream down", row.last_error)
+        self.assertEqual(run_batch('w1'), {})  # not due yet
+
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('taskqueue.queue', 'WARNING'):
+            self.assertEqual(run_batch('w1'), {'failed': 1})
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_concurrency_limit_and_expired_leases(self):
+        enqueue('tests.limited')
+        enqueue('tests.limited')
+        self.assertEqual(len(claim('w1', 5)), 1)
+        self.assertEqual(claim('w2', 5), [])
+
+        # The first worker died: its lease runs out and another worker takes the task over
+        Task.objects.filter(status=Task.RUNNING).update(locked_until=timezone.now() - timedelta(seconds=1))
+        reclaimed = claim('w2', 5)
+        self.assertEqual([(row.worker, row.attempts) for row in reclaimed], [('w2', 2)])
+        self.assertEqual(execute(reclaimed[0]), 'done')
+
+    def test_stats(self):
+        enqueue('tests.record', value=1)
+        enqueue('tests.record', value=2, delay=60)
+        run_batch('w1')
+        stats = queue_stats()
+        self.assertEqual(stats['depth'], {'tests.record': {'pending': 1}})
+        self.assertEqual(stats['oldest_due_seconds'], 0)
+        self.assertEqual(stats['recent']['done'], 1)
+        self.assertIsNotNone(stats['recent']['run_p95'])
+
+    def test_stats_command_shows_missing_latencies_as_dashes(self):
+        enqueue('tests.record', value=1)
+        out = StringIO()
+        call_command('run_tasks', '--stats', stdout=out)
+        self.assertIn('tests.record', out.getvalue())
+        self.assertIn('wait p50/p95: -/-  run p50/p95: -/-', out.getvalue())
+        self.assertNotIn('None', out.getvalue())
+
+    @override_settings(TASKS_INLINE=True)
+    def test_inline_tasks_run_once_per_key_and_failures_are_logged(self):
+        with self.assertLogs('taskqueue.queue', 'ERROR') as logs:
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue('tests.flaky')
+                enqueue('tests.record', key='k', value=1)
+                enqueue('tests.record', key='k', value=2)
+                enqueue('tests.record', value=3)
+        self.assertEqual(calls, [1, 3])
+        self.assertIn("upstream down", logs.output[0])
+        self.assertFalse(Task.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES, OMDB_API_KEY='test-key')
+class QueuedWorkTests(TestCase):
+    def setUp(self):
+        omdb.local_cache.clear()
+        omdb.shared_cache().clear()
+        omdb.breaker.reset()
+
+    def test_review_of_unknown_movie_enqueues_enrichment(self):
+        user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(user)
+        self.client.post(reverse('create-review'), {
+            'imdb_id': 'tt0113277', 'title': 'Heat', 'rating': '9', 'content': 'Great',
+        })
+        self.assertTrue(Task.objects.filter(name='movies.enrich_movie', key='enrich-movie:tt0113277').exists())
+        self.assertTrue(Task.objects.filter(name='recommendations.build_user_feed', kwargs={'user_id': user.pk}).exists())
+
+        with mock.patch('movies.omdb.requests.Session.get', return_value=omdb_response(HEAT)):
+            Task.objects.update(run_after=timezone.now())
+            self.assertEqual(run_batch('w1', 5), {'done': 2})
+        self.assertTrue(Movie.objects.get(pk='tt0113277').has_metadata)
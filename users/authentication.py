@@ -0,0 +1,111 @@
+"""
+API authentication that resolves credentials from the cache.
+
+DRF's ``TokenAuthentication`` looks every request's token up in
+``authtoken_token`` joined to ``auth_user``. ``CachedTokenAuthentication``
+remembers token -> user id, and ``cached_user`` the user row (without its
+password hash), for ``AUTH_CACHE_TTL`` seconds, so a warm request
+authenticates without a query. ``CachedJWTAuthentication`` does the same for
+the optional signed tokens of djangorestframework-simplejwt, whose signature
+is checked without any lookup at all.
+
+Entries are dropped when a token is deleted (logout, rotation) and when its
+user is saved or deleted (password change, deactivation); see
+``users.signals``. That reaches every worker only through a shared cache,
+so ``AUTH_CACHE_TTL`` defaults to 0 (no caching) with a per-process one.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+try:
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+except ImportError:
+    JWTAuthentication = None
+
+
+def _ttl():
+    return settings.AUTH_CACHE_TTL
+
+
+def token_cache_key(key):
+    # Hashed so the cache never holds usable credentials
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def _cache_user(user):
+    cache.set(user_cache_key(user.pk), user, _ttl())
+
+
+def cached_user(user_id):
+    """User ``user_id`` from the cache or the database (password deferred); None if there is none."""
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = get_user_model().objects.defer('password').filter(pk=user_id).first()
+        if user is not None:
+            _cache_user(user)
+    return user
+
+
+def invalidate_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` with token and user lookups served from the cache."""
+
+    def authenticate_credentials(self, key):
+        if not _ttl():
+            return super().authenticate_credentials(key)
+
+        user_id = cache.get(token_cache_key(key))
+        if user_id is None:
+            token = Token.objects.select_related('user').defer('user__password').filter(key=key).first()
+            if token is None:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            user_id = token.user_id
+            cache.set(token_cache_key(key), user_id, _ttl())
+            _cache_user(token.user)
+
+        user = cached_user(user_id)
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return user, Token(key=key, user=user)
+
+
+if JWTAuthentication is not None:
+    class CachedJWTAuthentication(JWTAuthentication):
+        """simplejwt's ``JWTAuthentication`` reading the token's user from the cache."""
+
+        def get_user(self, validated_token):
+            if not _ttl() or jwt_settings.CHECK_REVOKE_TOKEN or jwt_settings.USER_ID_FIELD != 'id':
+                return super().get_user(validated_token)
+            try:
+                user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+            except KeyError:
+                raise InvalidToken(_("Token contained no recognizable user identification"))
+
+            user = cached_user(user_id)
+            if user is None:
+                raise exceptions.AuthenticationFailed(_("User not found"), code="user_not_found")
+            if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+                raise exceptions.AuthenticationFailed(_("User is inactive"), code="user_inactive")
+            return user
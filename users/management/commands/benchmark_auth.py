@@ -0,0 +1,96 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from movies.benchmarking import benchmark_environment, latency_summary
+from users.authentication import JWTAuthentication, CachedTokenAuthentication
+
+SESSION_ENGINES = {
+    'session_db': 'django.contrib.sessions.backends.db',
+    'session_cached_db': 'django.contrib.sessions.backends.cached_db',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure what authenticating one request costs with each scheme: database and cache-backed "
+        "sessions, DRF tokens with and without the cache, and signed JWTs (when simplejwt is installed). "
+        "Reports latency and queries per authentication on a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Measured authentications per scheme.")
+        parser.add_argument('--warmup', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Measure the cached schemes even where AUTH_CACHE_TTL is off by default (a per-process cache)
+        with benchmark_environment(), override_settings(AUTH_CACHE_TTL=settings.AUTH_CACHE_TTL or 60):
+            user = User.objects.create_user('bench-auth', password='pw')
+            factory = RequestFactory()
+            for name, authenticate in self.schemes(user, factory).items():
+                cache.clear()
+                row = self.measure(authenticate, options)
+                self.stdout.write(
+                    f"{name:<18} mean {row['mean_us']:>8.1f} us  p95 {row['p95_ms'] * 1000:>8.1f} us  "
+                    f"queries {row['queries_mean']:.2f}"
+                )
+
+    def schemes(self, user, factory):
+        schemes = {name: self.session_scheme(user, factory, engine) for name, engine in SESSION_ENGINES.items()}
+
+        token = Token.objects.create(user=user)
+        header = {'HTTP_AUTHORIZATION': f'Token {token.key}'}
+        schemes['token'] = lambda: TokenAuthentication().authenticate(factory.get('/', **header))
+        schemes['token_cached'] = lambda: CachedTokenAuthentication().authenticate(factory.get('/', **header))
+
+        if JWTAuthentication is not None:
+            from rest_framework_simplejwt.tokens import AccessToken
+
+            from users.authentication import CachedJWTAuthentication
+
+            bearer = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(user)}'}
+            schemes['jwt'] = lambda: JWTAuthentication().authenticate(factory.get('/', **bearer))
+            schemes['jwt_cached'] = lambda: CachedJWTAuthentication().authenticate(factory.get('/', **bearer))
+        return schemes
+
+    def session_scheme(self, user, factory, engine):
+        """What SessionMiddleware plus AuthenticationMiddleware do to resolve ``request.user``."""
+        store_class = import_module(engine).SessionStore
+        with override_settings(SESSION_ENGINE=engine):
+            session = store_class()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+
+        def authenticate():
+            request = factory.get('/')
+            request.session = store_class(session.session_key)
+            return get_user(request)
+        return authenticate
+
+    def measure(self, authenticate, options):
+        for _ in range(options['warmup']):
+            authenticate()
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(options['requests']):
+                before = time.perf_counter()
+                authenticate()
+                timings.append(time.perf_counter() - before)
+            elapsed = time.perf_counter() - started
+        row = latency_summary(timings, elapsed)
+        row['mean_us'] = elapsed / options['requests'] * 1e6
+        row['queries_mean'] = len(queries) / options['requests']
+        return row
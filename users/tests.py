@@ -1,3 +1,57 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from .authentication import CachedJWTAuthentication, CachedTokenAuthentication
+
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-users'}}
+
+
+@override_settings(CACHES=TEST_CACHES, AUTH_CACHE_TTL=60)
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.token = Token.objects.create(user=self.user)
+        self.request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_warm_token_authenticates_without_queries(self):
+        auth = CachedTokenAuthentication()
+        self.assertEqual(auth.authenticate(self.request)[0], self.user)
+        with self.assertNumQueries(0):
+            user, token = auth.authenticate(self.request)
+        self.assertEqual((user.pk, token.key), (self.user.pk, self.token.key))
+
+    def test_rotation_and_deactivation_take_effect_immediately(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.assertEqual(client.get(reverse('movie-stats'), {'ids': 'tt1'}).status_code, 200)
+
+        new_key = client.post(reverse('api-token-rotate')).json()['token']
+        self.assertEqual(client.get(reverse('movie-stats'), {'ids': 'tt1'}).status_code, 401)
+
+        client.credentials(HTTP_AUTHORIZATION=f'Token {new_key}')
+        self.assertEqual(client.get(reverse('movie-stats'), {'ids': 'tt1'}).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(client.get(reverse('movie-stats'), {'ids': 'tt1'}).status_code, 401)
+
+    def test_obtain_and_revoke_token(self):
+        client = APIClient()
+        response = client.post(reverse('api-token'), {'username': 'alice', 'password': 'pw'})
+        self.assertEqual(response.json()['token'], self.token.key)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        CachedTokenAuthentication().authenticate(self.request)
+        self.assertEqual(client.delete(reverse('api-token')).status_code, 204)
+        self.assertEqual(client.delete(reverse('api-token')).status_code, 401)
+
+    def test_jwt_user_comes_from_the_cache(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        auth = CachedJWTAuthentication()
+        auth.authenticate(request)
+        with self.assertNumQueries(0):
+            self.assertEqual(auth.authenticate(request)[0].pk, self.user.pk)
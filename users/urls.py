@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -5,4 +6,14 @@ urlpatterns = [
     path('register/', views.register_view, name='register'),
     path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
+    path('api/token/', views.TokenView.as_view(), name='api-token'),
+    path('api/token/rotate/', views.TokenRotateView.as_view(), name='api-token-rotate'),
 ]
+
+if settings.API_JWT:
+    from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+
+    urlpatterns += [
+        path('api/jwt/', TokenObtainPairView.as_view(), name='api-jwt'),
+        path('api/jwt/refresh/', TokenRefreshView.as_view(), name='api-jwt-refresh'),
+    ]
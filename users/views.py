@@ -2,8 +2,21 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib import messages
+from django.db import transaction
+from django.utils.decorators import method_decorator
+from rest_framework import generics
+from rest_framework.authtoken.models import Token
+from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from movies.ratelimit import throttle
 from .forms import RegisterForm
 
+
+def is_post(request):
+    return request.method == 'POST'
+
+
 # Registration view
 def register_view(request):
     if request.method == 'POST':
@@ -17,7 +30,8 @@ def register_view(request):
         form = RegisterForm()
     return render(request, 'users/register.html', {'form': form})
 
-# Login view
+# Login view (password checks are deliberately slow, so attempts are limited per client IP)
+@throttle('login', applies=is_post)
 def login_view(request):
     if request.user.is_authenticated:
         return redirect('movies-list-html') # Redirect authenticated users from login page
@@ -36,3 +50,43 @@ def login_view(request):
 def logout_view(request):
     logout(request)
     return redirect('login')
+
+
+# -------------------------
+# DRF API Views
+# -------------------------
+
+@method_decorator(throttle('login', applies=is_post), name='dispatch')
+class TokenView(ObtainAuthToken):
+    """
+    ``POST`` username and password for the user's API token (one password
+    check, then the token authenticates from the cache); ``DELETE`` revokes
+    the token the request was made with.
+    """
+
+    def get_authenticators(self):
+        # Only DELETE needs a caller; POST authenticates with the password in the body
+        return [] if self.request.method == 'POST' else super().get_authenticators()
+
+    def get_permissions(self):
+        return [IsAuthenticated()] if self.request.method == 'DELETE' else super().get_permissions()
+
+    def delete(self, request):
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=204)
+
+
+class TokenRotateView(generics.GenericAPIView):
+    """Replace the caller's API token with a new one.
+
+    The old token stops working at once wherever the auth cache is shared (or
+    off); a worker with its own cache may accept it for up to ``AUTH_CACHE_TTL``
+    seconds more.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        with transaction.atomic():
+            Token.objects.filter(user=request.user).delete()
+            token = Token.objects.create(user=request.user)
+        return Response({'token': token.key})